@@ -0,0 +1,425 @@
+"""
+Benchmarks of the client against the stand-in server of `benchmarks.server`.
+Each benchmark is run `--repeat` times, and the best time is reported,
+with the peak memory allocated by Python during an additional traced run.
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pych_client.async_client
+import pych_client.client
+import pych_client.decoding
+from benchmarks.server import (
+    BLOCK_ROWS,
+    SCHEMA,
+    encode_header,
+    encode_rows,
+    generate_rows,
+    iter_chunks,
+    run_server,
+)
+from pych_client import (
+    AsyncClickHouseClient,
+    BufferedInserter,
+    ClickHouseClient,
+    __version__,
+)
+from pych_client.line_decoder import BytesLineDecoder, LineDecoder
+
+# Settings for the uncompressed and gzip-compressed responses.
+COMPRESSIONS = {"identity": {"enable_http_compression": 0}, "gzip": {}}
+
+# Size of the chunks fed to the offline decoders.
+CHUNK_SIZE = 64 * 1024
+
+# Number of processes of the parallel decoding benchmarks, set by `--workers`.
+OPTIONS = {"decode_workers": os.cpu_count() or 1}
+
+# A benchmark receives the URL of the server, the number of rows and the settings,
+# and returns the number of rows processed.
+Benchmark = Callable[[str, int, dict], int]
+
+
+@dataclass
+class Result:
+    name: str
+    format: str
+    compression: str
+    rows: int
+    bytes: int
+    seconds: float
+    seconds_median: float
+    rows_per_second: float
+    mb_per_second: float
+    peak_memory: int
+
+
+def query(rows: int) -> str:
+    return f"SELECT * FROM benchmark LIMIT {rows}"
+
+
+def bench_iter_bytes(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url) as client:
+        for _ in client.iter_bytes(query(rows), settings=settings):
+            pass
+    return rows
+
+
+def bench_iter_text(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url) as client:
+        return sum(1 for _ in client.iter_text(query(rows), settings=settings))
+
+
+def bench_iter_json(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url) as client:
+        return sum(1 for _ in client.iter_json(query(rows), settings=settings))
+
+
+def bench_iter_json_batches(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url) as client:
+        batches = client.iter_json_batches(query(rows), settings=settings)
+        return sum(len(batch) for batch in batches)
+
+
+@lru_cache(maxsize=None)
+def get_process_pool() -> ProcessPoolExecutor:
+    # The pool is shared by the runs, so that the start of the processes is not measured.
+    return ProcessPoolExecutor(OPTIONS["decode_workers"])
+
+
+def bench_iter_json_parallel(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url, decode_executor=get_process_pool()) as client:
+        return sum(1 for _ in client.iter_json(query(rows), settings=settings))
+
+
+def bench_json_parallel(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url, decode_executor=get_process_pool()) as client:
+        return len(client.json(query(rows), settings=settings))
+
+
+def bench_json(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url) as client:
+        return len(client.json(query(rows), settings=settings))
+
+
+def bench_iter_rows(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url) as client:
+        return sum(1 for _ in client.iter_rows(query(rows), settings=settings))
+
+
+def bench_iter_rows_batches(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url) as client:
+        batches = client.iter_rows_batches(query(rows), settings=settings)
+        return sum(len(batch) for batch in batches)
+
+
+def bench_iter_blocks(url: str, rows: int, settings: dict) -> int:
+    with ClickHouseClient(url) as client:
+        blocks = client.iter_blocks(query(rows), settings=settings)
+        return sum(len(block["id"]) for block in blocks)
+
+
+def bench_insert(url: str, rows: int, settings: dict) -> int:
+    data = generate_rows(min(rows, 10_000))
+    with ClickHouseClient(url) as client:
+        client.insert(
+            "benchmark",
+            (data[i % len(data)] for i in range(rows)),
+            settings=settings,
+        )
+    return rows
+
+
+def bench_buffered_insert(url: str, rows: int, settings: dict) -> int:
+    data = generate_rows(min(rows, 10_000))
+    with ClickHouseClient(url) as client:
+        with BufferedInserter(client, "benchmark", settings=settings) as inserter:
+            for i in range(rows):
+                inserter.put(data[i % len(data)])
+    return rows
+
+
+def bench_async_insert(url: str, rows: int, settings: dict) -> int:
+    data = generate_rows(min(rows, 10_000))
+
+    async def run() -> int:
+        async with AsyncClickHouseClient(url) as client:
+            await client.insert(
+                "benchmark",
+                (data[i % len(data)] for i in range(rows)),
+                settings=settings,
+            )
+        return rows
+
+    return asyncio.run(run())
+
+
+def bench_async_insert_batches(url: str, rows: int, settings: dict) -> int:
+    data = generate_rows(min(rows, 10_000))
+
+    async def run() -> int:
+        count = 0
+        async with AsyncClickHouseClient(url) as client:
+            batches = client.insert_batches(
+                "benchmark",
+                (data[i % len(data)] for i in range(rows)),
+                settings=settings,
+            )
+            async for batch in batches:
+                assert not batch.error
+                count += batch.rows
+        return count
+
+    return asyncio.run(run())
+
+
+def bench_async_iter_json(url: str, rows: int, settings: dict) -> int:
+    async def run() -> int:
+        async with AsyncClickHouseClient(url) as client:
+            count = 0
+            async for _ in client.iter_json(query(rows), settings=settings):
+                count += 1
+            return count
+
+    return asyncio.run(run())
+
+
+def bench_async_iter_json_executor(url: str, rows: int, settings: dict) -> int:
+    async def run() -> int:
+        with ThreadPoolExecutor(1) as executor:
+            async with AsyncClickHouseClient(url, decode_executor=executor) as client:
+                count = 0
+                async for _ in client.iter_json(query(rows), settings=settings):
+                    count += 1
+                return count
+
+    return asyncio.run(run())
+
+
+def bench_async_json(url: str, rows: int, settings: dict) -> int:
+    async def run() -> int:
+        async with AsyncClickHouseClient(url) as client:
+            return len(await client.json(query(rows), settings=settings))
+
+    return asyncio.run(run())
+
+
+def bench_line_decoder(url: str, rows: int, settings: dict) -> int:
+    data = b"".join(iter_chunks("TabSeparated", rows)).decode()
+    decoder = LineDecoder()
+    count = 0
+    for start in range(0, len(data), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        count += len(decoder.decode(data[start:stop]))
+    return count + len(decoder.flush())
+
+
+def bench_bytes_line_decoder(url: str, rows: int, settings: dict) -> int:
+    data = b"".join(iter_chunks("TabSeparated", rows))
+    decoder = BytesLineDecoder()
+    count = 0
+    for start in range(0, len(data), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        count += len(decoder.decode(data[start:stop]))
+    return count + len(decoder.flush())
+
+
+# Name, format of the response, function, and whether it uses the server.
+BENCHMARKS: List[Tuple[str, str, Benchmark, bool]] = [
+    ("iter_bytes", "TabSeparated", bench_iter_bytes, True),
+    ("iter_text", "TabSeparated", bench_iter_text, True),
+    ("iter_json", "JSONEachRow", bench_iter_json, True),
+    ("iter_json_batches", "JSONEachRow", bench_iter_json_batches, True),
+    ("iter_json_parallel", "JSONEachRow", bench_iter_json_parallel, True),
+    ("json", "JSONEachRow", bench_json, True),
+    ("json_parallel", "JSONEachRow", bench_json_parallel, True),
+    ("iter_rows", "RowBinaryWithNamesAndTypes", bench_iter_rows, True),
+    ("iter_rows_batches", "RowBinaryWithNamesAndTypes", bench_iter_rows_batches, True),
+    ("iter_blocks", "Native", bench_iter_blocks, True),
+    ("insert", "RowBinary", bench_insert, True),
+    ("buffered_insert", "RowBinary", bench_buffered_insert, True),
+    ("async_insert", "RowBinary", bench_async_insert, True),
+    ("async_insert_batches", "RowBinary", bench_async_insert_batches, True),
+    ("async_iter_json", "JSONEachRow", bench_async_iter_json, True),
+    (
+        "async_iter_json_executor",
+        "JSONEachRow",
+        bench_async_iter_json_executor,
+        True,
+    ),
+    ("async_json", "JSONEachRow", bench_async_json, True),
+    ("line_decoder", "TabSeparated", bench_line_decoder, False),
+    ("bytes_line_decoder", "TabSeparated", bench_bytes_line_decoder, False),
+]
+
+
+def get_size(format_: str, rows: int) -> int:
+    """Size of the uncompressed data, computed without generating all the rows."""
+    size, rest = len(encode_header(format_)), rows
+    while rest > 0:
+        count = min(rest, BLOCK_ROWS)
+        size += len(encode_rows(format_, count))
+        rest -= count
+    return size
+
+
+def measure(
+    fn: Benchmark, url: str, rows: int, settings: dict, repeat: int
+) -> Tuple[List[float], int]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = fn(url, rows, settings)
+        times.append(time.perf_counter() - start)
+        assert count == rows, f"expected {rows} rows, got {count}"
+    tracemalloc.start()
+    try:
+        fn(url, rows, settings)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def run_benchmarks(
+    url: str, rows: int, repeat: int, names: Optional[Sequence[str]] = None
+) -> List[Result]:
+    results = []
+    for name, format_, fn, online in BENCHMARKS:
+        if names and name not in names:
+            continue
+        if format_ == "Native" and not has_numpy():
+            continue
+        size = get_size(format_, rows)
+        compressions = COMPRESSIONS if online else {"identity": {}}
+        for compression, settings in compressions.items():
+            # The request body is compressed by the client for inserts.
+            if "insert" in name and compression == "gzip":
+                continue
+            times, peak = measure(fn, url, rows, settings, repeat)
+            best = min(times)
+            result = Result(
+                name=name,
+                format=format_,
+                compression=compression,
+                rows=rows,
+                bytes=size,
+                seconds=best,
+                seconds_median=statistics.median(times),
+                rows_per_second=rows / best,
+                mb_per_second=size / best / 1e6,
+                peak_memory=peak,
+            )
+            print_result(result)
+            results.append(result)
+    return results
+
+
+def has_numpy() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ModuleNotFoundError:
+        return False
+    return True
+
+
+def print_result(result: Result, baseline: Optional[Result] = None) -> None:
+    line = (
+        f"{result.name:<24} {result.compression:<9} "
+        f"{result.rows_per_second:>12,.0f} rows/s {result.mb_per_second:>9.1f} MB/s "
+        f"{result.peak_memory / 1e6:>9.1f} MB peak"
+    )
+    if baseline:
+        line += f" {baseline.seconds / result.seconds:>6.2f}x"
+    print(line, file=sys.stderr)
+
+
+def use_json_library(name: str) -> None:
+    """Select the JSON library used by the clients, to compare orjson and the stdlib."""
+    module = json if name == "json" else importlib.import_module(name)
+    pych_client.client.json = module  # type: ignore
+    pych_client.async_client.json = module  # type: ignore
+    pych_client.decoding.json = module  # type: ignore
+
+
+def get_metadata(json_library: str) -> dict:
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "json": json_library,
+        "cpus": os.cpu_count(),
+        "decode_workers": OPTIONS["decode_workers"],
+        "date": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def compare(results: List[Result], baseline_file: str) -> None:
+    with open(baseline_file) as f:
+        baseline = {
+            (x["name"], x["compression"]): Result(**x) for x in json.load(f)["results"]
+        }
+    print(f"Speedup relative to {baseline_file}:", file=sys.stderr)
+    for result in results:
+        print_result(result, baseline.get((result.name, result.compression)))
+
+
+def main(args_: Optional[Sequence[str]] = None) -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default=1_000_000, type=int)
+    parser.add_argument("--repeat", default=3, type=int)
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        choices=[name for name, *_ in BENCHMARKS],
+        help="benchmark to run (default: all)",
+    )
+    parser.add_argument(
+        "--json-library",
+        choices=("orjson", "json"),
+        default=getattr(pych_client.client, "json").__name__,
+        help="JSON library used by the clients (default: orjson if installed)",
+    )
+    parser.add_argument(
+        "--workers",
+        default=OPTIONS["decode_workers"],
+        type=int,
+        help="processes of the parallel decoding benchmarks (default: %(default)s)",
+    )
+    parser.add_argument("--output", help="file where to write the results, in JSON")
+    parser.add_argument("--baseline", help="results to compare with, in JSON")
+    args = parser.parse_args(args_)
+    OPTIONS["decode_workers"] = args.workers
+
+    use_json_library(args.json_library)
+    with run_server() as url:
+        results = run_benchmarks(url, args.rows, args.repeat, args.benchmark)
+
+    report: Dict = {
+        "metadata": get_metadata(args.json_library),
+        "schema": SCHEMA,
+        "results": [asdict(result) for result in results],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Stand-in for the ClickHouse HTTP interface, which returns generated data
+at line rate, for benchmarking the client without a ClickHouse server.
+Every SELECT query returns the rows of `SCHEMA`, repeated up to the `LIMIT`
+of the query, in the format of the `default_format` setting, or of its `FORMAT` clause.
+Inserted data is read, and discarded.
+"""
+
+import json
+import multiprocessing
+import re
+import struct
+import zlib
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit
+from uuid import uuid4
+
+import httpx
+
+from pych_client.insert import Schema
+from pych_client.row_binary import row_encoder, write_string, write_varint
+
+SCHEMA: Schema = [
+    ("id", "UInt64"),
+    ("name", "String"),
+    ("value", "Float64"),
+    ("time", "DateTime"),
+]
+
+FORMATS = (
+    "TabSeparated",
+    "JSONEachRow",
+    "RowBinary",
+    "RowBinaryWithNamesAndTypes",
+    "Native",
+)
+
+# Rows per chunk of the response.
+BLOCK_ROWS = 8192
+DEFAULT_ROWS = 1_000_000
+
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+LIMIT = re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE)
+FORMAT = re.compile(r"\bFORMAT\s+(\w+)", re.IGNORECASE)
+
+
+def generate_rows(count: int) -> List[Tuple[int, str, float, datetime]]:
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc).timestamp()
+    return [
+        (
+            i,
+            f"name-{i:06d}",
+            i / 7,
+            datetime.fromtimestamp(start + i, timezone.utc).replace(tzinfo=None),
+        )
+        for i in range(count)
+    ]
+
+
+@lru_cache(maxsize=None)
+def encode_header(format_: str) -> bytes:
+    if format_ != "RowBinaryWithNamesAndTypes":
+        return b""
+    buffer = bytearray()
+    write_varint(buffer, len(SCHEMA))
+    for name, _ in SCHEMA:
+        write_string(buffer, name)
+    for _, type_ in SCHEMA:
+        write_string(buffer, type_)
+    return bytes(buffer)
+
+
+@lru_cache(maxsize=None)
+def encode_rows(format_: str, count: int) -> bytes:
+    """Encode `count` rows in `format_`, without the header of the format."""
+    rows = generate_rows(count)
+    if format_ == "TabSeparated":
+        lines = [f"{i}\t{name}\t{value}\t{time}\n" for i, name, value, time in rows]
+        return "".join(lines).encode()
+    if format_ == "JSONEachRow":
+        return "".join(
+            json.dumps({"id": i, "name": name, "value": value, "time": str(time)})
+            + "\n"
+            for i, name, value, time in rows
+        ).encode()
+    if format_ in ("RowBinary", "RowBinaryWithNamesAndTypes"):
+        encode_row = row_encoder([type_ for _, type_ in SCHEMA])
+        buffer = bytearray()
+        for row in rows:
+            encode_row(buffer, row)
+        return bytes(buffer)
+    if format_ == "Native":
+        import numpy as np
+
+        from pych_client.native import encode_block
+
+        columns = {
+            "id": np.array([x[0] for x in rows], dtype=np.uint64),
+            "name": np.array([x[1] for x in rows], dtype=object),
+            "value": np.array([x[2] for x in rows], dtype=np.float64),
+            "time": np.array([x[3] for x in rows], dtype="datetime64[s]"),
+        }
+        return encode_block(columns, SCHEMA)
+    raise ValueError(f"unsupported format: {format_}")
+
+
+@lru_cache(maxsize=None)
+def deflate(data: bytes) -> bytes:
+    """
+    Compress `data` in a raw deflate stream which does not depend on the previous data,
+    so that it can be concatenated with other streams compressed in the same way.
+    """
+    compressor = zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+def iter_chunks(format_: str, rows: int) -> Iterator[bytes]:
+    if header := encode_header(format_):
+        yield header
+    for start in range(0, rows, BLOCK_ROWS):
+        yield encode_rows(format_, min(BLOCK_ROWS, rows - start))
+
+
+def iter_gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    yield GZIP_HEADER
+    crc = size = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        yield deflate(chunk)
+    yield zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS).flush()
+    yield struct.pack("<II", crc, size & 0xFFFFFFFF)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if urlsplit(self.path).path == "/ping":
+            self.send_body(b"Ok.\n")
+        else:
+            self.handle_query(b"")
+
+    def do_POST(self) -> None:
+        self.handle_query(self.read_body())
+
+    def read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            chunks = []
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            self.rfile.readline()
+            body = b"".join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = zlib.decompress(body, wbits=zlib.MAX_WBITS | 16)
+        return body
+
+    def handle_query(self, body: bytes) -> None:
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        query = params.get("query")
+        if query is None:
+            query, body = body.decode(), b""
+        if query.lstrip().upper().startswith("INSERT"):
+            self.send_body(b"", {"written_bytes": len(body)})
+        elif query.lstrip().upper().startswith("DESCRIBE"):
+            description = [
+                {"name": name, "type": type_, "default_type": ""}
+                for name, type_ in SCHEMA
+            ]
+            lines = [json.dumps(column) + "\n" for column in description]
+            self.send_body("".join(lines).encode())
+        else:
+            self.send_rows(query, params)
+
+    def send_rows(self, query: str, params: dict) -> None:
+        match = FORMAT.search(query)
+        format_ = match[1] if match else params.get("default_format", "TabSeparated")
+        match = LIMIT.search(query)
+        rows = int(match[1]) if match else DEFAULT_ROWS
+        chunks = iter_chunks(format_, rows)
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-ClickHouse-Format", format_)
+        self.send_header("X-ClickHouse-Query-Id", str(uuid4()))
+        self.send_header("X-ClickHouse-Summary", summary(read_rows=rows))
+        if params.get("enable_http_compression") in ("1", "true", "True") and (
+            "gzip" in self.headers.get("Accept-Encoding", "")
+        ):
+            self.send_header("Content-Encoding", "gzip")
+            chunks = iter_gzip(chunks)
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_body(self, body: bytes, stats: Optional[dict] = None) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-ClickHouse-Query-Id", str(uuid4()))
+        self.send_header("X-ClickHouse-Summary", summary(**(stats or {})))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def summary(**values: int) -> str:
+    return json.dumps({k: str(v) for k, v in values.items()})
+
+
+def serve(host: str, port: int, ports: Optional[Any] = None) -> None:
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    if ports is not None:
+        ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+@contextmanager
+def run_server(host: str = "127.0.0.1", port: int = 0) -> Iterator[str]:
+    """Run the server in another process, so that it does not compete for the GIL."""
+    ports: Any = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve, args=(host, port, ports), daemon=True
+    )
+    process.start()
+    try:
+        base_url = f"http://{host}:{ports.get(timeout=10)}"
+        httpx.get(f"{base_url}/ping").raise_for_status()
+        yield base_url
+    finally:
+        process.terminate()
+        process.join()
+
+
+def main(args_: Optional[Sequence[str]] = None) -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8123, type=int)
+    args = parser.parse_args(args_)
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
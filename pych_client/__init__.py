@@ -1,5 +1,23 @@
 from pych_client.async_client import AsyncClickHouseClient
+from pych_client.cache import ResultCache
+from pych_client.cancellation import deadline
 from pych_client.client import ClickHouseClient
+from pych_client.external import ExternalTable
+from pych_client.inserter import AsyncBufferedInserter, BufferedInserter
+from pych_client.pool import AsyncConnectionPool, ConnectionPool
+from pych_client.retry import RetryPolicy
 from pych_client.version import __version__
 
-__all__ = ("AsyncClickHouseClient", "ClickHouseClient", "__version__")
+__all__ = (
+    "AsyncBufferedInserter",
+    "AsyncClickHouseClient",
+    "AsyncConnectionPool",
+    "BufferedInserter",
+    "ClickHouseClient",
+    "ConnectionPool",
+    "ExternalTable",
+    "ResultCache",
+    "RetryPolicy",
+    "__version__",
+    "deadline",
+)
@@ -0,0 +1,75 @@
+from typing import Any, List, Optional
+
+try:
+    import pyarrow as pa  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover
+    pa = None
+
+
+class ArrowStreamDecoder:
+    """
+    Incremental decoder for the ArrowStream format.
+    Record batches are returned as soon as their IPC message is fully received.
+    """
+
+    def __init__(self) -> None:
+        if pa is None:
+            raise ModuleNotFoundError("pyarrow is required to decode the Arrow format")
+        # Schema and dictionary messages, which are replayed before
+        # the new record batches since the IPC reader is stateless between calls.
+        self.prefix = b""
+        self.chunks: List[bytes] = []
+        self.size = 0
+        # See NativeDecoder for the rationale.
+        self.wanted = 0
+        self.schema: Optional[Any] = None
+        self.finished = False
+
+    def decode(self, data: bytes) -> List[Any]:
+        if data:
+            self.chunks.append(data)
+            self.size += len(data)
+        if self.finished or not self.chunks or self.size < self.wanted:
+            return []
+        buffer = b"".join([self.prefix, *self.chunks])
+        reader = pa.BufferReader(buffer)
+        reader.seek(len(self.prefix))
+        end = reader.tell()
+        metadata = []
+        has_batches = False
+        while end < len(buffer):
+            try:
+                message = pa.ipc.read_message(reader)
+            except EOFError:
+                self.finished = True
+                break
+            except (pa.ArrowInvalid, OSError):
+                break
+            pos = reader.tell()
+            if message.type == "record batch":
+                has_batches = True
+            else:
+                if message.type == "schema":
+                    self.schema = pa.ipc.read_schema(message)
+                metadata.append(buffer[end:pos])
+            end = pos
+        batches = []
+        if has_batches:
+            batches = list(pa.ipc.open_stream(pa.py_buffer(buffer)[:end]))
+        self.prefix += b"".join(metadata)
+        rest = buffer[end:] if not self.finished else b""
+        self.chunks = [rest] if rest else []
+        self.size = len(rest)
+        self.wanted = 2 * self.size
+        return batches
+
+    def flush(self) -> List[Any]:
+        self.wanted = 0
+        batches = self.decode(b"")
+        if self.chunks:
+            raise ValueError("truncated ArrowStream stream")
+        return batches
+
+    def to_table(self, batches: List[Any]) -> Any:
+        """Assemble the record batches in a table, without copying them."""
+        return pa.Table.from_batches(batches, self.schema)
@@ -1,30 +1,113 @@
+import asyncio
 import builtins
+import time
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from functools import partial
 from types import TracebackType
-from typing import Any, AsyncIterator, List, Optional, Type
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+from uuid import uuid4
 
 import httpx
 from httpx import Response
 
-from pych_client.base import get_client_args, get_credentials, get_http_params
+from pych_client.arrow import ArrowStreamDecoder
+from pych_client.base import (
+    get_client_args,
+    get_credentials,
+    get_http_params,
+    get_query_args,
+    get_request_args,
+)
+from pych_client.batches import Batcher
+from pych_client.cache import ResultCache, get_cache_key
+from pych_client.cancellation import (
+    KILL_QUERY,
+    check_kill_results,
+    get_query_settings,
+    get_time_left,
+)
+from pych_client.compression import check_compression, compress_request
+from pych_client.concurrency import map_tasks, merge_tasks
 from pych_client.constants import (
     CLICKHOUSE_EXCEPTION_CODE_HEADER,
+    CLICKHOUSE_QUERY_ID_HEADER,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
     DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_DECODE_CHUNK_SIZE,
+    DEFAULT_HEALTH_CHECK_INTERVAL,
+    DEFAULT_INSERT_BATCH_SIZE,
+    DEFAULT_INSERT_MAX_BYTES,
+    DEFAULT_LOAD_BALANCING,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    DEFAULT_PREFETCH,
     DEFAULT_READ_WRITE_TIMEOUT,
 )
+from pych_client.decoding import aiter_decoded, decode_json, decode_text
+from pych_client.endpoints import Endpoint, EndpointPool, get_endpoints
 from pych_client.exceptions import ClickHouseException
-from pych_client.line_decoder import LineDecoder
-from pych_client.typing import Data, Params, Settings
+from pych_client.insert import (
+    AsyncRows,
+    InsertBatch,
+    aiter_native,
+    aiter_row_binary,
+    aiter_row_binary_batches,
+    get_insert_query,
+    get_insert_schema,
+)
+from pych_client.json_compact import TYPED_JSON_SETTINGS, JSONCompactDecoder
+from pych_client.line_decoder import BytesLineDecoder, iter_lines
+from pych_client.logger import logger
+from pych_client.native import Block, NativeDecoder, concatenate_blocks
+from pych_client.pool import AsyncConnectionPool
+from pych_client.prepared import AsyncPreparedQuery, RequestTemplate
+from pych_client.retry import (
+    AsyncReplayable,
+    RetryPolicy,
+    is_read_query,
+    is_replayable,
+)
+from pych_client.row_binary import RowBinaryDecoder
+from pych_client.scan import get_partition_queries
+from pych_client.stats import (
+    ProgressCallback,
+    QueryStats,
+    get_query_progress,
+    get_query_stats,
+    last_stats,
+)
+from pych_client.typing import BaseURL, Data, Params, Query, Settings
 
 try:
     import orjson as json
 except ModuleNotFoundError:
     import json  # type: ignore
 
+T = TypeVar("T")
+
 
 class AsyncClickHouseClient:
     def __init__(
         self,
-        base_url: Optional[str] = None,
+        base_url: Optional[BaseURL] = None,
         database: Optional[str] = None,
         username: Optional[str] = None,
         password: Optional[str] = None,
@@ -32,20 +115,55 @@ class AsyncClickHouseClient:
         settings: Settings = None,
         connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT,
         read_write_timeout: Optional[float] = DEFAULT_READ_WRITE_TIMEOUT,
+        compression: Optional[str] = None,
+        max_connections: Optional[int] = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: Optional[int] = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        load_balancing: str = DEFAULT_LOAD_BALANCING,
+        health_check_interval: Optional[float] = DEFAULT_HEALTH_CHECK_INTERVAL,
+        retry: Optional[RetryPolicy] = None,
+        hedge_after: Optional[float] = None,
+        cache: Optional[ResultCache] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        decode_executor: Optional[Executor] = None,
+        prefetch: int = DEFAULT_PREFETCH,
+        decode_chunk_size: int = DEFAULT_DECODE_CHUNK_SIZE,
+        pool: Optional[AsyncConnectionPool] = None,
     ):
+        check_compression(compression)
+        if on_progress:
+            settings = {**(settings or {}), "send_progress_in_http_headers": 1}
         base_url, database, username, password = get_credentials(
             base_url, database, username, password
         )
-        self.config = {
-            "base_url": base_url,
+        self.endpoints = EndpointPool(get_endpoints(base_url), load_balancing)
+        self.config: dict = {
+            "base_url": self.endpoints.endpoints[0].url,
             "database": database,
             "username": username,
             "password": password,
             "settings": settings,
             "connect_timeout": connect_timeout,
             "read_write_timeout": read_write_timeout,
+            "compression": compression,
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
         }
-        self.client = httpx.AsyncClient(**get_client_args(**self.config))  # type: ignore
+        self.retry = retry
+        self.hedge_after = hedge_after
+        self.cache = cache
+        self.on_progress = on_progress
+        self.decode_executor = decode_executor
+        self.prefetch = prefetch
+        self.decode_chunk_size = decode_chunk_size
+        self.schemas: Dict[str, List[dict]] = {}
+        # The limits of a shared pool replace `max_connections` and `max_keepalive_connections`.
+        self.client = httpx.AsyncClient(
+            **get_client_args(**self.config),
+            transport=pool.get_transport() if pool else None,
+        )
+        self.health_check_interval = health_check_interval
+        self.health_check_task: Optional[asyncio.Task] = None
+        self.kill_tasks: Set[asyncio.Task] = set()
 
     async def __aenter__(self) -> "AsyncClickHouseClient":
         return self
@@ -56,8 +174,86 @@ class AsyncClickHouseClient:
         exc_val: Optional[BaseException],
         exc_tb: Optional[TracebackType],
     ) -> None:
+        if self.health_check_task:
+            self.health_check_task.cancel()
+        if self.kill_tasks:
+            await asyncio.wait(self.kill_tasks)
         await self.client.aclose()
 
+    @property
+    def stats(self) -> Optional[QueryStats]:
+        """Statistics of the last query run in the current task."""
+        return last_stats.get()
+
+    async def check_health(self) -> None:
+        """Run `SELECT 1` on each endpoint, and update its status."""
+
+        async def check(endpoint: Endpoint) -> None:
+            try:
+                r = await self.client.post(
+                    endpoint.url,
+                    params={"query": "SELECT 1"},
+                    timeout=self.config["connect_timeout"],
+                )
+                healthy = r.is_success
+            except httpx.HTTPError:
+                healthy = False
+            self.endpoints.set_healthy(endpoint, healthy)
+
+        await asyncio.gather(*[check(x) for x in self.endpoints.endpoints])
+
+    async def check_health_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    def start_health_checks(self) -> None:
+        # The task is started on the first request, since it requires a running loop.
+        if (
+            not self.health_check_task
+            and len(self.endpoints) > 1
+            and self.health_check_interval
+        ):
+            self.health_check_task = asyncio.create_task(
+                self.check_health_periodically(self.health_check_interval)
+            )
+
+    async def cancel(self, query_id: str) -> None:
+        """
+        Kill the query `query_id`, on each endpoint since it can run on any of them.
+        An error is raised only if the query could not be killed on any endpoint.
+        """
+        results = await asyncio.gather(
+            *[self.send_kill(x, query_id) for x in self.endpoints.endpoints],
+            return_exceptions=True,
+        )
+        check_kill_results(query_id, results)
+
+    async def send_kill(self, endpoint: Endpoint, query_id: str) -> None:
+        r = await self.client.post(
+            endpoint.url,
+            params=get_http_params(KILL_QUERY, {"query_id": query_id}, None),
+            timeout=self.config["connect_timeout"],
+        )
+        await raise_for_status(r, KILL_QUERY)
+
+    def kill_query(self, endpoint: Endpoint, query_id: Optional[str]) -> None:
+        """
+        Kill a query abandoned by the client, which the server would keep running.
+        The query is killed in a background task, since the current task may be cancelled.
+        """
+        if not query_id:
+            return
+        task = asyncio.create_task(self.kill_query_now(endpoint, query_id))
+        self.kill_tasks.add(task)
+        task.add_done_callback(self.kill_tasks.discard)
+
+    async def kill_query_now(self, endpoint: Endpoint, query_id: str) -> None:
+        try:
+            await self.send_kill(endpoint, query_id)
+        except Exception:
+            logger.warning("failed to kill query %s", query_id, exc_info=True)
+
     async def execute(
         self,
         query: str,
@@ -65,14 +261,46 @@ class AsyncClickHouseClient:
         data: Data = None,
         settings: Settings = None,
     ) -> httpx.Response:
-        r = await self.client.post(
-            "/",
-            content=data,
-            params=get_http_params(query, params, settings),
-        )
-        await raise_for_status(r, query)
+        key = self.get_cache_key(query, params, data, settings)
+        if self.cache and key:
+            # The disk tier is accessed outside of the event loop.
+            if self.cache.directory:
+                cached = await asyncio.to_thread(self.cache.get, key)
+            else:
+                cached = self.cache.get(key)
+            if cached:
+                self.record_stats(cached, 0.0)
+                return cached
+        r, endpoint = await self.send(query, params, data, settings, stream=False)
+        self.endpoints.release(endpoint)
+        if self.cache and key:
+            if self.cache.directory:
+                await asyncio.to_thread(self.cache.set, key, query, r)
+            else:
+                self.cache.set(key, query, r)
         return r
 
+    def prepare(self, query: str, settings: Settings = None) -> AsyncPreparedQuery:
+        """
+        Prepare a query run many times with different parameters,
+        whose request is encoded once, e.g. `client.prepare(query)(params)`.
+        """
+        return AsyncPreparedQuery(self, query, settings)
+
+    def get_cache_key(
+        self, query: str, params: Params, data: Data, settings: Settings
+    ) -> Optional[str]:
+        """Return the cache key of a read query, or None if it cannot be cached."""
+        if not self.cache or not is_read_query(query, data):
+            return None
+        return get_cache_key(
+            [x.url for x in self.endpoints.endpoints],
+            self.config["username"],
+            self.config["database"],
+            self.config["settings"],
+            get_http_params(query, params, settings),
+        )
+
     async def stream(
         self,
         query: str,
@@ -80,9 +308,166 @@ class AsyncClickHouseClient:
         data: Data = None,
         settings: Settings = None,
     ) -> Any:
-        return self.client.stream(
-            "POST", "/", content=data, params=get_http_params(query, params, settings)
+        @asynccontextmanager
+        async def stream() -> AsyncIterator[Response]:
+            r, endpoint = await self.send(query, params, data, settings, stream=True)
+            try:
+                yield r
+            finally:
+                await self.close_response(r, endpoint)
+
+        return stream()
+
+    async def close_response(self, r: Response, endpoint: Endpoint) -> None:
+        """Close the response, and kill its query if the response was not fully read."""
+        if not r.is_closed:
+            await r.aclose()
+            self.kill_query(endpoint, r.headers.get(CLICKHOUSE_QUERY_ID_HEADER))
+        self.endpoints.release(endpoint)
+
+    async def send(
+        self,
+        query: str,
+        params: Params,
+        data: Data,
+        settings: Settings,
+        stream: bool,
+        template: Optional[RequestTemplate] = None,
+    ) -> Tuple[Response, Endpoint]:
+        """
+        Send the query, with retries according to the retry policy,
+        and hedged requests for read queries if `hedge_after` is set.
+        The endpoint of the response must be released by the caller.
+        """
+        self.start_health_checks()
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                if self.hedge_after is not None and is_read_query(query, data):
+                    r, endpoint = await self.send_hedged(
+                        query, params, data, settings, stream, template
+                    )
+                else:
+                    r, endpoint = await self.send_once(
+                        query, params, data, settings, stream, template
+                    )
+                break
+            except Exception as e:
+                if not (
+                    self.retry
+                    and self.retry.should_retry(e, attempt, query, data, settings)
+                ):
+                    raise
+                delay = self.retry.delay(attempt)
+                if (time_left := get_time_left()) is not None and time_left <= delay:
+                    raise
+                logger.info("retrying in %.3fs after %r", delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+        self.record_stats(r, time.monotonic() - start)
+        return r, endpoint
+
+    def record_stats(self, r: Response, elapsed: float) -> None:
+        last_stats.set(get_query_stats(r, elapsed))
+        if self.on_progress:
+            for progress in get_query_progress(r):
+                self.on_progress(progress)
+
+    async def send_once(
+        self,
+        query: str,
+        params: Params,
+        data: Data,
+        settings: Settings,
+        stream: bool,
+        template: Optional[RequestTemplate] = None,
+    ) -> Tuple[Response, Endpoint]:
+        settings = get_query_settings(settings)
+        endpoint = self.endpoints.acquire()
+        try:
+            if template:
+                request = template.build(endpoint.url, params, settings)
+            else:
+                request = self.build_request(endpoint, query, params, data, settings)
+            start = time.monotonic()
+            r = await self.client.send(request, stream=stream)
+            self.endpoints.record_latency(endpoint, time.monotonic() - start)
+            try:
+                await raise_for_status(r, query)
+            except ClickHouseException:
+                await r.aclose()
+                raise
+        except httpx.TransportError:
+            self.endpoints.set_healthy(endpoint, False)
+            self.endpoints.release(endpoint)
+            raise
+        except BaseException as e:
+            self.endpoints.release(endpoint)
+            # The query keeps running if the task is cancelled.
+            if not isinstance(e, Exception):
+                self.kill_query(endpoint, settings["query_id"])
+            raise
+        return r, endpoint
+
+    def build_request(
+        self,
+        endpoint: Endpoint,
+        query: str,
+        params: Params,
+        data: Data,
+        settings: dict,
+    ) -> httpx.Request:
+        http_params, body, headers = get_request_args(
+            query, params, data, settings, asynchronous=True
         )
+        content, content_headers = compress_request(body, self.config["compression"])
+        return self.client.build_request(
+            "POST",
+            endpoint.url,
+            content=content,
+            headers={**headers, **content_headers},
+            params=http_params,
+        )
+
+    async def send_hedged(
+        self,
+        query: str,
+        params: Params,
+        data: Data,
+        settings: Settings,
+        stream: bool,
+        template: Optional[RequestTemplate] = None,
+    ) -> Tuple[Response, Endpoint]:
+        """
+        Send a second request if the first one did not succeed
+        within `hedge_after` seconds, and keep the first successful response.
+        """
+        args = (query, params, data, settings, stream, template)
+        tasks = [asyncio.ensure_future(self.send_once(*args))]
+        pending = set(tasks)
+        try:
+            await asyncio.wait(tasks, timeout=self.hedge_after)
+            # The second request is also sent if the first one failed early.
+            if not tasks[0].done() or tasks[0].exception():
+                tasks.append(asyncio.ensure_future(self.send_once(*args)))
+                pending.add(tasks[-1])
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                if succeeded := [x for x in done if not x.exception()]:
+                    for task in succeeded[1:]:
+                        await self.discard(task)
+                    return succeeded[0].result()
+            return await tasks[0]
+        finally:
+            # The slower requests are cancelled, and their queries killed.
+            for task in pending:
+                task.cancel()
+
+    async def discard(self, task: asyncio.Task) -> None:
+        await self.close_response(*task.result())
 
     async def bytes(
         self,
@@ -103,10 +488,82 @@ class AsyncClickHouseClient:
     ) -> AsyncIterator[builtins.bytes]:
         stream = await self.stream(query, params, data, settings)
         async with stream as r:
-            await raise_for_status(r, query)
             async for chunk in r.aiter_bytes():
                 yield chunk
 
+    def decode(
+        self,
+        fn: Callable[[builtins.bytes], List[T]],
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> AsyncIterator[Tuple[List[T], int]]:
+        """
+        Decode the response in `decode_executor`, by chunks of complete lines,
+        while it is received.
+        """
+        chunks = self.iter_bytes(query, params, data, settings)
+        return aiter_decoded(
+            chunks, fn, self.decode_executor, self.prefetch, self.decode_chunk_size
+        )
+
+    async def columns(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> Block:
+        settings = {**(settings or {}), "default_format": "Native"}
+        decoder = NativeDecoder()
+        blocks = decoder.decode(await self.bytes(query, params, data, settings))
+        return concatenate_blocks(blocks + decoder.flush())
+
+    async def iter_blocks(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> AsyncIterator[Block]:
+        settings = {**(settings or {}), "default_format": "Native"}
+        decoder = NativeDecoder()
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            for block in decoder.decode(chunk):
+                yield block
+        for block in decoder.flush():
+            yield block
+
+    async def arrow(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> Any:
+        settings = {**(settings or {}), "default_format": "ArrowStream"}
+        decoder = ArrowStreamDecoder()
+        batches = []
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            batches += decoder.decode(chunk)
+        return decoder.to_table(batches + decoder.flush())
+
+    async def iter_arrow_batches(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> AsyncIterator[Any]:
+        settings = {**(settings or {}), "default_format": "ArrowStream"}
+        decoder = ArrowStreamDecoder()
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            for batch in decoder.decode(chunk):
+                yield batch
+        for batch in decoder.flush():
+            yield batch
+
     async def text(
         self,
         query: str,
@@ -124,17 +581,54 @@ class AsyncClickHouseClient:
         data: Data = None,
         settings: Settings = None,
     ) -> AsyncIterator[str]:
-        stream = await self.stream(query, params, data, settings)
-        async with stream as r:
-            await raise_for_status(r, query)
-            # Faster implementation of httpx.Response.iter_text()
-            # based on a custom version of LineDecoder.
-            decoder = LineDecoder()
-            async for text in r.aiter_text():
-                for line in decoder.decode(text):
+        # Faster implementation of httpx.Response.aiter_lines(),
+        # which splits the bytes before decoding them.
+        if self.decode_executor:
+            async for lines, _ in self.decode(
+                decode_text, query, params, data, settings
+            ):
+                for line in lines:
                     yield line
-            for line in decoder.flush():
+            return
+        decoder = BytesLineDecoder()
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            for line in decoder.decode_text(chunk):
                 yield line
+        for line in decoder.flush_text():
+            yield line
+
+    async def iter_text_batches(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_batch_bytes: Optional[int] = None,
+    ) -> AsyncIterator[List[str]]:
+        """
+        Iterate over the lines in batches of at most `batch_size` lines,
+        and of about `max_batch_bytes` bytes, built from each received chunk.
+        """
+        batcher = Batcher(batch_size, max_batch_bytes)
+        if self.decode_executor:
+            async for lines, size in self.decode(
+                decode_text, query, params, data, settings
+            ):
+                for batch in batcher.add(lines, size):
+                    yield batch
+            for batch in batcher.flush():
+                yield batch
+            return
+        decoder = BytesLineDecoder()
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            for batch in batcher.add(decoder.decode_text(chunk), len(chunk)):
+                yield batch
+        for batch in batcher.add(decoder.flush_text(), 0):
+            yield batch
+        for batch in batcher.flush():
+            yield batch
 
     async def json(
         self,
@@ -142,15 +636,41 @@ class AsyncClickHouseClient:
         params: Params = None,
         data: Data = None,
         settings: Settings = None,
+        *,
+        typed: bool = False,
     ) -> List[dict]:
+        """
+        With `typed`, the values are converted to the Python types of their columns
+        (datetimes, decimals, UUIDs, IPs, ...), as with `rows`.
+        """
+        if typed:
+            settings = {**(settings or {}), **TYPED_JSON_SETTINGS}
+            typed_decoder = JSONCompactDecoder()
+            rows = typed_decoder.decode(await self.bytes(query, params, data, settings))
+            return rows + typed_decoder.flush()
         settings = settings or {}
         settings = {
             **settings,
             "default_format": "JSONEachRow",
             "output_format_json_quote_64bit_integers": 0,
         }
-        result = await self.text(query, params, data, settings)
-        return [json.loads(line) for line in result.split("\n") if line]
+        if self.decode_executor and not self.get_cache_key(
+            query, params, data, settings
+        ):
+            rows = []
+            async for batch, _ in self.decode(
+                decode_json, query, params, data, settings
+            ):
+                rows += batch
+            return rows
+        content = await self.bytes(query, params, data, settings)
+        if self.decode_executor:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.decode_executor, decode_json, content
+            )
+        lines = iter_lines(content, text=json.__name__ == "json")
+        return [json.loads(line) for line in lines if line]
 
     async def iter_json(
         self,
@@ -158,16 +678,320 @@ class AsyncClickHouseClient:
         params: Params = None,
         data: Data = None,
         settings: Settings = None,
+        *,
+        typed: bool = False,
     ) -> AsyncIterator[dict]:
+        if typed:
+            settings = {**(settings or {}), **TYPED_JSON_SETTINGS}
+            typed_decoder = JSONCompactDecoder()
+            async for chunk in self.iter_bytes(query, params, data, settings):
+                for row in typed_decoder.decode(chunk):
+                    yield row
+            for row in typed_decoder.flush():
+                yield row
+            return
+        settings = settings or {}
+        settings = {
+            **settings,
+            "default_format": "JSONEachRow",
+            "output_format_json_quote_64bit_integers": 0,
+        }
+        if self.decode_executor:
+            async for rows, _ in self.decode(
+                decode_json, query, params, data, settings
+            ):
+                for row in rows:
+                    yield row
+            return
+        decoder = BytesLineDecoder()
+        # orjson parses bytes, but the stdlib decodes them line by line,
+        # which is slower than decoding the whole chunks.
+        text = json.__name__ == "json"
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            lines = decoder.decode_text(chunk) if text else decoder.decode(chunk)
+            for line in lines:
+                if line:
+                    yield json.loads(line)
+        for line in decoder.flush():
+            yield json.loads(line)
+
+    async def iter_json_batches(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_batch_bytes: Optional[int] = None,
+        typed: bool = False,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Iterate over the rows in batches of at most `batch_size` rows,
+        and of about `max_batch_bytes` bytes, built from each received chunk.
+        """
+        batcher = Batcher(batch_size, max_batch_bytes)
+        if typed:
+            settings = {**(settings or {}), **TYPED_JSON_SETTINGS}
+            typed_decoder = JSONCompactDecoder()
+            async for chunk in self.iter_bytes(query, params, data, settings):
+                for batch in batcher.add(typed_decoder.decode(chunk), len(chunk)):
+                    yield batch
+            for batch in batcher.add(typed_decoder.flush(), 0):
+                yield batch
+            for batch in batcher.flush():
+                yield batch
+            return
         settings = settings or {}
         settings = {
             **settings,
             "default_format": "JSONEachRow",
             "output_format_json_quote_64bit_integers": 0,
         }
-        async for line in self.iter_text(query, params, data, settings):
-            if line:
-                yield json.loads(line)
+        if self.decode_executor:
+            async for rows, size in self.decode(
+                decode_json, query, params, data, settings
+            ):
+                for batch in batcher.add(rows, size):
+                    yield batch
+            for batch in batcher.flush():
+                yield batch
+            return
+        decoder = BytesLineDecoder()
+        text = json.__name__ == "json"
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            lines = decoder.decode_text(chunk) if text else decoder.decode(chunk)
+            rows = [json.loads(line) for line in lines if line]
+            for batch in batcher.add(rows, len(chunk)):
+                yield batch
+        rows = [json.loads(line) for line in decoder.flush()]
+        for batch in batcher.add(rows, 0):
+            yield batch
+        for batch in batcher.flush():
+            yield batch
+
+    async def rows(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        as_dict: bool = False,
+    ) -> List[Union[tuple, dict]]:
+        settings = {**(settings or {}), "default_format": "RowBinaryWithNamesAndTypes"}
+        decoder = RowBinaryDecoder()
+        rows = decoder.decode(await self.bytes(query, params, data, settings))
+        decoder.flush()
+        if as_dict:
+            return [dict(zip(decoder.names or [], row)) for row in rows]
+        return list(rows)
+
+    async def iter_rows(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        as_dict: bool = False,
+    ) -> AsyncIterator[Union[tuple, dict]]:
+        settings = {**(settings or {}), "default_format": "RowBinaryWithNamesAndTypes"}
+        decoder = RowBinaryDecoder()
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            rows = decoder.decode(chunk)
+            if as_dict:
+                names = decoder.names or []
+                for row in rows:
+                    yield dict(zip(names, row))
+            else:
+                for row in rows:
+                    yield row
+        decoder.flush()
+
+    async def iter_rows_batches(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        as_dict: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_batch_bytes: Optional[int] = None,
+    ) -> AsyncIterator[List[Union[tuple, dict]]]:
+        """
+        Iterate over the rows in batches of at most `batch_size` rows,
+        and of about `max_batch_bytes` bytes, built from each received chunk.
+        """
+        settings = {**(settings or {}), "default_format": "RowBinaryWithNamesAndTypes"}
+        decoder = RowBinaryDecoder()
+        batcher = Batcher(batch_size, max_batch_bytes)
+        async for chunk in self.iter_bytes(query, params, data, settings):
+            rows: List[Any] = decoder.decode(chunk)
+            if as_dict:
+                names = decoder.names or []
+                rows = [dict(zip(names, row)) for row in rows]
+            for batch in batcher.add(rows, len(chunk)):
+                yield batch
+        decoder.flush()
+        for batch in batcher.flush():
+            yield batch
+
+    async def schema(self, table: str) -> List[dict]:
+        """Return the columns of a table, as returned by `DESCRIBE TABLE`."""
+        if table not in self.schemas:
+            self.schemas[table] = await self.json(
+                "DESCRIBE TABLE {table:Identifier}", {"table": table}
+            )
+        return self.schemas[table]
+
+    async def insert(
+        self,
+        table: str,
+        rows: AsyncRows,
+        columns: Optional[Sequence[str]] = None,
+        *,
+        batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+        settings: Settings = None,
+        deduplication_token: Optional[str] = None,
+    ) -> httpx.Response:
+        """
+        Insert rows, or NumPy columns, in a table.
+        Rows are encoded in the RowBinary format, and columns in the Native format,
+        `batch_size` rows at a time, while the request body is streamed.
+        With a retry policy, inserts are retried only if `rows` can be iterated
+        several times (e.g. a list), with a generated `deduplication_token`
+        if none is specified.
+        """
+        if isinstance(rows, Mapping) and columns is None:
+            columns = list(rows)
+        schema = get_insert_schema(await self.schema(table), columns)
+        if isinstance(rows, Mapping):
+            query = get_insert_query(schema, "Native")
+            encode = partial(aiter_native, rows, schema, batch_size)
+        else:
+            query = get_insert_query(schema, "RowBinary")
+            encode = partial(aiter_row_binary, rows, schema, batch_size)
+        data = AsyncReplayable(encode) if is_replayable(rows) else encode()
+        if deduplication_token is None and self.retry and is_replayable(data):
+            deduplication_token = uuid4().hex
+        if deduplication_token:
+            settings = {
+                **(settings or {}),
+                "insert_deduplication_token": deduplication_token,
+            }
+        return await self.execute(query, {"table": table}, data, settings)
+
+    async def insert_batches(
+        self,
+        table: str,
+        rows: Union[AsyncIterable[Any], Iterable[Any]],
+        columns: Optional[Sequence[str]] = None,
+        *,
+        batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+        max_batch_bytes: int = DEFAULT_INSERT_MAX_BYTES,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+        settings: Settings = None,
+    ) -> AsyncIterator[InsertBatch]:
+        """
+        Insert rows from a source in batches of at most `batch_size` rows
+        and of about `max_batch_bytes` bytes, with one INSERT query per batch,
+        and at most `concurrency` queries in flight.
+        The source is read only when a query is done.
+        Each batch is returned with its outcome, in the order of the source
+        if `ordered`, and its `error` is set if it failed.
+        A failed batch can be sent again with `insert_batch`, and its
+        `deduplication_token` prevents duplicates if it was inserted after all.
+        """
+        schema = get_insert_schema(await self.schema(table), columns)
+        query = get_insert_query(schema, "RowBinary")
+
+        async def batches() -> AsyncIterator[InsertBatch]:
+            encoded = aiter_row_binary_batches(
+                rows, schema, batch_size, max_batch_bytes
+            )
+            index = 0
+            async for data, count in encoded:
+                yield InsertBatch(table, query, data, count, index, uuid4().hex)
+                index += 1
+
+        async def run(batch: InsertBatch) -> InsertBatch:
+            try:
+                await self.insert_batch(batch, settings)
+            except Exception as e:
+                batch.error = e
+            return batch
+
+        async for batch in map_tasks(run, batches(), concurrency, ordered):
+            yield batch
+
+    async def insert_batch(
+        self, batch: InsertBatch, settings: Settings = None
+    ) -> httpx.Response:
+        """Insert a batch returned by `insert_batches`."""
+        settings = {
+            **(settings or {}),
+            "insert_deduplication_token": batch.deduplication_token,
+        }
+        return await self.execute(
+            batch.query, {"table": batch.table}, batch.data, settings
+        )
+
+    async def parallel_scan(
+        self,
+        query: str,
+        key: str,
+        partitions: int = DEFAULT_CONCURRENCY,
+        params: Params = None,
+        settings: Settings = None,
+        *,
+        method: str = "iter_json",
+    ) -> AsyncIterator[Any]:
+        """
+        Split a query in `partitions` disjoint slices with `cityHash64(key) % partitions`,
+        run them concurrently over the endpoints of the client, and return the items
+        of `method` (e.g. `iter_json` or `iter_rows`) of each slice as they are received.
+        The results of the slices are interleaved, and not returned in order.
+        The slices are separate queries, so the query must be deterministic
+        (no LIMIT without ORDER BY, no `rand()`, no concurrent writes to the tables),
+        and must not have FORMAT or SETTINGS clauses, which are passed in `settings`.
+        """
+        fn = getattr(self, method)
+        fns = [
+            partial(fn, partition, params, settings=settings)
+            for partition in get_partition_queries(query, key, partitions)
+        ]
+        async for item in merge_tasks(fns, self.prefetch):
+            yield item
+
+    async def map(
+        self,
+        queries: Iterable[Query],
+        method: str = "json",
+        settings: Settings = None,
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+        return_exceptions: bool = False,
+    ) -> AsyncIterator[Any]:
+        """
+        Run queries concurrently with `method` (e.g. `json` or `bytes`),
+        with at most `concurrency` queries in flight.
+        Results are returned in submission order if `ordered`, else in completion order.
+        If `return_exceptions` is set, the exception raised by a query is returned
+        in place of its result, instead of being raised.
+        """
+        fn = getattr(self, method)
+
+        async def run(query: Query) -> Any:
+            return await fn(*get_query_args(query), settings=settings)
+
+        async for result in map_tasks(
+            run, queries, concurrency, ordered, return_exceptions
+        ):
+            yield result
 
 
 async def raise_for_status(response: Response, query: str) -> None:
@@ -1,9 +1,11 @@
 import json
 import os
-from typing import Optional, Tuple
+from typing import Optional, Tuple, cast
+from uuid import uuid4
 
 import httpx
 
+from pych_client.compression import get_accept_encoding
 from pych_client.constants import (
     BASE_URL_ENV,
     CREDENTIALS_FILE,
@@ -15,17 +17,23 @@ from pych_client.constants import (
     PASSWORD_ENV,
     USERNAME_ENV,
 )
+from pych_client.external import (
+    aiter_multipart,
+    get_external_params,
+    get_external_tables,
+    iter_multipart,
+)
 from pych_client.logger import logger
-from pych_client.typing import Params, Settings
+from pych_client.typing import BaseURL, Body, Data, Params, Query, Settings
 from pych_client.version import __version__
 
 
 def get_credentials(
-    base_url: Optional[str],
+    base_url: Optional[BaseURL],
     database: Optional[str],
     username: Optional[str],
     password: Optional[str],
-) -> Tuple[str, str, str, str]:
+) -> Tuple[BaseURL, str, str, str]:
     if base_url or database or username or password:
         logger.debug("using credentials from arguments")
         return (
@@ -68,12 +76,15 @@ def get_client_args(
     settings: Settings,
     connect_timeout: Optional[float],
     read_write_timeout: Optional[float],
+    compression: Optional[str],
+    max_connections: Optional[int],
+    max_keepalive_connections: Optional[int],
 ) -> dict:
     return {
         "auth": (username, password),
         "base_url": base_url,
         "headers": {
-            "Accept-Encoding": "gzip",
+            "Accept-Encoding": get_accept_encoding(compression),
             "User-Agent": f"pych-client/{__version__}",
         },
         "params": {
@@ -81,6 +92,10 @@ def get_client_args(
             "enable_http_compression": True,
             **(settings or {}),
         },
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        ),
         "timeout": httpx.Timeout(
             connect_timeout, read=read_write_timeout, write=read_write_timeout
         ),
@@ -95,3 +110,34 @@ def get_http_params(query: str, params: Params, settings: Settings) -> dict:
     if settings:
         http_params = {**http_params, **settings}
     return http_params
+
+
+def get_request_args(
+    query: str,
+    params: Params,
+    data: Data,
+    settings: Settings,
+    asynchronous: bool,
+) -> Tuple[dict, Body, dict]:
+    """
+    Return the URL parameters, the body and the headers of the request of a query.
+    Without data, the query is sent in the body, since the length of URLs is limited.
+    External tables are streamed as a multipart body.
+    """
+    http_params = get_http_params(query, params, settings)
+    if tables := get_external_tables(data):
+        boundary = uuid4().hex
+        http_params.update(get_external_params(tables))
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        iter_body = aiter_multipart if asynchronous else iter_multipart
+        return http_params, iter_body(tables, boundary), headers
+    if data is None:
+        del http_params["query"]
+        return http_params, query.encode(), {}
+    return http_params, cast(Body, data), {}
+
+
+def get_query_args(query: Query) -> Tuple[str, Params]:
+    if isinstance(query, str):
+        return query, None
+    return query
@@ -0,0 +1,57 @@
+from typing import Any, List, Optional
+
+
+class Batcher:
+    """
+    Group the items decoded from each chunk of a response in batches
+    of at most `batch_size` items, and of about `max_batch_bytes` bytes.
+    The size of the items is estimated from the size of their chunk,
+    so that the items do not have to be measured one by one.
+    """
+
+    def __init__(self, batch_size: int, max_batch_bytes: Optional[int] = None):
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.items: List[Any] = []
+        self.size = 0.0
+
+    def add(self, items: List[Any], size: int) -> List[List[Any]]:
+        """Add the items decoded from a chunk of `size` bytes, and return the full batches."""
+        batches = []
+        item_size = size / len(items) if items else 0.0
+        start = 0
+        while start < len(items):
+            room = self.batch_size - len(self.items)
+            if self.max_batch_bytes and item_size:
+                room = min(room, int((self.max_batch_bytes - self.size) / item_size))
+                if room < 1 and self.items:
+                    batches += self.flush()
+                    continue
+                # Items larger than `max_batch_bytes` are returned one by one.
+                room = max(room, 1)
+            stop = min(start + room, len(items))
+            if not self.items and start == 0 and stop == len(items):
+                # Fast path: the chunk fits in an empty batch.
+                self.items = items
+            else:
+                self.items += items[start:stop]
+            self.size += item_size * (stop - start)
+            start = stop
+            if self.is_full(item_size):
+                batches += self.flush()
+        return batches
+
+    def is_full(self, item_size: float) -> bool:
+        """Return true if the batch cannot hold another item of `item_size` bytes."""
+        if len(self.items) >= self.batch_size:
+            return True
+        if self.max_batch_bytes:
+            return self.size + item_size > self.max_batch_bytes
+        return False
+
+    def flush(self) -> List[List[Any]]:
+        batches = [self.items] if self.items else []
+        self.items, self.size = [], 0.0
+        return batches
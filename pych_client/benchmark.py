@@ -0,0 +1,286 @@
+"""
+Replay queries at a given concurrency, in the spirit of `clickhouse-benchmark`,
+and report the throughput and the latency percentiles of each query.
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import httpx
+
+from pych_client.async_client import AsyncClickHouseClient
+from pych_client.exceptions import ClickHouseException
+from pych_client.pool import AsyncConnectionPool
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+@dataclass
+class QueryReport:
+    query: str
+    queries: int
+    errors: int
+    qps: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    rows_per_second: float
+    bytes_per_second: float
+    read_rows_per_second: Optional[float]
+    read_bytes_per_second: Optional[float]
+
+
+@dataclass
+class QueryMetrics:
+    """
+    Latencies, in seconds, and volumes of the runs of a query.
+    `result_rows` is the number of lines received, `result_bytes` the size of the
+    (uncompressed) results, and `read_rows` and `read_bytes` come from the server.
+    """
+
+    query: str
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    result_rows: int = 0
+    result_bytes: int = 0
+    read_rows: int = 0
+    read_bytes: int = 0
+
+    def merge(self, other: "QueryMetrics") -> None:
+        self.latencies += other.latencies
+        self.errors += other.errors
+        self.result_rows += other.result_rows
+        self.result_bytes += other.result_bytes
+        self.read_rows += other.read_rows
+        self.read_bytes += other.read_bytes
+
+    def report(self, seconds: float, server_stats: bool) -> QueryReport:
+        latencies = sorted(self.latencies)
+        p50, p90, p99 = (percentile(latencies, p) for p in PERCENTILES)
+        seconds = seconds or math.inf
+        return QueryReport(
+            query=self.query,
+            queries=len(latencies),
+            errors=self.errors,
+            qps=len(latencies) / seconds,
+            p50=p50,
+            p90=p90,
+            p99=p99,
+            max=latencies[-1] if latencies else 0.0,
+            rows_per_second=self.result_rows / seconds,
+            bytes_per_second=self.result_bytes / seconds,
+            read_rows_per_second=self.read_rows / seconds if server_stats else None,
+            read_bytes_per_second=self.read_bytes / seconds if server_stats else None,
+        )
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(p * len(values)) - 1)]
+
+
+class LoadGenerator:
+    """
+    Run `queries` with `concurrency` tasks, in order or at random, until
+    `iterations` queries are run, or until `duration` seconds, or until interrupted.
+    Queries in flight when the duration expires are completed.
+    With `server_stats`, the number of rows and bytes read by the server is collected
+    from the `X-ClickHouse-Summary` header, which requires `wait_end_of_query=1`.
+    """
+
+    def __init__(
+        self,
+        queries: Sequence[str],
+        *,
+        concurrency: int = 1,
+        iterations: Optional[int] = None,
+        duration: Optional[float] = None,
+        randomize: bool = False,
+        server_stats: bool = False,
+    ) -> None:
+        self.queries = queries
+        self.concurrency = concurrency
+        self.iterations = iterations
+        self.duration = duration
+        self.randomize = randomize
+        self.server_stats = server_stats
+        self.settings = {"wait_end_of_query": 1} if server_stats else {}
+        self.metrics = [QueryMetrics(query) for query in queries]
+        self.counter = itertools.count()
+        self.start = self.end = 0.0
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    async def run(self, client: AsyncClickHouseClient) -> None:
+        self.start = time.perf_counter()
+        try:
+            workers = (self.work(client) for _ in range(self.concurrency))
+            await asyncio.gather(*workers)
+        finally:
+            self.end = time.perf_counter()
+
+    async def work(self, client: AsyncClickHouseClient) -> None:
+        deadline = self.start + self.duration if self.duration else math.inf
+        for i in self.counter:
+            if self.iterations and i >= self.iterations:
+                return
+            if time.perf_counter() >= deadline:
+                return
+            if self.randomize:
+                index = random.randrange(len(self.queries))
+            else:
+                index = i % len(self.queries)
+            await self.run_query(client, self.metrics[index])
+
+    async def run_query(
+        self, client: AsyncClickHouseClient, metrics: QueryMetrics
+    ) -> None:
+        rows = size = 0
+        start = time.perf_counter()
+        try:
+            async for chunk in client.iter_bytes(metrics.query, settings=self.settings):
+                rows += chunk.count(b"\n")
+                size += len(chunk)
+        except (ClickHouseException, httpx.HTTPError):
+            metrics.errors += 1
+            return
+        metrics.latencies.append(time.perf_counter() - start)
+        metrics.result_rows += rows
+        metrics.result_bytes += size
+        if self.server_stats and (stats := client.stats):
+            metrics.read_rows += stats.read_rows
+            metrics.read_bytes += stats.read_bytes
+
+    def get_reports(self) -> List[QueryReport]:
+        """Return the report of each query, followed by the overall report."""
+        total = QueryMetrics("Total")
+        for metrics in self.metrics:
+            total.merge(metrics)
+        return [
+            metrics.report(self.seconds, self.server_stats)
+            for metrics in [*self.metrics, total]
+        ]
+
+
+def print_report(report: QueryReport) -> None:
+    print(f"{report.query}")
+    print(
+        f"  queries: {report.queries}, errors: {report.errors}, QPS: {report.qps:.2f}, "
+        f"rows/s: {report.rows_per_second:,.0f}, MB/s: {report.bytes_per_second / 1e6:.2f}"
+    )
+    if report.read_rows_per_second is not None:
+        assert report.read_bytes_per_second is not None
+        print(
+            f"  read rows/s: {report.read_rows_per_second:,.0f}, "
+            f"read MB/s: {report.read_bytes_per_second / 1e6:.2f}"
+        )
+    print(
+        f"  latency (ms): p50 {report.p50 * 1e3:.1f}, p90 {report.p90 * 1e3:.1f}, "
+        f"p99 {report.p99 * 1e3:.1f}, max {report.max * 1e3:.1f}"
+    )
+
+
+def read_queries(path: str) -> List[str]:
+    """Read one query per line, ignoring empty lines and `--` comments."""
+    text = sys.stdin.read() if path == "-" else Path(path).read_text()
+    lines = (line.strip() for line in text.splitlines())
+    return [line for line in lines if line and not line.startswith("--")]
+
+
+async def run(generator: LoadGenerator, args: Namespace) -> None:
+    # The number of connections is bounded by the concurrency.
+    async with AsyncConnectionPool(
+        max_connections=None, max_keepalive_connections=None
+    ) as pool, AsyncClickHouseClient(
+        base_url=args.base_url,
+        database=args.database,
+        username=args.username,
+        password=args.password,
+        pool=pool,
+    ) as client:
+        # Connections are opened beforehand, so that their setup is not measured.
+        urls = [endpoint.url for endpoint in client.endpoints.endpoints]
+        await pool.warm_up(urls, args.concurrency)
+        await generator.run(client)
+
+
+def main(args_: Optional[Sequence[str]] = None) -> None:
+    parser = ArgumentParser(prog="pych-client benchmark", description=__doc__)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--username", default=None)
+    parser.add_argument("--password", default=None)
+    parser.add_argument(
+        "queries_file",
+        nargs="?",
+        default="-",
+        help="file with one query per line, or - for stdin (default)",
+    )
+    parser.add_argument(
+        "-q", "--query", action="append", help="query to run (can be repeated)"
+    )
+    parser.add_argument("-c", "--concurrency", default=1, type=int)
+    parser.add_argument("-i", "--iterations", type=int, help="number of queries to run")
+    parser.add_argument("-d", "--duration", type=float, help="duration in seconds")
+    parser.add_argument(
+        "-r", "--randomize", action="store_true", help="run the queries at random"
+    )
+    parser.add_argument(
+        "--server-stats",
+        action="store_true",
+        help="report the rows and bytes read by the server",
+    )
+    parser.add_argument(
+        "--json", help="write the reports to a JSON file, or - for stdout"
+    )
+    args = parser.parse_args(args_)
+
+    queries = args.query or read_queries(args.queries_file)
+    if not queries:
+        parser.error("no queries to run")
+    generator = LoadGenerator(
+        queries,
+        concurrency=args.concurrency,
+        iterations=args.iterations,
+        duration=args.duration,
+        randomize=args.randomize,
+        server_stats=args.server_stats,
+    )
+    try:
+        asyncio.run(run(generator, args))
+    except KeyboardInterrupt:
+        # Report the queries completed before the interruption.
+        if not generator.start:
+            raise
+
+    reports = generator.get_reports()
+    if args.json:
+        data = json.dumps(
+            {
+                "concurrency": generator.concurrency,
+                "seconds": generator.seconds,
+                "queries": [asdict(report) for report in reports[:-1]],
+                "total": asdict(reports[-1]),
+            },
+            indent=2,
+        )
+        if args.json == "-":
+            print(data)
+            return
+        Path(args.json).write_text(data)
+    for report in reports:
+        print_report(report)
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Union
+
+import httpx
+from filelock import FileLock
+
+from pych_client.constants import (
+    DEFAULT_CACHE_MAX_BYTES,
+    DEFAULT_CACHE_MAX_DISK_BYTES,
+    DEFAULT_CACHE_TTL,
+)
+
+# Headers which are not kept, since the cached content is already decoded.
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+# Expiration time and length of the headers, before the headers and the content.
+DISK_HEADER = struct.Struct("<dI")
+
+# Lock of the writers of the on-disk tier, in its directory.
+DISK_LOCK = ".lock"
+
+
+@dataclass
+class CacheEntry:
+    expires: float
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    # Method and URL of the request of the response, without its body and headers.
+    method: str
+    url: str
+
+    def to_response(self) -> httpx.Response:
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=httpx.Request(self.method, self.url),
+        )
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+
+
+class ResultCache:
+    """
+    Cache of the responses of read queries, with an in-memory LRU tier
+    bounded by `max_bytes`, and an optional on-disk tier in `directory`,
+    which can be shared between processes.
+    The on-disk tier is bounded by `max_disk_bytes` and `max_disk_entries`:
+    after each write, the expired files are removed, then the least recently used ones.
+    `ttl` is the lifetime of the results in seconds, or a function which returns
+    the lifetime of the results of a query, or None to not cache them.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        ttl: Union[float, Callable[[str], Optional[float]]] = DEFAULT_CACHE_TTL,
+        directory: Union[str, Path, None] = None,
+        *,
+        max_disk_bytes: int = DEFAULT_CACHE_MAX_DISK_BYTES,
+        max_disk_entries: Optional[int] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = Path(directory) if directory else None
+        self.max_disk_bytes = max_disk_bytes
+        self.max_disk_entries = max_disk_entries
+        self.disk_lock: Optional[FileLock] = None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.disk_lock = FileLock(self.directory / DISK_LOCK)
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.stats = CacheStats()
+        self.lock = threading.Lock()
+
+    def get_ttl(self, query: str) -> Optional[float]:
+        return self.ttl(query) if callable(self.ttl) else self.ttl
+
+    def get(self, key: str) -> Optional[httpx.Response]:
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry.expires <= now:
+                self.remove(key)
+                entry = None
+            if entry:
+                self.entries.move_to_end(key)
+        if not entry and self.directory:
+            if entry := self.read(key, now):
+                with self.lock:
+                    self.store(key, entry)
+        with self.lock:
+            if entry:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+        return entry.to_response() if entry else None
+
+    def set(self, key: str, query: str, response: httpx.Response) -> None:
+        ttl = self.get_ttl(query)
+        if not ttl or response.status_code != 200:
+            return
+        headers = {
+            k: v for k, v in response.headers.items() if k not in DROPPED_HEADERS
+        }
+        request = response.request
+        entry = CacheEntry(
+            time.time() + ttl,
+            response.status_code,
+            headers,
+            response.content,
+            request.method,
+            str(request.url),
+        )
+        with self.lock:
+            self.store(key, entry)
+        if self.directory:
+            self.write(key, entry)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.stats.size = 0
+        if self.directory and self.disk_lock:
+            with self.disk_lock:
+                for pattern in ("*.bin", "*.tmp"):
+                    for path in self.directory.glob(pattern):
+                        path.unlink(missing_ok=True)
+            # A writer which waits for the removed lock file only runs its eviction
+            # concurrently with another one, which is harmless.
+            (self.directory / DISK_LOCK).unlink(missing_ok=True)
+
+    def store(self, key: str, entry: CacheEntry) -> None:
+        if len(entry.content) > self.max_bytes:
+            return
+        self.remove(key)
+        self.entries[key] = entry
+        self.stats.size += len(entry.content)
+        while self.stats.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.stats.size -= len(evicted.content)
+            self.stats.evictions += 1
+
+    def remove(self, key: str) -> None:
+        if entry := self.entries.pop(key, None):
+            self.stats.size -= len(entry.content)
+
+    def path(self, key: str) -> Path:
+        assert self.directory
+        return self.directory / f"{key}.bin"
+
+    def read(self, key: str, now: float) -> Optional[CacheEntry]:
+        # The files are replaced atomically, so they are read without the lock.
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+            # The modification time is the last use, for the eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        expires, size = DISK_HEADER.unpack_from(data)
+        if expires <= now:
+            return None
+        start = DISK_HEADER.size
+        end = start + size
+        status_code, headers, method, url = json.loads(data[start:end])
+        return CacheEntry(expires, status_code, headers, data[end:], method, url)
+
+    def write(self, key: str, entry: CacheEntry) -> None:
+        assert self.disk_lock
+        if len(entry.content) > self.max_disk_bytes:
+            return
+        path = self.path(key)
+        header = json.dumps(
+            [entry.status_code, entry.headers, entry.method, entry.url]
+        ).encode()
+        with self.disk_lock:
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{key}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(DISK_HEADER.pack(entry.expires, len(header)))
+                    f.write(header)
+                    f.write(entry.content)
+                os.replace(tmp, path)
+            finally:
+                Path(tmp).unlink(missing_ok=True)
+            self.evict_files(time.time())
+
+    def evict_files(self, now: float) -> None:
+        """Remove the expired files, then the least recently used ones beyond the bounds."""
+        assert self.directory
+        files = []
+        for path in self.directory.glob("*.bin"):
+            try:
+                with path.open("rb") as f:
+                    expires, _ = DISK_HEADER.unpack(f.read(DISK_HEADER.size))
+                    stat = os.fstat(f.fileno())
+            except (FileNotFoundError, struct.error):
+                continue
+            if expires <= now:
+                path.unlink(missing_ok=True)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        size = sum(x[1] for x in files)
+        count = len(files)
+        max_count = self.max_disk_entries or count
+        for _, file_size, path in files:
+            if size <= self.max_disk_bytes and count <= max_count:
+                break
+            path.unlink(missing_ok=True)
+            size -= file_size
+            count -= 1
+
+
+def get_cache_key(
+    endpoints: Sequence[str],
+    username: str,
+    database: str,
+    settings: Optional[dict],
+    http_params: dict,
+) -> str:
+    """
+    Return a key for a query, its parameters, settings and database,
+    and the servers which run it, since the on-disk tier can be shared by several clients.
+    """
+    http_params = {**http_params, "query": http_params["query"].strip()}
+    key = json.dumps(
+        [sorted(endpoints), username, database, settings or {}, http_params],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
@@ -0,0 +1,68 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, List, Optional
+from uuid import uuid4
+
+from pych_client.exceptions import DeadlineExceeded
+from pych_client.logger import logger
+from pych_client.typing import Settings
+
+# ASYNC returns immediately, since the killed query may take time to stop.
+KILL_QUERY = "KILL QUERY WHERE query_id = {query_id:String} ASYNC"
+
+# Deadline of the queries run in the current thread or task, from `time.monotonic()`.
+current_deadline: ContextVar[Optional[float]] = ContextVar(
+    "current_deadline", default=None
+)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Limit the queries run in the block, including their retries, to `seconds` seconds.
+    The time left is sent with each query as `max_execution_time`,
+    and `DeadlineExceeded` is raised if no time is left before sending a query.
+    A nested deadline cannot extend the outer one.
+    """
+    value = time.monotonic() + seconds
+    if (outer := current_deadline.get()) is not None:
+        value = min(value, outer)
+    token = current_deadline.set(value)
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def get_time_left() -> Optional[float]:
+    if (value := current_deadline.get()) is None:
+        return None
+    return value - time.monotonic()
+
+
+def get_query_settings(settings: Settings) -> dict:
+    """
+    Add a `query_id` to the settings, unless one is given, so that the query
+    can be killed, and the time left before the deadline as `max_execution_time`.
+    """
+    settings = {"query_id": str(uuid4()), **(settings or {})}
+    if (time_left := get_time_left()) is not None:
+        if time_left <= 0:
+            raise DeadlineExceeded("the deadline of the query expired")
+        if limit := float(settings.get("max_execution_time") or 0):
+            time_left = min(time_left, limit)
+        settings["max_execution_time"] = round(max(time_left, 0.001), 3)
+    return settings
+
+
+def check_kill_results(query_id: str, results: List[Any]) -> None:
+    """
+    Raise the first error if the query could not be killed on any endpoint,
+    else log the errors, since the query runs on only one of them.
+    """
+    errors = [x for x in results if isinstance(x, BaseException)]
+    if errors and len(errors) == len(results):
+        raise errors[0]
+    for error in errors:
+        logger.warning("failed to kill query %s", query_id, exc_info=error)
@@ -1,44 +1,144 @@
 import atexit
+import os
+import re
 import readline
+import sys
 from argparse import ArgumentParser
 from contextlib import suppress
+from functools import partial
 from pathlib import Path
-from typing import Optional, Sequence
+from typing import BinaryIO, Iterator, List, Optional, Sequence
 
-from pych_client import ClickHouseClient
+from pych_client import ClickHouseClient, benchmark
+from pych_client.compression import COMPRESSIONS
 from pych_client.exceptions import ClickHouseException
 
 HISTFILE = Path.home() / ".pych-client-history"
 
+# Size of the chunks read from the data file of an INSERT query.
+CHUNK_SIZE = 1024 * 1024
+
+# Queries are separated by a semicolon at the end of a line.
+QUERY_SEPARATOR = re.compile(r";[ \t]*(?:\r?\n|$)")
+
 
 def main(args_: Optional[Sequence[str]] = None) -> None:
+    if args_ is None:
+        args_ = sys.argv[1:]
+    if args_ and args_[0] == "benchmark":
+        return benchmark.main(args_[1:])
+
     parser = ArgumentParser()
     parser.add_argument("--base-url", default=None)
     parser.add_argument("--database", default=None)
     parser.add_argument("--username", default=None)
     parser.add_argument("--password", default=None)
+    parser.add_argument(
+        "-q",
+        "--query",
+        action="append",
+        help="run a query and exit (can be repeated)",
+    )
+    parser.add_argument(
+        "--queries-file",
+        help="run the queries of a file, separated by semicolons, or of stdin with -",
+    )
+    parser.add_argument(
+        "--format",
+        help="output format (default: TabSeparated, or PrettyCompact in the interactive mode)",
+    )
+    parser.add_argument(
+        "--data-file",
+        help="data of an INSERT query, from a file or from stdin with -",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSIONS,
+        help="compression of the request and response bodies",
+    )
     args = parser.parse_args(args_)
 
-    with suppress(FileNotFoundError):
-        readline.read_history_file(HISTFILE)
-
-    readline.parse_and_bind("tab: complete")
-    atexit.register(readline.write_history_file, HISTFILE)
+    if args.data_file == "-" and args.queries_file == "-":
+        parser.error("the queries and the data cannot both be read from stdin")
+    queries = args.query or []
+    if args.queries_file:
+        queries += read_queries(args.queries_file)
+    if args.data_file and len(queries) != 1:
+        parser.error("--data-file requires a single query")
 
     with ClickHouseClient(
         base_url=args.base_url,
         database=args.database,
         username=args.username,
         password=args.password,
+        compression=args.compression,
     ) as client:
-        hostname = client.text("SELECT hostname()")
-        while True:
-            try:
-                inp = input(f"{hostname} :) ").strip()
-                if inp:
-                    out = client.text(inp, settings={"default_format": "PrettyCompact"})
-                    print(out)
-            except ClickHouseException as e:
-                print(f"\033[91m{e}\033[0m")
-            except (EOFError, KeyboardInterrupt):
-                break
+        if args.query or args.queries_file:
+            run(client, queries, args.format or "TabSeparated", args.data_file)
+        else:
+            interact(client, args.format or "PrettyCompact")
+
+
+def interact(client: ClickHouseClient, format_: str) -> None:
+    with suppress(FileNotFoundError):
+        readline.read_history_file(HISTFILE)
+
+    readline.parse_and_bind("tab: complete")
+    atexit.register(readline.write_history_file, HISTFILE)
+
+    hostname = client.text("SELECT hostname()")
+    while True:
+        try:
+            inp = input(f"{hostname} :) ").strip()
+            if inp:
+                out = client.text(inp, settings={"default_format": format_})
+                print(out)
+        except ClickHouseException as e:
+            print(f"\033[91m{e}\033[0m")
+        except (EOFError, KeyboardInterrupt):
+            break
+
+
+def run(
+    client: ClickHouseClient,
+    queries: List[str],
+    format_: str,
+    data_file: Optional[str],
+) -> None:
+    """Run the queries, and write their results to stdout as they are received."""
+    out = sys.stdout.buffer
+    try:
+        for query in queries:
+            if data_file == "-":
+                chunks = read_chunks(sys.stdin.buffer)
+            elif data_file:
+                chunks = read_chunks(open(data_file, "rb"))
+            else:
+                chunks = None
+            settings = {"default_format": format_}
+            # The response is closed on KeyboardInterrupt, which kills the query.
+            with client.stream(query, data=chunks, settings=settings) as r:
+                for chunk in r.iter_bytes():
+                    out.write(chunk)
+            out.flush()
+    except ClickHouseException as e:
+        sys.exit(str(e))
+    except KeyboardInterrupt:
+        sys.exit(130)
+    except BrokenPipeError:
+        # The reader of stdout exited (e.g. `head`): silence the error on exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+def read_queries(path: str) -> List[str]:
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        text = Path(path).read_text()
+    return [query.strip() for query in QUERY_SEPARATOR.split(text) if query.strip()]
+
+
+def read_chunks(f: BinaryIO) -> Iterator[bytes]:
+    with f:
+        yield from iter(partial(f.read, CHUNK_SIZE), b"")
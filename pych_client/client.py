@@ -1,30 +1,111 @@
 import builtins
+import threading
+import time
+import weakref
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import contextmanager
+from contextvars import copy_context
+from functools import partial
 from types import TracebackType
-from typing import Any, Iterator, List, Optional, Type
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+from uuid import uuid4
 
 import httpx
 from httpx import Response
 
-from pych_client.base import get_client_args, get_credentials, get_http_params
+from pych_client.arrow import ArrowStreamDecoder
+from pych_client.base import (
+    get_client_args,
+    get_credentials,
+    get_http_params,
+    get_query_args,
+    get_request_args,
+)
+from pych_client.batches import Batcher
+from pych_client.cache import ResultCache, get_cache_key
+from pych_client.cancellation import (
+    KILL_QUERY,
+    check_kill_results,
+    get_query_settings,
+    get_time_left,
+)
+from pych_client.compression import check_compression, compress_request
+from pych_client.concurrency import map_threads, merge_threads
 from pych_client.constants import (
     CLICKHOUSE_EXCEPTION_CODE_HEADER,
+    CLICKHOUSE_QUERY_ID_HEADER,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
     DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_DECODE_CHUNK_SIZE,
+    DEFAULT_HEALTH_CHECK_INTERVAL,
+    DEFAULT_INSERT_BATCH_SIZE,
+    DEFAULT_LOAD_BALANCING,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    DEFAULT_PREFETCH,
     DEFAULT_READ_WRITE_TIMEOUT,
 )
+from pych_client.decoding import decode_json, decode_text, iter_chunks, iter_decoded
+from pych_client.endpoints import Endpoint, EndpointPool, get_endpoints
 from pych_client.exceptions import ClickHouseException
-from pych_client.line_decoder import LineDecoder
-from pych_client.typing import Data, Params, Settings
+from pych_client.insert import (
+    Rows,
+    get_insert_query,
+    get_insert_schema,
+    iter_native,
+    iter_row_binary,
+)
+from pych_client.json_compact import TYPED_JSON_SETTINGS, JSONCompactDecoder
+from pych_client.line_decoder import BytesLineDecoder, iter_lines
+from pych_client.logger import logger
+from pych_client.native import Block, NativeDecoder, concatenate_blocks
+from pych_client.pool import ConnectionPool
+from pych_client.prepared import PreparedQuery, RequestTemplate
+from pych_client.retry import Replayable, RetryPolicy, is_read_query, is_replayable
+from pych_client.row_binary import RowBinaryDecoder
+from pych_client.scan import get_partition_queries
+from pych_client.stats import (
+    ProgressCallback,
+    QueryStats,
+    get_query_progress,
+    get_query_stats,
+    last_stats,
+)
+from pych_client.typing import BaseURL, Data, Params, Query, Settings
 
 try:
     import orjson as json
 except ModuleNotFoundError:
     import json  # type: ignore
 
+T = TypeVar("T")
+
 
 class ClickHouseClient:
     def __init__(
         self,
-        base_url: Optional[str] = None,
+        base_url: Optional[BaseURL] = None,
         database: Optional[str] = None,
         username: Optional[str] = None,
         password: Optional[str] = None,
@@ -32,20 +113,63 @@ class ClickHouseClient:
         settings: Settings = None,
         connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT,
         read_write_timeout: Optional[float] = DEFAULT_READ_WRITE_TIMEOUT,
+        compression: Optional[str] = None,
+        max_connections: Optional[int] = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: Optional[int] = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        load_balancing: str = DEFAULT_LOAD_BALANCING,
+        health_check_interval: Optional[float] = DEFAULT_HEALTH_CHECK_INTERVAL,
+        retry: Optional[RetryPolicy] = None,
+        hedge_after: Optional[float] = None,
+        cache: Optional[ResultCache] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        decode_executor: Optional[Executor] = None,
+        prefetch: int = DEFAULT_PREFETCH,
+        decode_chunk_size: int = DEFAULT_DECODE_CHUNK_SIZE,
+        pool: Optional[ConnectionPool] = None,
     ):
+        check_compression(compression)
+        if on_progress:
+            settings = {**(settings or {}), "send_progress_in_http_headers": 1}
         base_url, database, username, password = get_credentials(
             base_url, database, username, password
         )
-        self.config = {
-            "base_url": base_url,
+        self.endpoints = EndpointPool(get_endpoints(base_url), load_balancing)
+        self.config: dict = {
+            "base_url": self.endpoints.endpoints[0].url,
             "database": database,
             "username": username,
             "password": password,
             "settings": settings,
             "connect_timeout": connect_timeout,
             "read_write_timeout": read_write_timeout,
+            "compression": compression,
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
         }
-        self.client = httpx.Client(**get_client_args(**self.config))  # type: ignore
+        self.retry = retry
+        self.hedge_after = hedge_after
+        self.cache = cache
+        self.on_progress = on_progress
+        self.decode_executor = decode_executor
+        self.prefetch = prefetch
+        self.decode_chunk_size = decode_chunk_size
+        self.schemas: Dict[str, List[dict]] = {}
+        # The limits of a shared pool replace `max_connections` and `max_keepalive_connections`.
+        self.client = httpx.Client(
+            **get_client_args(**self.config),
+            transport=pool.get_transport() if pool else None,
+        )
+        self.executor: Optional[ThreadPoolExecutor] = None
+        if hedge_after is not None:
+            self.executor = ThreadPoolExecutor(thread_name_prefix="pych-client-hedge")
+        self.closed = threading.Event()
+        if len(self.endpoints) > 1 and health_check_interval:
+            # The thread holds a weak reference, so that unclosed clients are collected.
+            threading.Thread(
+                target=check_health_periodically,
+                args=(weakref.ref(self), self.closed, health_check_interval),
+                daemon=True,
+            ).start()
 
     def __enter__(self) -> "ClickHouseClient":
         return self
@@ -56,8 +180,60 @@ class ClickHouseClient:
         exc_val: Optional[BaseException],
         exc_tb: Optional[TracebackType],
     ) -> None:
+        self.closed.set()
+        if self.executor:
+            self.executor.shutdown(wait=False)
         self.client.close()
 
+    @property
+    def stats(self) -> Optional[QueryStats]:
+        """Statistics of the last query run in the current thread or task."""
+        return last_stats.get()
+
+    def check_health(self) -> None:
+        """Run `SELECT 1` on each endpoint, and update its status."""
+        for endpoint in self.endpoints.endpoints:
+            try:
+                r = self.client.post(
+                    endpoint.url,
+                    params={"query": "SELECT 1"},
+                    timeout=self.config["connect_timeout"],
+                )
+                healthy = r.is_success
+            except httpx.HTTPError:
+                healthy = False
+            self.endpoints.set_healthy(endpoint, healthy)
+
+    def cancel(self, query_id: str) -> None:
+        """
+        Kill the query `query_id`, on each endpoint since it can run on any of them.
+        An error is raised only if the query could not be killed on any endpoint.
+        """
+        endpoints = self.endpoints.endpoints
+        send_kill = partial(self.send_kill, query_id=query_id)
+        results = map_threads(
+            send_kill, endpoints, len(endpoints), return_exceptions=True
+        )
+        check_kill_results(query_id, list(results))
+
+    def send_kill(self, endpoint: Endpoint, query_id: str) -> None:
+        # The connection of the query is busy, so another one is used.
+        r = self.client.post(
+            endpoint.url,
+            params=get_http_params(KILL_QUERY, {"query_id": query_id}, None),
+            timeout=self.config["connect_timeout"],
+        )
+        raise_for_status(r, KILL_QUERY)
+
+    def kill_query(self, endpoint: Endpoint, query_id: Optional[str]) -> None:
+        """Kill a query abandoned by the client, which the server would keep running."""
+        if not query_id:
+            return
+        try:
+            self.send_kill(endpoint, query_id)
+        except Exception:
+            logger.warning("failed to kill query %s", query_id, exc_info=True)
+
     def execute(
         self,
         query: str,
@@ -65,28 +241,198 @@ class ClickHouseClient:
         data: Data = None,
         settings: Settings = None,
     ) -> httpx.Response:
-        r = self.client.post(
-            "/",
-            content=data,
-            params=get_http_params(query, params, settings),
-        )
-        raise_for_status(r, query)
+        key = self.get_cache_key(query, params, data, settings)
+        if self.cache and key and (cached := self.cache.get(key)):
+            self.record_stats(cached, 0.0)
+            return cached
+        r, endpoint = self.send(query, params, data, settings, stream=False)
+        self.endpoints.release(endpoint)
+        if self.cache and key:
+            self.cache.set(key, query, r)
         return r
 
+    def prepare(self, query: str, settings: Settings = None) -> PreparedQuery:
+        """
+        Prepare a query run many times with different parameters,
+        whose request is encoded once, e.g. `client.prepare(query)(params)`.
+        """
+        return PreparedQuery(self, query, settings)
+
+    def get_cache_key(
+        self, query: str, params: Params, data: Data, settings: Settings
+    ) -> Optional[str]:
+        """Return the cache key of a read query, or None if it cannot be cached."""
+        if not self.cache or not is_read_query(query, data):
+            return None
+        return get_cache_key(
+            [x.url for x in self.endpoints.endpoints],
+            self.config["username"],
+            self.config["database"],
+            self.config["settings"],
+            get_http_params(query, params, settings),
+        )
+
+    @contextmanager
     def stream(
         self,
         query: str,
         params: Params = None,
         data: Data = None,
         settings: Settings = None,
-    ) -> Any:
-        return self.client.stream(
+    ) -> Iterator[Response]:
+        r, endpoint = self.send(query, params, data, settings, stream=True)
+        try:
+            yield r
+        finally:
+            self.close_response(r, endpoint)
+
+    def close_response(self, r: Response, endpoint: Endpoint) -> None:
+        """Close the response, and kill its query if the response was not fully read."""
+        if not r.is_closed:
+            r.close()
+            self.kill_query(endpoint, r.headers.get(CLICKHOUSE_QUERY_ID_HEADER))
+        self.endpoints.release(endpoint)
+
+    def send(
+        self,
+        query: str,
+        params: Params,
+        data: Data,
+        settings: Settings,
+        stream: bool,
+        template: Optional[RequestTemplate] = None,
+    ) -> Tuple[Response, Endpoint]:
+        """
+        Send the query, with retries according to the retry policy,
+        and hedged requests for read queries if `hedge_after` is set.
+        The endpoint of the response must be released by the caller.
+        """
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                if self.hedge_after is not None and is_read_query(query, data):
+                    r, endpoint = self.send_hedged(
+                        query, params, data, settings, stream, template
+                    )
+                else:
+                    r, endpoint = self.send_once(
+                        query, params, data, settings, stream, template
+                    )
+                break
+            except Exception as e:
+                if not (
+                    self.retry
+                    and self.retry.should_retry(e, attempt, query, data, settings)
+                ):
+                    raise
+                delay = self.retry.delay(attempt)
+                if (time_left := get_time_left()) is not None and time_left <= delay:
+                    raise
+                logger.info("retrying in %.3fs after %r", delay, e)
+                time.sleep(delay)
+                attempt += 1
+        self.record_stats(r, time.monotonic() - start)
+        return r, endpoint
+
+    def record_stats(self, r: Response, elapsed: float) -> None:
+        last_stats.set(get_query_stats(r, elapsed))
+        if self.on_progress:
+            for progress in get_query_progress(r):
+                self.on_progress(progress)
+
+    def send_once(
+        self,
+        query: str,
+        params: Params,
+        data: Data,
+        settings: Settings,
+        stream: bool,
+        template: Optional[RequestTemplate] = None,
+    ) -> Tuple[Response, Endpoint]:
+        settings = get_query_settings(settings)
+        endpoint = self.endpoints.acquire()
+        try:
+            if template:
+                request = template.build(endpoint.url, params, settings)
+            else:
+                request = self.build_request(endpoint, query, params, data, settings)
+            start = time.monotonic()
+            r = self.client.send(request, stream=stream)
+            self.endpoints.record_latency(endpoint, time.monotonic() - start)
+            try:
+                raise_for_status(r, query)
+            except ClickHouseException:
+                r.close()
+                raise
+        except httpx.TransportError:
+            self.endpoints.set_healthy(endpoint, False)
+            self.endpoints.release(endpoint)
+            raise
+        except BaseException as e:
+            self.endpoints.release(endpoint)
+            # The query keeps running if the client is interrupted (KeyboardInterrupt).
+            if not isinstance(e, Exception):
+                self.kill_query(endpoint, settings["query_id"])
+            raise
+        return r, endpoint
+
+    def build_request(
+        self,
+        endpoint: Endpoint,
+        query: str,
+        params: Params,
+        data: Data,
+        settings: dict,
+    ) -> httpx.Request:
+        http_params, body, headers = get_request_args(
+            query, params, data, settings, asynchronous=False
+        )
+        content, content_headers = compress_request(body, self.config["compression"])
+        return self.client.build_request(
             "POST",
-            "/",
-            content=data,
-            params=get_http_params(query, params, settings),
+            endpoint.url,
+            content=content,
+            headers={**headers, **content_headers},
+            params=http_params,
         )
 
+    def send_hedged(
+        self,
+        query: str,
+        params: Params,
+        data: Data,
+        settings: Settings,
+        stream: bool,
+        template: Optional[RequestTemplate] = None,
+    ) -> Tuple[Response, Endpoint]:
+        """
+        Send a second request if the first one did not succeed
+        within `hedge_after` seconds, and keep the first successful response.
+        """
+        assert self.executor
+        send = partial(self.send_once, query, params, data, settings, stream, template)
+        # The requests are sent with the context of the caller, e.g. its deadline.
+        futures = [self.executor.submit(copy_context().run, send)]
+        # The second request is also sent if the first one failed early.
+        wait(futures, timeout=self.hedge_after)
+        if not futures[0].done() or futures[0].exception():
+            futures.append(self.executor.submit(copy_context().run, send))
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if succeeded := [x for x in done if not x.exception()]:
+                # The other requests cannot be interrupted,
+                # so their responses are discarded, and their queries killed, once received.
+                for future in [*succeeded[1:], *pending]:
+                    future.add_done_callback(self.discard)
+                return succeeded[0].result()
+        return futures[0].result()
+
+    def discard(self, future: Future) -> None:
+        if not future.exception():
+            self.close_response(*future.result())
+
     def bytes(
         self,
         query: str,
@@ -104,9 +450,78 @@ class ClickHouseClient:
         settings: Settings = None,
     ) -> Iterator[builtins.bytes]:
         with self.stream(query, params, data, settings) as r:
-            raise_for_status(r, query)
             yield from r.iter_bytes()
 
+    def decode(
+        self,
+        fn: Callable[[builtins.bytes], List[T]],
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> Iterator[Tuple[List[T], int]]:
+        """
+        Decode the response in `decode_executor`, by chunks of complete lines,
+        while it is received.
+        """
+        assert self.decode_executor
+        chunks = self.iter_bytes(query, params, data, settings)
+        return iter_decoded(
+            chunks, fn, self.decode_executor, self.prefetch, self.decode_chunk_size
+        )
+
+    def columns(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> Block:
+        settings = {**(settings or {}), "default_format": "Native"}
+        decoder = NativeDecoder()
+        blocks = decoder.decode(self.bytes(query, params, data, settings))
+        return concatenate_blocks(blocks + decoder.flush())
+
+    def iter_blocks(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> Iterator[Block]:
+        settings = {**(settings or {}), "default_format": "Native"}
+        decoder = NativeDecoder()
+        for chunk in self.iter_bytes(query, params, data, settings):
+            yield from decoder.decode(chunk)
+        yield from decoder.flush()
+
+    def arrow(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> Any:
+        settings = {**(settings or {}), "default_format": "ArrowStream"}
+        decoder = ArrowStreamDecoder()
+        batches = []
+        for chunk in self.iter_bytes(query, params, data, settings):
+            batches += decoder.decode(chunk)
+        return decoder.to_table(batches + decoder.flush())
+
+    def iter_arrow_batches(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+    ) -> Iterator[Any]:
+        settings = {**(settings or {}), "default_format": "ArrowStream"}
+        decoder = ArrowStreamDecoder()
+        for chunk in self.iter_bytes(query, params, data, settings):
+            yield from decoder.decode(chunk)
+        yield from decoder.flush()
+
     def text(
         self,
         query: str,
@@ -123,16 +538,42 @@ class ClickHouseClient:
         data: Data = None,
         settings: Settings = None,
     ) -> Iterator[str]:
-        with self.stream(query, params, data, settings) as r:
-            raise_for_status(r, query)
-            # Faster implementation of httpx.Response.iter_text()
-            # based on a custom version of LineDecoder.
-            decoder = LineDecoder()
-            for text in r.iter_text():
-                for line in decoder.decode(text):
-                    yield line
-            for line in decoder.flush():
-                yield line
+        # Faster implementation of httpx.Response.iter_lines(),
+        # which splits the bytes before decoding them.
+        if self.decode_executor:
+            for lines, _ in self.decode(decode_text, query, params, data, settings):
+                yield from lines
+            return
+        decoder = BytesLineDecoder()
+        for chunk in self.iter_bytes(query, params, data, settings):
+            yield from decoder.decode_text(chunk)
+        yield from decoder.flush_text()
+
+    def iter_text_batches(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_batch_bytes: Optional[int] = None,
+    ) -> Iterator[List[str]]:
+        """
+        Iterate over the lines in batches of at most `batch_size` lines,
+        and of about `max_batch_bytes` bytes, built from each received chunk.
+        """
+        batcher = Batcher(batch_size, max_batch_bytes)
+        if self.decode_executor:
+            for lines, size in self.decode(decode_text, query, params, data, settings):
+                yield from batcher.add(lines, size)
+            yield from batcher.flush()
+            return
+        decoder = BytesLineDecoder()
+        for chunk in self.iter_bytes(query, params, data, settings):
+            yield from batcher.add(decoder.decode_text(chunk), len(chunk))
+        yield from batcher.add(decoder.flush_text(), 0)
+        yield from batcher.flush()
 
     def json(
         self,
@@ -140,15 +581,44 @@ class ClickHouseClient:
         params: Params = None,
         data: Data = None,
         settings: Settings = None,
+        *,
+        typed: bool = False,
     ) -> List[dict]:
+        """
+        With `typed`, the values are converted to the Python types of their columns
+        (datetimes, decimals, UUIDs, IPs, ...), as with `rows`.
+        """
+        if typed:
+            settings = {**(settings or {}), **TYPED_JSON_SETTINGS}
+            typed_decoder = JSONCompactDecoder()
+            rows = typed_decoder.decode(self.bytes(query, params, data, settings))
+            return rows + typed_decoder.flush()
         settings = settings or {}
         settings = {
             **settings,
             "default_format": "JSONEachRow",
             "output_format_json_quote_64bit_integers": 0,
         }
-        result = self.text(query, params, data, settings)
-        return [json.loads(line) for line in result.split("\n") if line]
+        if self.decode_executor and not self.get_cache_key(
+            query, params, data, settings
+        ):
+            rows = []
+            for batch, _ in self.decode(decode_json, query, params, data, settings):
+                rows += batch
+            return rows
+        content = self.bytes(query, params, data, settings)
+        if self.decode_executor:
+            chunks = iter_chunks(content, self.decode_chunk_size)
+            decoded = iter_decoded(
+                chunks,
+                decode_json,
+                self.decode_executor,
+                self.prefetch,
+                self.decode_chunk_size,
+            )
+            return [row for batch, _ in decoded for row in batch]
+        lines = iter_lines(content, text=json.__name__ == "json")
+        return [json.loads(line) for line in lines if line]
 
     def iter_json(
         self,
@@ -156,16 +626,255 @@ class ClickHouseClient:
         params: Params = None,
         data: Data = None,
         settings: Settings = None,
+        *,
+        typed: bool = False,
     ) -> Iterator[dict]:
+        if typed:
+            settings = {**(settings or {}), **TYPED_JSON_SETTINGS}
+            typed_decoder = JSONCompactDecoder()
+            for chunk in self.iter_bytes(query, params, data, settings):
+                yield from typed_decoder.decode(chunk)
+            yield from typed_decoder.flush()
+            return
+        settings = settings or {}
+        settings = {
+            **settings,
+            "default_format": "JSONEachRow",
+            "output_format_json_quote_64bit_integers": 0,
+        }
+        if self.decode_executor:
+            for rows, _ in self.decode(decode_json, query, params, data, settings):
+                yield from rows
+            return
+        decoder = BytesLineDecoder()
+        # orjson parses bytes, but the stdlib decodes them line by line,
+        # which is slower than decoding the whole chunks.
+        text = json.__name__ == "json"
+        for chunk in self.iter_bytes(query, params, data, settings):
+            lines = decoder.decode_text(chunk) if text else decoder.decode(chunk)
+            for line in lines:
+                if line:
+                    yield json.loads(line)
+        for line in decoder.flush():
+            yield json.loads(line)
+
+    def iter_json_batches(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_batch_bytes: Optional[int] = None,
+        typed: bool = False,
+    ) -> Iterator[List[dict]]:
+        """
+        Iterate over the rows in batches of at most `batch_size` rows,
+        and of about `max_batch_bytes` bytes, built from each received chunk.
+        """
+        batcher = Batcher(batch_size, max_batch_bytes)
+        if typed:
+            settings = {**(settings or {}), **TYPED_JSON_SETTINGS}
+            typed_decoder = JSONCompactDecoder()
+            for chunk in self.iter_bytes(query, params, data, settings):
+                yield from batcher.add(typed_decoder.decode(chunk), len(chunk))
+            yield from batcher.add(typed_decoder.flush(), 0)
+            yield from batcher.flush()
+            return
         settings = settings or {}
         settings = {
             **settings,
             "default_format": "JSONEachRow",
             "output_format_json_quote_64bit_integers": 0,
         }
-        for line in self.iter_text(query, params, data, settings):
-            if line:
-                yield json.loads(line)
+        if self.decode_executor:
+            for rows, size in self.decode(decode_json, query, params, data, settings):
+                yield from batcher.add(rows, size)
+            yield from batcher.flush()
+            return
+        decoder = BytesLineDecoder()
+        text = json.__name__ == "json"
+        for chunk in self.iter_bytes(query, params, data, settings):
+            lines = decoder.decode_text(chunk) if text else decoder.decode(chunk)
+            rows = [json.loads(line) for line in lines if line]
+            yield from batcher.add(rows, len(chunk))
+        rows = [json.loads(line) for line in decoder.flush()]
+        yield from batcher.add(rows, 0)
+        yield from batcher.flush()
+
+    def rows(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        as_dict: bool = False,
+    ) -> List[Union[tuple, dict]]:
+        settings = {**(settings or {}), "default_format": "RowBinaryWithNamesAndTypes"}
+        decoder = RowBinaryDecoder()
+        rows = decoder.decode(self.bytes(query, params, data, settings))
+        decoder.flush()
+        if as_dict:
+            return [dict(zip(decoder.names or [], row)) for row in rows]
+        return list(rows)
+
+    def iter_rows(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        as_dict: bool = False,
+    ) -> Iterator[Union[tuple, dict]]:
+        settings = {**(settings or {}), "default_format": "RowBinaryWithNamesAndTypes"}
+        decoder = RowBinaryDecoder()
+        for chunk in self.iter_bytes(query, params, data, settings):
+            rows = decoder.decode(chunk)
+            if as_dict:
+                names = decoder.names or []
+                for row in rows:
+                    yield dict(zip(names, row))
+            else:
+                yield from rows
+        decoder.flush()
+
+    def iter_rows_batches(
+        self,
+        query: str,
+        params: Params = None,
+        data: Data = None,
+        settings: Settings = None,
+        *,
+        as_dict: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_batch_bytes: Optional[int] = None,
+    ) -> Iterator[List[Union[tuple, dict]]]:
+        """
+        Iterate over the rows in batches of at most `batch_size` rows,
+        and of about `max_batch_bytes` bytes, built from each received chunk.
+        """
+        settings = {**(settings or {}), "default_format": "RowBinaryWithNamesAndTypes"}
+        decoder = RowBinaryDecoder()
+        batcher = Batcher(batch_size, max_batch_bytes)
+        for chunk in self.iter_bytes(query, params, data, settings):
+            rows: List[Any] = decoder.decode(chunk)
+            if as_dict:
+                names = decoder.names or []
+                rows = [dict(zip(names, row)) for row in rows]
+            yield from batcher.add(rows, len(chunk))
+        decoder.flush()
+        yield from batcher.flush()
+
+    def schema(self, table: str) -> List[dict]:
+        """Return the columns of a table, as returned by `DESCRIBE TABLE`."""
+        if table not in self.schemas:
+            self.schemas[table] = self.json(
+                "DESCRIBE TABLE {table:Identifier}", {"table": table}
+            )
+        return self.schemas[table]
+
+    def insert(
+        self,
+        table: str,
+        rows: Rows,
+        columns: Optional[Sequence[str]] = None,
+        *,
+        batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+        settings: Settings = None,
+        deduplication_token: Optional[str] = None,
+    ) -> httpx.Response:
+        """
+        Insert rows, or NumPy columns, in a table.
+        Rows are encoded in the RowBinary format, and columns in the Native format,
+        `batch_size` rows at a time, while the request body is streamed.
+        With a retry policy, inserts are retried only if `rows` can be iterated
+        several times (e.g. a list), with a generated `deduplication_token`
+        if none is specified.
+        """
+        if isinstance(rows, Mapping) and columns is None:
+            columns = list(rows)
+        schema = get_insert_schema(self.schema(table), columns)
+        if isinstance(rows, Mapping):
+            query = get_insert_query(schema, "Native")
+            encode = partial(iter_native, rows, schema, batch_size)
+        else:
+            query = get_insert_query(schema, "RowBinary")
+            encode = partial(iter_row_binary, rows, schema, batch_size)
+        data = Replayable(encode) if is_replayable(rows) else encode()
+        if deduplication_token is None and self.retry and is_replayable(data):
+            deduplication_token = uuid4().hex
+        if deduplication_token:
+            settings = {
+                **(settings or {}),
+                "insert_deduplication_token": deduplication_token,
+            }
+        return self.execute(query, {"table": table}, data, settings)
+
+    def parallel_scan(
+        self,
+        query: str,
+        key: str,
+        partitions: int = DEFAULT_CONCURRENCY,
+        params: Params = None,
+        settings: Settings = None,
+        *,
+        method: str = "iter_json",
+    ) -> Iterator[Any]:
+        """
+        Split a query in `partitions` disjoint slices with `cityHash64(key) % partitions`,
+        run them concurrently over the endpoints of the client, and return the items
+        of `method` (e.g. `iter_json` or `iter_rows`) of each slice as they are received.
+        The results of the slices are interleaved, and not returned in order.
+        The slices are separate queries, so the query must be deterministic
+        (no LIMIT without ORDER BY, no `rand()`, no concurrent writes to the tables),
+        and must not have FORMAT or SETTINGS clauses, which are passed in `settings`.
+        """
+        fn = getattr(self, method)
+        fns = [
+            partial(fn, partition, params, settings=settings)
+            for partition in get_partition_queries(query, key, partitions)
+        ]
+        yield from merge_threads(fns, self.prefetch)
+
+    def map(
+        self,
+        queries: Iterable[Query],
+        method: str = "json",
+        settings: Settings = None,
+        *,
+        workers: int = DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+        return_exceptions: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Run queries in a thread pool with `method` (e.g. `json` or `bytes`),
+        with at most `workers` queries in flight over the shared connection pool.
+        Results are returned in submission order if `ordered`, else in completion order.
+        If `return_exceptions` is set, the exception raised by a query is returned
+        in place of its result, instead of being raised.
+        """
+        fn = getattr(self, method)
+
+        def run(query: Query) -> Any:
+            return fn(*get_query_args(query), settings=settings)
+
+        yield from map_threads(run, queries, workers, ordered, return_exceptions)
+
+
+def check_health_periodically(
+    ref: "weakref.ref[ClickHouseClient]", closed: threading.Event, interval: float
+) -> None:
+    """Check the endpoints until the client is closed, or garbage collected."""
+    while not closed.wait(interval):
+        client = ref()
+        if client is None:
+            return
+        client.check_health()
+        # No reference is kept while waiting.
+        del client
 
 
 def raise_for_status(response: Response, query: str) -> None:
@@ -0,0 +1,176 @@
+import zlib
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+from pych_client.typing import Body
+
+try:
+    from httpx._decoders import SUPPORTED_DECODERS, ContentDecoder
+except ImportError:  # pragma: no cover
+    # The decoders of httpx are private, and may change without notice.
+    SUPPORTED_DECODERS = None  # type: ignore
+    ContentDecoder = object  # type: ignore
+
+try:
+    import zstandard
+except ModuleNotFoundError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+try:
+    import lz4.frame  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover
+    lz4 = None
+
+COMPRESSIONS = ("gzip", "lz4", "zstd")
+
+
+class LZ4Decoder(ContentDecoder):
+    """Handle 'lz4' decoding, which is not supported by httpx."""
+
+    def __init__(self) -> None:
+        self.decompressor = lz4.frame.LZ4FrameDecompressor()
+
+    def decode(self, data: bytes) -> bytes:
+        result = []
+        while data:
+            if self.decompressor.eof:
+                # The body can contain several frames.
+                self.decompressor = lz4.frame.LZ4FrameDecompressor()
+            result.append(self.decompressor.decompress(data))
+            data = self.decompressor.unused_data if self.decompressor.eof else b""
+        return b"".join(result)
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class ZstdDecoder(ContentDecoder):
+    """Handle 'zstd' decoding, which is only supported by httpx >= 0.27."""
+
+    def __init__(self) -> None:
+        self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def decode(self, data: bytes) -> bytes:
+        result = []
+        while data:
+            if self.decompressor.eof:
+                # The body can contain several frames.
+                self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+            result.append(self.decompressor.decompress(data))
+            data = self.decompressor.unused_data if self.decompressor.eof else b""
+        return b"".join(result)
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def register_decoder(compression: Optional[str]) -> bool:
+    """
+    Register the response decoder of `compression` if httpx does not support it,
+    and return whether httpx can decode the responses compressed with it.
+    This relies on httpx internals: httpx has no public API for content decoders,
+    and selects the decoder of a response from the private, process-wide
+    `httpx._decoders.SUPPORTED_DECODERS` mapping. It is therefore only modified
+    by the clients created with lz4 or zstd compression.
+    """
+    decoders = {"lz4": LZ4Decoder, "zstd": ZstdDecoder}
+    if compression not in decoders:
+        return False
+    try:
+        SUPPORTED_DECODERS.setdefault(compression, decoders[compression])
+    except AttributeError:  # pragma: no cover
+        return False
+    return True
+
+
+class Compressor:
+    """Incremental compressor with the same interface for all the codecs."""
+
+    def __init__(self, compression: str) -> None:
+        self.header = b""
+        if compression == "gzip":
+            self.compressor: Any = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        elif compression == "zstd":
+            self.compressor = zstandard.ZstdCompressor().compressobj()
+        elif compression == "lz4":
+            self.compressor = lz4.frame.LZ4FrameCompressor()
+            self.header = self.compressor.begin()
+        else:
+            raise ValueError(f"unsupported compression: {compression}")
+
+    def compress(self, data: bytes) -> bytes:
+        header, self.header = self.header, b""
+        compressed: bytes = self.compressor.compress(data)
+        return header + compressed
+
+    def flush(self) -> bytes:
+        header, self.header = self.header, b""
+        compressed: bytes = self.compressor.flush()
+        return header + compressed
+
+
+def check_compression(compression: Optional[str]) -> None:
+    if compression is None:
+        return
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unsupported compression: {compression}")
+    if compression == "zstd" and not zstandard:
+        raise ModuleNotFoundError("zstandard is required for zstd compression")
+    if compression == "lz4" and not lz4:
+        raise ModuleNotFoundError("lz4 is required for lz4 compression")
+
+
+def get_accept_encoding(compression: Optional[str]) -> str:
+    # Without a decoder, the responses are still compressed with gzip.
+    if register_decoder(compression):
+        return f"{compression}, gzip"
+    return "gzip"
+
+
+def compress_request(
+    data: Body, compression: Optional[str]
+) -> Tuple[Body, Dict[str, str]]:
+    """Return the compressed request body and its headers."""
+    if data is None or compression is None:
+        return data, {}
+    return compress_data(data, compression), {"Content-Encoding": compression}
+
+
+def compress_data(data: Body, compression: Optional[str]) -> Body:
+    """Compress the request body, incrementally if it is an iterator."""
+    if data is None or compression is None:
+        return data
+    if isinstance(data, str):
+        data = data.encode()
+    if isinstance(data, bytes):
+        compressor = Compressor(compression)
+        return compressor.compress(data) + compressor.flush()
+    if isinstance(data, AsyncIterable):
+        return acompress_chunks(data, compression)
+    return compress_chunks(data, compression)
+
+
+def compress_chunks(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    compressor = Compressor(compression)
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+async def acompress_chunks(
+    chunks: AsyncIterable[bytes], compression: str
+) -> AsyncIterator[bytes]:
+    compressor = Compressor(compression)
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,238 @@
+import asyncio
+import queue
+import threading
+from collections import deque
+from collections.abc import AsyncGenerator, Generator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TypeVar,
+    Union,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Number of items passed at once from a producer to the consumer of merged streams.
+MERGE_BATCH_SIZE = 1024
+
+
+def map_threads(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    workers: int,
+    ordered: bool = True,
+    return_exceptions: bool = False,
+) -> Iterator[Any]:
+    """
+    Apply `fn` to each item in a thread pool, with at most `workers` items in flight,
+    in the context of the caller (e.g. its deadline).
+    Results are returned in submission order if `ordered`, else in completion order.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(workers) as executor:
+        pending: Deque[Future] = deque()
+        try:
+            for item in items:
+                pending.append(executor.submit(copy_context().run, fn, item))
+                if len(pending) >= workers:
+                    yield from pop_futures(pending, ordered, return_exceptions)
+            while pending:
+                yield from pop_futures(pending, ordered, return_exceptions)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def pop_futures(
+    pending: Deque[Future], ordered: bool, return_exceptions: bool
+) -> Iterator[Any]:
+    if ordered:
+        done = [pending.popleft()]
+        wait(done)
+    else:
+        done = list(wait(pending, return_when=FIRST_COMPLETED).done)
+        for future in done:
+            pending.remove(future)
+    for future in done:
+        if exception := future.exception():
+            if not return_exceptions:
+                raise exception
+            yield exception
+        else:
+            yield future.result()
+
+
+async def aiter_items(items: Union[Iterable[T], AsyncIterable[T]]) -> AsyncIterator[T]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def map_tasks(
+    fn: Callable[[T], Awaitable[R]],
+    items: Union[Iterable[T], AsyncIterable[T]],
+    concurrency: int,
+    ordered: bool = True,
+    return_exceptions: bool = False,
+) -> AsyncIterator[Any]:
+    """
+    Apply `fn` to each item in a task, with at most `concurrency` tasks in flight.
+    The next item is taken from `items` only when a task is done.
+    Results are returned in submission order if `ordered`, else in completion order.
+    """
+    pending: Deque[asyncio.Task] = deque()
+    try:
+        async for item in aiter_items(items):
+            pending.append(asyncio.ensure_future(fn(item)))
+            if len(pending) >= concurrency:
+                async for result in pop_tasks(pending, ordered, return_exceptions):
+                    yield result
+        while pending:
+            async for result in pop_tasks(pending, ordered, return_exceptions):
+                yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def pop_tasks(
+    pending: Deque[asyncio.Task], ordered: bool, return_exceptions: bool
+) -> AsyncIterator[Any]:
+    done: Iterable[asyncio.Task]
+    if ordered:
+        task = pending.popleft()
+        await asyncio.wait([task])
+        done = [task]
+    else:
+        completed: Set[asyncio.Task]
+        completed, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in completed:
+            pending.remove(task)
+        done = completed
+    for task in done:
+        if exception := task.exception():
+            if not return_exceptions:
+                raise exception
+            yield exception
+        else:
+            yield task.result()
+
+
+def merge_threads(
+    fns: Sequence[Callable[[], Iterable[T]]], maxsize: int
+) -> Iterator[T]:
+    """
+    Iterate over the iterables returned by `fns`, each in its own thread
+    with the context of the caller, and return their items as they are received, with at most `maxsize`
+    batches of items waiting to be consumed.
+    """
+    items: queue.Queue = queue.Queue(maxsize)
+    stopped = threading.Event()
+
+    def put(item: Any) -> bool:
+        # Wait for the consumer, unless it stopped.
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(fn: Callable[[], Iterable[T]]) -> None:
+        iterable: Optional[Iterable[T]] = None
+        try:
+            iterable = fn()
+            batch: List[T] = []
+            for item in iterable:
+                batch.append(item)
+                if len(batch) >= MERGE_BATCH_SIZE:
+                    if not put(batch):
+                        return
+                    batch = []
+            put(batch)
+            put(None)
+        except Exception as e:
+            put(e)
+        finally:
+            # Close the response if the consumer stopped early.
+            if isinstance(iterable, Generator):
+                iterable.close()
+
+    executor = ThreadPoolExecutor(len(fns))
+    for fn in fns:
+        executor.submit(copy_context().run, produce, fn)
+    try:
+        remaining = len(fns)
+        while remaining:
+            batch = items.get()
+            if batch is None:
+                remaining -= 1
+            elif isinstance(batch, Exception):
+                raise batch
+            else:
+                yield from batch
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False)
+
+
+async def merge_tasks(
+    fns: Sequence[Callable[[], AsyncIterator[T]]], maxsize: int
+) -> AsyncIterator[T]:
+    """
+    Iterate over the async iterators returned by `fns`, each in its own task,
+    and return their items as they are received, with at most `maxsize`
+    batches of items waiting to be consumed.
+    """
+    items: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def produce(fn: Callable[[], AsyncIterator[T]]) -> None:
+        iterator: Optional[AsyncIterator[T]] = None
+        try:
+            iterator = fn()
+            batch: List[T] = []
+            async for item in iterator:
+                batch.append(item)
+                if len(batch) >= MERGE_BATCH_SIZE:
+                    await items.put(batch)
+                    batch = []
+            await items.put(batch)
+            await items.put(None)
+        except Exception as e:
+            await items.put(e)
+        finally:
+            if isinstance(iterator, AsyncGenerator):
+                await iterator.aclose()
+
+    tasks = [asyncio.create_task(produce(fn)) for fn in fns]
+    try:
+        remaining = len(fns)
+        while remaining:
+            batch = await items.get()
+            if batch is None:
+                remaining -= 1
+            elif isinstance(batch, Exception):
+                raise batch
+            else:
+                for item in batch:
+                    yield item
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -15,4 +15,27 @@ DEFAULT_PASSWORD = ""
 DEFAULT_CONNECT_TIMEOUT = 5.0
 DEFAULT_READ_WRITE_TIMEOUT = None
 
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 5.0
+
+DEFAULT_CONCURRENCY = 8
+
+DEFAULT_LOAD_BALANCING = "round_robin"
+DEFAULT_HEALTH_CHECK_INTERVAL = 10.0
+
+DEFAULT_BATCH_SIZE = 10_000
+DEFAULT_INSERT_BATCH_SIZE = 10_000
+DEFAULT_INSERT_MAX_AGE = 1.0
+DEFAULT_INSERT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_DECODE_CHUNK_SIZE = 256 * 1024
+DEFAULT_PREFETCH = 16
+
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_MAX_DISK_BYTES = 1024 * 1024 * 1024
+DEFAULT_CACHE_TTL = 60.0
+
 CLICKHOUSE_EXCEPTION_CODE_HEADER = "X-ClickHouse-Exception-Code"
+CLICKHOUSE_PROGRESS_HEADER = "X-ClickHouse-Progress"
+CLICKHOUSE_QUERY_ID_HEADER = "X-ClickHouse-Query-Id"
+CLICKHOUSE_SUMMARY_HEADER = "X-ClickHouse-Summary"
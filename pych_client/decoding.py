@@ -0,0 +1,146 @@
+import asyncio
+from collections import deque
+from collections.abc import AsyncGenerator, Generator
+from concurrent.futures import Executor, Future
+from typing import (
+    AsyncIterator,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+try:
+    import orjson as json
+except ModuleNotFoundError:
+    import json  # type: ignore
+
+T = TypeVar("T")
+
+
+def decode_json(chunk: bytes) -> List[dict]:
+    """Decode a chunk of complete JSONEachRow lines."""
+    # orjson parses bytes, but the stdlib decodes them line by line,
+    # which is slower than decoding the whole chunk.
+    lines = (
+        chunk.decode().split("\n") if json.__name__ == "json" else chunk.split(b"\n")
+    )
+    return [json.loads(line) for line in lines if line]
+
+
+def decode_text(chunk: bytes) -> List[str]:
+    """Decode a chunk of complete lines, the last one being possibly unterminated."""
+    text = chunk.decode(errors="replace")
+    return text.removesuffix("\n").split("\n")
+
+
+def iter_chunks(content: bytes, chunk_size: int) -> Iterator[memoryview]:
+    view = memoryview(content)
+    for start in range(0, len(view), chunk_size):
+        stop = start + chunk_size
+        yield view[start:stop]
+
+
+def iter_aligned(
+    chunks: Iterable[Union[bytes, memoryview]], min_size: int
+) -> Iterator[bytes]:
+    """Merge the chunks of a stream into chunks of `min_size` bytes or more, which end on a newline."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= min_size and (end := buffer.rfind(b"\n") + 1):
+            yield bytes(buffer[:end])
+            del buffer[:end]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def aiter_aligned(
+    chunks: AsyncIterator[bytes], min_size: int
+) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= min_size and (end := buffer.rfind(b"\n") + 1):
+            yield bytes(buffer[:end])
+            del buffer[:end]
+    if buffer:
+        yield bytes(buffer)
+
+
+def iter_decoded(
+    chunks: Iterable[Union[bytes, memoryview]],
+    fn: Callable[[bytes], List[T]],
+    executor: Executor,
+    prefetch: int,
+    chunk_size: int,
+) -> Iterator[Tuple[List[T], int]]:
+    """
+    Decode line-aligned chunks of `chunk_size` bytes or more with `fn` in `executor`,
+    and return the decoded items with the size of their chunk, in order.
+    The stream is read while at most `prefetch` chunks are being decoded.
+    """
+    pending: Deque[Tuple[Future, int]] = deque()
+    try:
+        for chunk in iter_aligned(chunks, chunk_size):
+            pending.append((executor.submit(fn, chunk), len(chunk)))
+            if len(pending) >= prefetch:
+                future, size = pending.popleft()
+                yield future.result(), size
+        while pending:
+            future, size = pending.popleft()
+            yield future.result(), size
+    finally:
+        for future, _ in pending:
+            future.cancel()
+        # Close the response if the consumer stopped early.
+        if isinstance(chunks, Generator):
+            chunks.close()
+
+
+async def aiter_decoded(
+    chunks: AsyncIterator[bytes],
+    fn: Callable[[bytes], List[T]],
+    executor: Optional[Executor],
+    prefetch: int,
+    chunk_size: int,
+) -> AsyncIterator[Tuple[List[T], int]]:
+    """
+    Decode line-aligned chunks of `chunk_size` bytes or more with `fn` in `executor`,
+    while the stream is read, and return the decoded items with the size of their chunk, in order.
+    At most `prefetch` chunks are queued between the reader and the decoder,
+    so that the reader waits if the consumer is slower than the network.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(prefetch)
+
+    async def read() -> None:
+        try:
+            async for chunk in aiter_aligned(chunks, chunk_size):
+                future = loop.run_in_executor(executor, fn, chunk)
+                await queue.put((future, len(chunk)))
+        except Exception as e:
+            future = loop.create_future()
+            future.set_exception(e)
+            await queue.put((future, 0))
+        finally:
+            # Close the response if the consumer stopped early.
+            if isinstance(chunks, AsyncGenerator):
+                await chunks.aclose()
+        await queue.put(None)
+
+    reader = asyncio.create_task(read())
+    try:
+        while item := await queue.get():
+            future, size = item
+            yield await future, size
+    finally:
+        reader.cancel()
+        while not queue.empty():
+            if item := queue.get_nowait():
+                item[0].cancel()
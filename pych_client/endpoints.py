@@ -0,0 +1,77 @@
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+from pych_client.logger import logger
+
+STRATEGIES = ("round_robin", "least_in_flight", "latency")
+
+# Weight of the last measurement in the moving average of the latency.
+LATENCY_ALPHA = 0.2
+
+
+@dataclass
+class Endpoint:
+    url: str
+    healthy: bool = True
+    in_flight: int = 0
+    latency: Optional[float] = None
+
+
+class EndpointPool:
+    """
+    Distribute the requests over several ClickHouse servers.
+    Endpoints are taken out of rotation on transport errors or failed health checks,
+    and put back in rotation when a health check succeeds.
+    """
+
+    def __init__(self, urls: Sequence[str], strategy: str = "round_robin") -> None:
+        if not urls:
+            raise ValueError("at least one endpoint is required")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unsupported load balancing strategy: {strategy}")
+        self.endpoints = [Endpoint(url.rstrip("/") + "/") for url in urls]
+        self.strategy = strategy
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self) -> Endpoint:
+        with self.lock:
+            # If all the endpoints are down, try them anyway.
+            candidates = [x for x in self.endpoints if x.healthy] or self.endpoints
+            if self.strategy == "least_in_flight":
+                endpoint = min(candidates, key=lambda x: x.in_flight)
+            elif self.strategy == "latency":
+                # Endpoints without measurements are tried first.
+                endpoint = min(candidates, key=lambda x: x.latency or 0.0)
+            else:
+                endpoint = candidates[next(self.counter) % len(candidates)]
+            endpoint.in_flight += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint) -> None:
+        with self.lock:
+            endpoint.in_flight -= 1
+
+    def record_latency(self, endpoint: Endpoint, latency: float) -> None:
+        with self.lock:
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += LATENCY_ALPHA * (latency - endpoint.latency)
+
+    def set_healthy(self, endpoint: Endpoint, healthy: bool) -> None:
+        if endpoint.healthy != healthy:
+            logger.info("endpoint %s is %s", endpoint.url, "up" if healthy else "down")
+        endpoint.healthy = healthy
+
+
+def get_endpoints(base_url: Union[str, Sequence[str]]) -> List[str]:
+    """Return the list of endpoints from a list, or from a comma-separated string."""
+    if isinstance(base_url, str):
+        base_url = base_url.split(",")
+    return [url.strip() for url in base_url if url.strip()]
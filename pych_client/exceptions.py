@@ -5,3 +5,7 @@ class ClickHouseException(Exception):
         self.query = query
         msg = f"Query\n{self.query}\n\nError\n{self.error}"
         super().__init__(msg)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
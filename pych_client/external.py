@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, List, Mapping, Optional
+
+from pych_client.constants import DEFAULT_INSERT_BATCH_SIZE
+from pych_client.insert import Schema, iter_native, iter_row_binary
+from pych_client.type_parser import parse_tuple_element, split_arguments
+
+
+@dataclass
+class ExternalTable:
+    """
+    Local data sent with a query, in the request body, as a temporary table `name`
+    with the columns of `structure` (e.g. `"id UInt64, name String"`).
+    Without `format`, `data` contains rows, encoded in the RowBinary format,
+    or NumPy columns, encoded in the Native format.
+    With `format`, `data` contains bytes, or chunks of bytes, already in this format.
+    """
+
+    name: str
+    data: Any
+    structure: str
+    format: Optional[str] = None
+
+    @property
+    def schema(self) -> Schema:
+        return [parse_tuple_element(x) for x in split_arguments(self.structure)]
+
+    def get_format(self) -> str:
+        if self.format:
+            return self.format
+        return "Native" if isinstance(self.data, Mapping) else "RowBinary"
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        if self.format:
+            if isinstance(self.data, str):
+                yield self.data.encode()
+            elif isinstance(self.data, bytes):
+                yield self.data
+            else:
+                yield from self.data
+        elif isinstance(self.data, Mapping):
+            yield from iter_native(self.data, self.schema, DEFAULT_INSERT_BATCH_SIZE)
+        else:
+            yield from iter_row_binary(
+                self.data, self.schema, DEFAULT_INSERT_BATCH_SIZE
+            )
+
+
+def get_external_tables(data: Any) -> Optional[List[ExternalTable]]:
+    """Return the external tables of a request body, if it is one or a list of them."""
+    if isinstance(data, ExternalTable):
+        return [data]
+    if (
+        isinstance(data, (list, tuple))
+        and data
+        and all(isinstance(x, ExternalTable) for x in data)
+    ):
+        return list(data)
+    return None
+
+
+def get_external_params(tables: List[ExternalTable]) -> dict:
+    params = {}
+    for table in tables:
+        params[f"{table.name}_structure"] = table.structure
+        params[f"{table.name}_format"] = table.get_format()
+    return params
+
+
+def iter_multipart(tables: List[ExternalTable], boundary: str) -> Iterator[bytes]:
+    """Stream the tables as the parts of a multipart/form-data body."""
+    for table in tables:
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{table.name}"; filename="{table.name}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        yield from table.iter_chunks()
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+async def aiter_multipart(
+    tables: List[ExternalTable], boundary: str
+) -> AsyncIterator[bytes]:
+    for chunk in iter_multipart(tables, boundary):
+        yield chunk
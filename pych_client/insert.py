@@ -0,0 +1,162 @@
+import sys
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from pych_client.concurrency import aiter_items
+from pych_client.native import encode_block
+from pych_client.row_binary import row_encoder
+
+Schema = List[Tuple[str, str]]
+
+# Rows can be sequences of values (in the order of the columns), or mappings.
+Rows = Union[Iterable[Any], Mapping[str, Any]]
+AsyncRows = Union[AsyncIterable[Any], Rows]
+
+NON_INSERTABLE_DEFAULT_TYPES = ("ALIAS", "EPHEMERAL", "MATERIALIZED")
+
+
+@dataclass
+class InsertBatch:
+    """Rows encoded for an INSERT query, and the outcome of their insertion."""
+
+    table: str
+    query: str
+    data: bytes
+    rows: int
+    index: int
+    deduplication_token: str
+    error: Optional[Exception] = None
+
+
+def get_insert_query(schema: Schema, format_: str) -> str:
+    columns = ", ".join(quote_identifier(name) for name, _ in schema)
+    return f"INSERT INTO {{table:Identifier}} ({columns}) FORMAT {format_}"
+
+
+def get_insert_schema(
+    description: List[dict], columns: Optional[Sequence[str]]
+) -> Schema:
+    """Return the names and types of the columns to insert, from `DESCRIBE TABLE`."""
+    if columns is None:
+        return [
+            (column["name"], column["type"])
+            for column in description
+            if column["default_type"] not in NON_INSERTABLE_DEFAULT_TYPES
+        ]
+    types = {column["name"]: column["type"] for column in description}
+    for name in columns:
+        if name not in types:
+            raise ValueError(f"unknown column: {name}")
+    return [(name, types[name]) for name in columns]
+
+
+def quote_identifier(name: str) -> str:
+    return "`" + name.replace("\\", "\\\\").replace("`", "\\`") + "`"
+
+
+def iter_native(
+    columns: Mapping[str, Any], schema: Schema, batch_size: int
+) -> Iterator[bytes]:
+    """Encode NumPy columns as Native blocks of `batch_size` rows."""
+    size = len(columns[schema[0][0]])
+    for start in range(0, size, batch_size):
+        stop = start + batch_size
+        batch = {name: columns[name][start:stop] for name, _ in schema}
+        yield encode_block(batch, schema)
+
+
+async def aiter_native(
+    columns: Mapping[str, Any], schema: Schema, batch_size: int
+) -> AsyncIterator[bytes]:
+    for block in iter_native(columns, schema, batch_size):
+        yield block
+
+
+def iter_row_binary(
+    rows: Iterable[Any], schema: Schema, batch_size: int
+) -> Iterator[bytes]:
+    """Encode rows in the RowBinary format, `batch_size` rows at a time."""
+    encoder = RowBinaryBatchEncoder(schema, batch_size)
+    for row in rows:
+        if batch := encoder.encode(row):
+            yield batch
+    if batch := encoder.flush():
+        yield batch
+
+
+async def aiter_row_binary(
+    rows: Union[AsyncIterable[Any], Iterable[Any]], schema: Schema, batch_size: int
+) -> AsyncIterator[bytes]:
+    if not isinstance(rows, AsyncIterable):
+        for chunk in iter_row_binary(rows, schema, batch_size):
+            yield chunk
+        return
+    encoder = RowBinaryBatchEncoder(schema, batch_size)
+    async for row in rows:
+        if batch := encoder.encode(row):
+            yield batch
+    if batch := encoder.flush():
+        yield batch
+
+
+async def aiter_row_binary_batches(
+    rows: Union[AsyncIterable[Any], Iterable[Any]],
+    schema: Schema,
+    batch_size: int,
+    max_batch_bytes: int,
+) -> AsyncIterator[Tuple[bytes, int]]:
+    """
+    Encode rows in RowBinary batches of at most `batch_size` rows
+    and of about `max_batch_bytes` bytes, with the number of rows of each batch.
+    """
+    encoder = RowBinaryBatchEncoder(schema, sys.maxsize)
+    async for row in aiter_items(rows):
+        encoder.encode(row)
+        if encoder.count >= batch_size or len(encoder.buffer) >= max_batch_bytes:
+            count = encoder.count
+            yield encoder.flush() or b"", count
+    count = encoder.count
+    if batch := encoder.flush():
+        yield batch, count
+
+
+class RowBinaryBatchEncoder:
+    def __init__(self, schema: Schema, batch_size: int) -> None:
+        self.names = [name for name, _ in schema]
+        self.encode_row = row_encoder([type_ for _, type_ in schema])
+        self.batch_size = batch_size
+        self.buffer = bytearray()
+        self.count = 0
+
+    def encode(self, row: Any) -> Optional[bytes]:
+        """Encode a row, and return the current batch if it is full."""
+        if isinstance(row, Mapping):
+            row = itemgetter(*self.names)(row)
+            if len(self.names) == 1:
+                row = (row,)
+        self.encode_row(self.buffer, row)
+        self.count += 1
+        if self.count >= self.batch_size:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        if not self.buffer:
+            return None
+        batch = bytes(self.buffer)
+        self.buffer.clear()
+        self.count = 0
+        return batch
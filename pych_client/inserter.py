@@ -0,0 +1,416 @@
+import asyncio
+import sys
+import threading
+import time
+from types import TracebackType
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Type
+from uuid import uuid4
+
+from pych_client.async_client import AsyncClickHouseClient
+from pych_client.client import ClickHouseClient
+from pych_client.constants import (
+    DEFAULT_INSERT_BATCH_SIZE,
+    DEFAULT_INSERT_MAX_AGE,
+    DEFAULT_INSERT_MAX_BYTES,
+)
+from pych_client.insert import (
+    RowBinaryBatchEncoder,
+    Schema,
+    get_insert_query,
+    get_insert_schema,
+)
+from pych_client.logger import logger
+from pych_client.typing import Settings
+
+# Table, encoded rows and number of rows of a batch.
+Batch = Tuple[str, bytes, int]
+
+
+class InsertBuffer:
+    """Rows of a table encoded in the RowBinary format, waiting to be inserted."""
+
+    def __init__(self, schema: Schema) -> None:
+        self.query = get_insert_query(schema, "RowBinary")
+        self.encoder = RowBinaryBatchEncoder(schema, sys.maxsize)
+        self.created = 0.0
+
+    @property
+    def rows(self) -> int:
+        return self.encoder.count
+
+    @property
+    def size(self) -> int:
+        return len(self.encoder.buffer)
+
+    def add(self, row: Any) -> None:
+        if not self.encoder.count:
+            self.created = time.monotonic()
+        self.encoder.encode(row)
+
+    def take(self) -> Tuple[bytes, int]:
+        rows = self.encoder.count
+        return self.encoder.flush() or b"", rows
+
+
+class BaseBufferedInserter:
+    def __init__(
+        self,
+        table: str,
+        columns: Optional[Sequence[str]],
+        max_rows: int,
+        max_bytes: int,
+        max_age: float,
+        max_pending_rows: Optional[int],
+        async_insert: bool,
+        settings: Settings,
+    ) -> None:
+        self.table = table
+        self.columns = columns
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_pending_rows = max_pending_rows or 4 * max_rows
+        self.settings = settings or {}
+        if async_insert:
+            self.settings = {
+                **self.settings,
+                "async_insert": 1,
+                "wait_for_async_insert": 1,
+            }
+        self.buffers: Dict[str, InsertBuffer] = {}
+        self.schemas: Dict[str, Schema] = {}
+        # Rows added to the buffers, taken from the buffers, and inserted (or failed).
+        self.added = 0
+        self.taken = 0
+        self.done = 0
+        # Rows which must be taken from the buffers immediately, by `flush`.
+        self.flush_until = 0
+        self.closed = False
+        # Set once the background inserter stopped, normally or not.
+        self.stopped = False
+        self.error: Optional[Exception] = None
+
+    def is_full(self) -> bool:
+        """Writers wait until the pending rows are inserted, or until an error."""
+        pending = self.added - self.done
+        return pending >= self.max_pending_rows and not self.error and not self.closed
+
+    def add(self, table: str, row: Any) -> bool:
+        """
+        Buffer a row, and return True if the background inserter must be woken up,
+        since the buffer is full, or since its age must be watched.
+        """
+        if not (buffer := self.buffers.get(table)):
+            buffer = self.buffers[table] = InsertBuffer(self.schemas[table])
+        buffer.add(row)
+        self.added += 1
+        return (
+            buffer.rows == 1
+            or buffer.rows >= self.max_rows
+            or buffer.size >= self.max_bytes
+        )
+
+    def take(self) -> Optional[Batch]:
+        """Return the rows of the first buffer which is ready to be inserted."""
+        now = time.monotonic()
+        flush = self.closed or self.taken < self.flush_until
+        for table, buffer in self.buffers.items():
+            if buffer.rows and (
+                flush
+                or buffer.rows >= self.max_rows
+                or buffer.size >= self.max_bytes
+                or now - buffer.created >= self.max_age
+            ):
+                data, rows = buffer.take()
+                self.taken += rows
+                return table, data, rows
+        return None
+
+    def get_timeout(self) -> Optional[float]:
+        """Return the time until the oldest buffer must be inserted."""
+        created = [x.created for x in self.buffers.values() if x.rows]
+        if not created:
+            return None
+        return max(0.0, min(created) + self.max_age - time.monotonic())
+
+    def get_settings(self, retry: bool) -> dict:
+        if retry:
+            return {**self.settings, "insert_deduplication_token": uuid4().hex}
+        return self.settings
+
+    def raise_error(self) -> None:
+        if error := self.error:
+            self.error = None
+            raise error
+
+    def check_done(self, target: int) -> None:
+        """Raise the error of the inserter, or an error if rows up to `target` were dropped."""
+        self.raise_error()
+        if self.done < target:
+            raise RuntimeError("the inserter stopped before inserting all the rows")
+
+    def stop(self, error: Optional[Exception]) -> None:
+        # The writers must not wait for an inserter which stopped unexpectedly.
+        self.error = self.error or error
+        self.closed = True
+        self.stopped = True
+
+
+class BufferedInserter(BaseBufferedInserter):
+    """
+    Buffer the rows written by many threads, and insert them in the background,
+    once a table has `max_rows` rows or `max_bytes` bytes buffered,
+    or once its oldest row is `max_age` seconds old.
+    Writers are blocked while `max_pending_rows` rows (default: 4 * `max_rows`)
+    are buffered or being inserted.
+    With `async_insert`, the rows are buffered by the server too, with `async_insert=1`.
+    An insert which fails (after the retries of the client) drops its rows,
+    and its exception is raised by the next call to `put`, `flush` or `close`.
+    """
+
+    def __init__(
+        self,
+        client: ClickHouseClient,
+        table: str,
+        columns: Optional[Sequence[str]] = None,
+        *,
+        max_rows: int = DEFAULT_INSERT_BATCH_SIZE,
+        max_bytes: int = DEFAULT_INSERT_MAX_BYTES,
+        max_age: float = DEFAULT_INSERT_MAX_AGE,
+        max_pending_rows: Optional[int] = None,
+        async_insert: bool = False,
+        settings: Settings = None,
+    ) -> None:
+        super().__init__(
+            table,
+            columns,
+            max_rows,
+            max_bytes,
+            max_age,
+            max_pending_rows,
+            async_insert,
+            settings,
+        )
+        self.client = client
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self) -> "BufferedInserter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def put(self, row: Any, table: Optional[str] = None) -> None:
+        self.put_many([row], table)
+
+    def put_many(self, rows: Iterable[Any], table: Optional[str] = None) -> None:
+        """
+        Buffer rows for `table` (default: the table of the inserter).
+        `columns` applies only to the table of the inserter.
+        """
+        table = table or self.table
+        if table not in self.schemas:
+            columns = self.columns if table == self.table else None
+            self.schemas[table] = get_insert_schema(self.client.schema(table), columns)
+        with self.condition:
+            for row in rows:
+                while self.is_full():
+                    self.condition.wait()
+                self.raise_error()
+                if self.closed:
+                    raise RuntimeError("the inserter is closed")
+                if self.add(table, row):
+                    self.condition.notify_all()
+
+    def flush(self) -> None:
+        """Insert the rows buffered so far, and wait for their insertion."""
+        with self.condition:
+            target = self.added
+            self.flush_until = max(self.flush_until, target)
+            self.condition.notify_all()
+            while self.done < target and not self.stopped:
+                self.condition.wait()
+            self.check_done(target)
+
+    def close(self) -> None:
+        """Insert the buffered rows, and stop the background thread."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        with self.condition:
+            self.check_done(self.added)
+
+    def run(self) -> None:
+        error: Optional[Exception] = RuntimeError("the inserter stopped unexpectedly")
+        try:
+            while batch := self.next_batch():
+                self.insert(*batch)
+            error = None
+        finally:
+            with self.condition:
+                self.stop(error)
+                self.condition.notify_all()
+
+    def insert(self, table: str, data: bytes, rows: int) -> None:
+        # The rows of an insert interrupted by another exception are not done,
+        # so that `flush` and `close` report them as dropped.
+        error = None
+        try:
+            self.client.execute(
+                self.buffers[table].query,
+                {"table": table},
+                data,
+                self.get_settings(self.client.retry is not None),
+            )
+        except Exception as e:
+            logger.exception("failed to insert %d rows in %s", rows, table)
+            error = e
+        with self.condition:
+            self.error = self.error or error
+            self.done += rows
+            self.condition.notify_all()
+
+    def next_batch(self) -> Optional[Batch]:
+        """Wait for a buffer to be ready, or return None once closed and empty."""
+        with self.condition:
+            while not (batch := self.take()):
+                if self.closed:
+                    return None
+                self.condition.wait(self.get_timeout())
+            return batch
+
+
+class AsyncBufferedInserter(BaseBufferedInserter):
+    """
+    Buffer the rows written by many tasks, and insert them in a background task.
+    See `BufferedInserter` for the parameters.
+    """
+
+    def __init__(
+        self,
+        client: AsyncClickHouseClient,
+        table: str,
+        columns: Optional[Sequence[str]] = None,
+        *,
+        max_rows: int = DEFAULT_INSERT_BATCH_SIZE,
+        max_bytes: int = DEFAULT_INSERT_MAX_BYTES,
+        max_age: float = DEFAULT_INSERT_MAX_AGE,
+        max_pending_rows: Optional[int] = None,
+        async_insert: bool = False,
+        settings: Settings = None,
+    ) -> None:
+        super().__init__(
+            table,
+            columns,
+            max_rows,
+            max_bytes,
+            max_age,
+            max_pending_rows,
+            async_insert,
+            settings,
+        )
+        self.client = client
+        self.condition = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "AsyncBufferedInserter":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def put(self, row: Any, table: Optional[str] = None) -> None:
+        await self.put_many([row], table)
+
+    async def put_many(self, rows: Iterable[Any], table: Optional[str] = None) -> None:
+        table = table or self.table
+        if table not in self.schemas:
+            columns = self.columns if table == self.table else None
+            self.schemas[table] = get_insert_schema(
+                await self.client.schema(table), columns
+            )
+        # The task is started on the first row, since it requires a running loop.
+        if not self.task:
+            self.task = asyncio.create_task(self.run())
+        async with self.condition:
+            for row in rows:
+                while self.is_full():
+                    await self.condition.wait()
+                self.raise_error()
+                if self.closed:
+                    raise RuntimeError("the inserter is closed")
+                if self.add(table, row):
+                    self.condition.notify_all()
+
+    async def flush(self) -> None:
+        """Insert the rows buffered so far, and wait for their insertion."""
+        async with self.condition:
+            target = self.added
+            self.flush_until = max(self.flush_until, target)
+            self.condition.notify_all()
+            while self.done < target and not self.stopped:
+                await self.condition.wait()
+            self.check_done(target)
+
+    async def close(self) -> None:
+        """Insert the buffered rows, and stop the background task."""
+        async with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.task:
+            # The task may have been cancelled, which must not cancel the caller.
+            await asyncio.wait([self.task])
+        self.check_done(self.added)
+
+    async def run(self) -> None:
+        error: Optional[Exception] = RuntimeError("the inserter stopped unexpectedly")
+        try:
+            while batch := await self.next_batch():
+                await self.insert(*batch)
+            error = None
+        finally:
+            async with self.condition:
+                self.stop(error)
+                self.condition.notify_all()
+
+    async def insert(self, table: str, data: bytes, rows: int) -> None:
+        error = None
+        try:
+            await self.client.execute(
+                self.buffers[table].query,
+                {"table": table},
+                data,
+                self.get_settings(self.client.retry is not None),
+            )
+        except Exception as e:
+            logger.exception("failed to insert %d rows in %s", rows, table)
+            error = e
+        async with self.condition:
+            self.error = self.error or error
+            self.done += rows
+            self.condition.notify_all()
+
+    async def next_batch(self) -> Optional[Batch]:
+        """Wait for a buffer to be ready, or return None once closed and empty."""
+        async with self.condition:
+            while not (batch := self.take()):
+                if self.closed:
+                    return None
+                try:
+                    await asyncio.wait_for(self.condition.wait(), self.get_timeout())
+                except asyncio.TimeoutError:
+                    pass
+            return batch
@@ -0,0 +1,226 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from ipaddress import IPv4Address, IPv6Address
+from operator import itemgetter
+from socket import AF_INET6, inet_aton, inet_pton
+from typing import Any, Callable, List, Optional, Tuple, Union
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from pych_client.line_decoder import BytesLineDecoder
+from pych_client.row_binary import BIG_INTEGERS, STRUCT_FORMATS
+from pych_client.type_parser import parse_tuple_element, parse_type, unquote
+
+try:
+    import orjson as json
+except ModuleNotFoundError:
+    import json  # type: ignore
+
+Converter = Callable[[Any], Any]
+
+QUOTED_INTEGERS = {"Int64", "UInt64", *BIG_INTEGERS}
+
+# Datetimes are received in the ISO format in UTC, which does not depend on the time zone
+# of the server, decimals and 64-bit or bigger integers as strings, which are exact,
+# and named tuples as arrays.
+TYPED_JSON_SETTINGS = {
+    "default_format": "JSONCompactEachRowWithNamesAndTypes",
+    "output_format_json_quote_64bit_integers": 1,
+    "output_format_json_quote_decimals": 1,
+    "output_format_json_named_tuples_as_objects": 0,
+    "date_time_output_format": "iso",
+}
+
+
+class JSONCompactDecoder:
+    """
+    Incremental decoder for the JSONCompactEachRowWithNamesAndTypes format,
+    returning rows as dicts of the same Python types as `RowBinaryDecoder`.
+    The converters of the columns are built once, when the header is received,
+    and applied column by column to each chunk, without type dispatch for each value.
+    """
+
+    def __init__(self) -> None:
+        self.lines = BytesLineDecoder()
+        self.header: List[List[str]] = []
+        self.names: Optional[List[str]] = None
+        self.types: Optional[List[str]] = None
+        self.converters: List[Tuple[int, Converter]] = []
+
+    def decode(self, chunk: Union[bytes, memoryview]) -> List[dict]:
+        return self.decode_lines(self.lines.decode(chunk))
+
+    def flush(self) -> List[dict]:
+        return self.decode_lines(self.lines.flush())
+
+    def decode_lines(self, lines: List[bytes]) -> List[dict]:
+        lines = [line for line in lines if line]
+        if not lines:
+            return []
+        # The lines are parsed at once, as a single array.
+        rows = json.loads(b"[" + b",".join(lines) + b"]")
+        if self.names is None:
+            size = 2 - len(self.header)
+            self.header += rows[:size]
+            rows = rows[size:]
+            if len(self.header) < 2:
+                return []
+            self.names, self.types = self.header
+            for i, type_ in enumerate(self.types):
+                if convert := json_converter(type_):
+                    self.converters.append((i, convert))
+        return convert_rows(rows, self.names, self.converters)
+
+
+def convert_rows(
+    rows: List[list], names: List[str], converters: List[Tuple[int, Converter]]
+) -> List[dict]:
+    if converters and rows:
+        columns: List[Any] = [map(itemgetter(i), rows) for i in range(len(names))]
+        for i, convert in converters:
+            columns[i] = map(convert, columns[i])
+        rows = zip(*columns)  # type: ignore
+    return [dict(zip(names, row)) for row in rows]
+
+
+def json_converter(type_: str) -> Optional[Converter]:
+    """
+    Build a converter for the JSON values of the given type,
+    or return None if they are already of the right Python type.
+    """
+    name, arguments = parse_type(type_)
+
+    if name == "Nullable":
+        if not (convert_value := json_converter(arguments[0])):
+            return None
+
+        def convert_nullable(value: Any) -> Any:
+            return None if value is None else convert_value(value)
+
+        return convert_nullable
+
+    if name in ("LowCardinality", "SimpleAggregateFunction"):
+        return json_converter(arguments[-1])
+
+    if name in ("Date", "Date32"):
+        return date.fromisoformat
+
+    if name == "DateTime":
+        return iso_datetime_converter(0, arguments[0] if arguments else None)
+
+    if name == "DateTime64":
+        precision = int(arguments[0]) if arguments else 3
+        tz_name = arguments[1] if len(arguments) > 1 else None
+        return iso_datetime_converter(precision, tz_name)
+
+    if name.startswith("Decimal"):
+        return Decimal
+
+    if name in QUOTED_INTEGERS:
+        return int
+
+    # The strings are the bytes of FixedString decoded as UTF-8 by the server.
+    if name == "FixedString":
+        return str.encode
+
+    if name == "UUID":
+        return UUID
+
+    if name == "IPv4":
+        return convert_ipv4
+
+    if name == "IPv6":
+        return convert_ipv6
+
+    if name == "Array":
+        if not (convert_item := json_converter(arguments[0])):
+            return None
+
+        def convert_array(value: Any) -> Any:
+            return [convert_item(item) for item in value]
+
+        return convert_array
+
+    if name == "Map":
+        convert_key = map_key_converter(arguments[0])
+        convert_val = json_converter(arguments[1])
+        if not (convert_key or convert_val):
+            return None
+        key = convert_key or identity
+        val = convert_val or identity
+
+        def convert_map(value: Any) -> Any:
+            return {key(k): val(v) for k, v in value.items()}
+
+        return convert_map
+
+    if name == "Tuple":
+        converters = [
+            json_converter(parse_tuple_element(x)[1]) or identity for x in arguments
+        ]
+
+        def convert_tuple(value: Any) -> Any:
+            return tuple([fn(item) for fn, item in zip(converters, value)])
+
+        return convert_tuple
+
+    return None
+
+
+def iso_datetime_converter(precision: int, tz_name: Optional[str]) -> Converter:
+    """
+    Build a converter for datetimes in the ISO format in UTC, e.g. `2024-01-02T03:04:05.123Z`,
+    returning naive datetimes in UTC, or aware datetimes in the time zone of the column.
+    """
+    fromisoformat = datetime.fromisoformat
+    # Python < 3.11 does not parse the suffix `Z`, nor fractions of other than 3 or 6 digits.
+    if precision:
+        padding = "0" * max(6 - precision, 0)
+
+        def convert_datetime(value: Any) -> Any:
+            seconds, fraction = value[:-1].split(".")
+            microsecond = int((fraction + padding)[:6])
+            return fromisoformat(seconds).replace(microsecond=microsecond)
+
+    else:
+
+        def convert_datetime(value: Any) -> Any:
+            return fromisoformat(value[:-1])
+
+    if not tz_name:
+        return convert_datetime
+
+    tz = ZoneInfo(unquote(tz_name))
+    utc = timezone.utc
+
+    def convert_datetime_tz(value: Any) -> Any:
+        return convert_datetime(value).replace(tzinfo=utc).astimezone(tz)
+
+    return convert_datetime_tz
+
+
+# Parsing IP addresses with the socket module is several times faster than with ipaddress.
+def convert_ipv4(value: Any) -> Any:
+    return IPv4Address(int.from_bytes(inet_aton(value), "big"))
+
+
+def convert_ipv6(value: Any) -> Any:
+    return IPv6Address(inet_pton(AF_INET6, value))
+
+
+def map_key_converter(type_: str) -> Optional[Converter]:
+    """Build a converter for the keys of a map, which are always strings in JSON."""
+    name, arguments = parse_type(type_)
+    if name == "LowCardinality":
+        return map_key_converter(arguments[0])
+    if name == "Bool":
+        return "true".__eq__
+    if name in ("Float32", "Float64"):
+        return float
+    if name in STRUCT_FORMATS or name in BIG_INTEGERS:
+        return int
+    return json_converter(type_)
+
+
+def identity(value: Any) -> Any:
+    return value
@@ -1,3 +1,6 @@
+from typing import Iterator, List, Union
+
+
 class LineDecoder:
     """
     Faster version of httpx._decoders.LineDecoder.
@@ -25,3 +28,62 @@ class LineDecoder:
             lines = []
         self.buffer = ""
         return lines
+
+
+class BytesLineDecoder:
+    """
+    Split a stream of bytes on newlines, without decoding it to text first.
+    The incomplete line at the end of a chunk is kept in a reusable buffer.
+    Unlike `str.splitlines`, only `\\n` is a line separator,
+    so that the other separators can appear in the lines (e.g. in JSON strings).
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def decode(self, chunk: Union[bytes, memoryview]) -> List[bytes]:
+        lines = bytes(chunk).split(b"\n")
+        rest = lines.pop()
+        if lines and self.buffer:
+            self.buffer += lines[0]
+            lines[0] = bytes(self.buffer)
+            self.buffer.clear()
+        self.buffer += rest
+        return lines
+
+    def decode_text(self, chunk: Union[bytes, memoryview]) -> List[str]:
+        # A newline cannot be part of a multi-byte UTF-8 sequence,
+        # so the complete lines can be decoded at once.
+        lines, sep, rest = bytes(chunk).rpartition(b"\n")
+        if not sep:
+            self.buffer += rest
+            return []
+        if self.buffer:
+            self.buffer += lines
+            text = self.buffer.decode(errors="replace")
+            self.buffer.clear()
+        else:
+            text = lines.decode(errors="replace")
+        self.buffer += rest
+        return text.split("\n")
+
+    def flush(self) -> List[bytes]:
+        lines = [bytes(self.buffer)] if self.buffer else []
+        self.buffer.clear()
+        return lines
+
+    def flush_text(self) -> List[str]:
+        return [line.decode(errors="replace") for line in self.flush()]
+
+
+def iter_lines(
+    content: bytes, text: bool = False, chunk_size: int = 1024 * 1024
+) -> Iterator[Union[bytes, str]]:
+    """Iterate over the lines of a body, without holding all of them in memory."""
+    decoder = BytesLineDecoder()
+    view = memoryview(content)
+    for start in range(0, len(view), chunk_size):
+        stop = start + chunk_size
+        chunk = view[start:stop]
+        yield from decoder.decode_text(chunk) if text else decoder.decode(chunk)
+    yield from decoder.flush_text() if text else decoder.flush()
@@ -0,0 +1,380 @@
+import struct
+from typing import Any, Dict, List, Mapping, Tuple
+from uuid import UUID
+
+from pych_client.row_binary import (
+    decimal_converter,
+    read_string,
+    read_varint,
+    write_string,
+    write_varint,
+)
+from pych_client.type_parser import parse_enum, parse_tuple_element, parse_type
+
+try:
+    import numpy as np
+except ModuleNotFoundError:  # pragma: no cover
+    np = None  # type: ignore
+
+Block = Dict[str, Any]
+
+DTYPES = {
+    "Bool": "?",
+    "Int8": "<i1",
+    "Int16": "<i2",
+    "Int32": "<i4",
+    "Int64": "<i8",
+    "UInt8": "<u1",
+    "UInt16": "<u2",
+    "UInt32": "<u4",
+    "UInt64": "<u8",
+    "Float32": "<f4",
+    "Float64": "<f8",
+    "IPv4": "<u4",
+}
+
+DATETIME64_UNITS = {
+    0: "s",
+    1: "100ms",
+    2: "10ms",
+    3: "ms",
+    4: "100us",
+    5: "10us",
+    6: "us",
+    7: "100ns",
+    8: "10ns",
+    9: "ns",
+}
+
+TIME_DTYPES = {
+    "Date": ("<u2", "D"),
+    "Date32": ("<i4", "D"),
+    "DateTime": ("<u4", "s"),
+}
+
+LOW_CARDINALITY_INDEX_TYPES = ["<u1", "<u2", "<u4", "<u8"]
+
+
+class NativeDecoder:
+    """
+    Incremental decoder for the Native format.
+    Each block is returned as a mapping from column names to NumPy arrays.
+    Fixed-width columns are read-only views over the received buffer.
+    """
+
+    def __init__(self) -> None:
+        if np is None:
+            raise ModuleNotFoundError("numpy is required to decode the Native format")
+        self.chunks: List[bytes] = []
+        self.size = 0
+        # Wait for twice as much data before retrying to decode an incomplete block,
+        # so that large blocks received in many small chunks are decoded in linear time.
+        self.wanted = 0
+
+    def decode(self, data: bytes) -> List[Block]:
+        if data:
+            self.chunks.append(data)
+            self.size += len(data)
+        if not self.chunks or self.size < self.wanted:
+            return []
+        buffer = self.chunks[0] if len(self.chunks) == 1 else b"".join(self.chunks)
+        blocks = []
+        pos = 0
+        try:
+            while pos < len(buffer):
+                block, pos = read_block(buffer, pos)
+                blocks.append(block)
+        except (IndexError, struct.error):
+            pass
+        rest = buffer[pos:]
+        self.chunks = [rest] if rest else []
+        self.size = len(rest)
+        self.wanted = 2 * self.size
+        return blocks
+
+    def flush(self) -> List[Block]:
+        self.wanted = 0
+        blocks = self.decode(b"")
+        if self.chunks:
+            raise ValueError("truncated Native stream")
+        return blocks
+
+
+def concatenate_blocks(blocks: List[Block]) -> Block:
+    """Concatenate the columns of several blocks."""
+    if not blocks:
+        return {}
+    if len(blocks) == 1:
+        return blocks[0]
+    columns = {}
+    for name in blocks[0]:
+        arrays = [block[name] for block in blocks]
+        if any(isinstance(array, np.ma.MaskedArray) for array in arrays):
+            columns[name] = np.ma.concatenate(arrays)  # type: ignore
+        else:
+            columns[name] = np.concatenate(arrays)
+    return columns
+
+
+def read_block(buffer: bytes, pos: int) -> Tuple[Block, int]:
+    num_columns, pos = read_varint(buffer, pos)
+    num_rows, pos = read_varint(buffer, pos)
+    block = {}
+    for _ in range(num_columns):
+        name, pos = read_string(buffer, pos)
+        type_, pos = read_string(buffer, pos)
+        block[name], pos = read_column(type_, buffer, pos, num_rows)
+    return block, pos
+
+
+def read_array(buffer: bytes, pos: int, dtype: Any, count: int) -> Tuple[Any, int]:
+    dtype = np.dtype(dtype)
+    end = pos + dtype.itemsize * count
+    if end > len(buffer):
+        raise IndexError
+    return np.frombuffer(buffer, dtype, count, pos), end
+
+
+def read_objects(
+    buffer: bytes, pos: int, count: int, size: int, convert: Any
+) -> Tuple[Any, int]:
+    end = pos + size * count
+    if end > len(buffer):
+        raise IndexError
+    values = np.empty(count, dtype=object)
+    for i, (data,) in enumerate(struct.iter_unpack(f"{size}s", buffer[pos:end])):
+        values[i] = convert(data)
+    return values, end
+
+
+def read_column(type_: str, buffer: bytes, pos: int, rows: int) -> Tuple[Any, int]:
+    # The serialization states of the nested types are sent before any data,
+    # e.g. the key version of `Array(LowCardinality(String))` before the offsets.
+    pos = read_prefix(type_, buffer, pos)
+    return read_column_data(type_, buffer, pos, rows)
+
+
+def read_prefix(type_: str, buffer: bytes, pos: int) -> int:
+    name, arguments = parse_type(type_)
+    if name == "LowCardinality":
+        _, pos = read_array(buffer, pos, "<u8", 1)  # Key version
+    elif name in ("Array", "Nullable"):
+        pos = read_prefix(arguments[0], buffer, pos)
+    elif name == "SimpleAggregateFunction":
+        pos = read_prefix(arguments[-1], buffer, pos)
+    elif name == "Map":
+        for argument in arguments:
+            pos = read_prefix(argument, buffer, pos)
+    elif name == "Tuple":
+        for argument in arguments:
+            pos = read_prefix(parse_tuple_element(argument)[1], buffer, pos)
+    return pos
+
+
+def read_column_data(type_: str, buffer: bytes, pos: int, rows: int) -> Tuple[Any, int]:
+    name, arguments = parse_type(type_)
+
+    if name in DTYPES:
+        return read_array(buffer, pos, DTYPES[name], rows)
+
+    if name in ("Date", "Date32"):
+        values, pos = read_array(buffer, pos, "<u2" if name == "Date" else "<i4", rows)
+        return values.astype("datetime64[D]"), pos
+
+    if name == "DateTime":
+        values, pos = read_array(buffer, pos, "<u4", rows)
+        return values.astype("datetime64[s]"), pos
+
+    if name == "DateTime64":
+        unit = DATETIME64_UNITS[int(arguments[0])]
+        values, pos = read_array(buffer, pos, "<i8", rows)
+        return values.view(f"datetime64[{unit}]"), pos
+
+    if name in ("Enum8", "Enum16"):
+        values, pos = read_array(buffer, pos, "<i1" if name == "Enum8" else "<i2", rows)
+        mapping = parse_enum(arguments)
+        keys = np.array(sorted(mapping))
+        names = np.array([mapping[key] for key in keys], dtype=object)
+        return names[np.searchsorted(keys, values)], pos
+
+    if name.startswith("Decimal"):
+        precision = int(arguments[0]) if name == "Decimal" else 0
+        # Decimals are returned exactly, as `Decimal` objects, since floats would lose precision.
+        to_decimal = decimal_converter(arguments[-1])
+        if name == "Decimal32" or (name == "Decimal" and precision <= 9):
+            values, pos = read_array(buffer, pos, "<i4", rows)
+        elif name == "Decimal64" or (name == "Decimal" and precision <= 18):
+            values, pos = read_array(buffer, pos, "<i8", rows)
+        else:
+            size = 32 if name == "Decimal256" or precision > 38 else 16
+            values, pos = read_objects(buffer, pos, rows, size, signed_integer)
+        result = np.empty(rows, dtype=object)
+        result[:] = [to_decimal(value) for value in values.tolist()]
+        return result, pos
+
+    if name in ("Int128", "Int256", "UInt128", "UInt256"):
+        size = 16 if name.endswith("128") else 32
+        convert = unsigned_integer if name.startswith("U") else signed_integer
+        return read_objects(buffer, pos, rows, size, convert)
+
+    if name == "UUID":
+        return read_objects(buffer, pos, rows, 16, decode_uuid)
+
+    if name == "IPv6":
+        return read_array(buffer, pos, "S16", rows)
+
+    if name == "FixedString":
+        return read_array(buffer, pos, f"S{arguments[0]}", rows)
+
+    if name == "String":
+        values = np.empty(rows, dtype=object)
+        for i in range(rows):
+            values[i], pos = read_string(buffer, pos)
+        return values, pos
+
+    if name == "Nothing":
+        end = pos + rows
+        if end > len(buffer):
+            raise IndexError
+        return np.full(rows, None, dtype=object), end
+
+    if name == "Nullable":
+        mask, pos = read_array(buffer, pos, "?", rows)
+        values, pos = read_column_data(arguments[0], buffer, pos, rows)
+        return np.ma.masked_array(values, mask), pos
+
+    if name == "SimpleAggregateFunction":
+        return read_column_data(arguments[-1], buffer, pos, rows)
+
+    if name == "LowCardinality":
+        return read_low_cardinality(arguments[0], buffer, pos, rows)
+
+    if name in ("Array", "Map"):
+        offsets, pos = read_array(buffer, pos, "<u8", rows)
+        count = int(offsets[-1]) if rows else 0
+        bounds = offsets[:-1].astype("<i8")
+        result = np.empty(rows, dtype=object)
+        if name == "Array":
+            items, pos = read_column_data(arguments[0], buffer, pos, count)
+            for i, item in enumerate(np.split(items, bounds) if rows else []):
+                result[i] = item
+        else:
+            keys, pos = read_column_data(arguments[0], buffer, pos, count)
+            values, pos = read_column_data(arguments[1], buffer, pos, count)
+            start = 0
+            for i, stop in enumerate(offsets):
+                result[i] = dict(
+                    zip(keys[start:stop].tolist(), values[start:stop].tolist())
+                )
+                start = stop
+        return result, pos
+
+    if name == "Tuple":
+        elements = []
+        for argument in arguments:
+            values, pos = read_column_data(
+                parse_tuple_element(argument)[1], buffer, pos, rows
+            )
+            elements.append(values)
+        result = np.empty(rows, dtype=object)
+        for i, row in enumerate(zip(*(element.tolist() for element in elements))):
+            result[i] = row
+        return result, pos
+
+    raise ValueError(f"unsupported type: {type_}")
+
+
+def read_low_cardinality(
+    type_: str, buffer: bytes, pos: int, rows: int
+) -> Tuple[Any, int]:
+    # Shared dictionaries are not used in the Native format:
+    # each block carries its own dictionary followed by the indices.
+    if not rows:
+        values, _ = read_column_data(type_, buffer, pos, 0)
+        return values, pos
+    (serialization,), pos = read_array(buffer, pos, "<u8", 1)
+    (num_keys,), pos = read_array(buffer, pos, "<u8", 1)
+    name, arguments = parse_type(type_)
+    nullable = name == "Nullable"
+    keys, pos = read_column_data(
+        arguments[0] if nullable else type_, buffer, pos, int(num_keys)
+    )
+    (num_indices,), pos = read_array(buffer, pos, "<u8", 1)
+    index_type = LOW_CARDINALITY_INDEX_TYPES[int(serialization) & 0xFF]
+    indices, pos = read_array(buffer, pos, index_type, int(num_indices))
+    values = keys[indices]
+    if nullable:
+        return np.ma.masked_array(values, indices == 0), pos
+    return values, pos
+
+
+def signed_integer(data: bytes) -> int:
+    return int.from_bytes(data, "little", signed=True)
+
+
+def unsigned_integer(data: bytes) -> int:
+    return int.from_bytes(data, "little", signed=False)
+
+
+def decode_uuid(data: bytes) -> UUID:
+    high, low = struct.unpack("<QQ", data)
+    return UUID(int=(high << 64) | low)
+
+
+def encode_block(columns: Mapping[str, Any], schema: List[Tuple[str, str]]) -> bytes:
+    """Encode NumPy columns as a Native block."""
+    out = bytearray()
+    write_varint(out, len(schema))
+    write_varint(out, len(columns[schema[0][0]]) if schema else 0)
+    for name, type_ in schema:
+        type_ = unwrap_low_cardinality(type_)
+        write_string(out, name)
+        write_string(out, type_)
+        write_column(out, type_, columns[name])
+    return bytes(out)
+
+
+def unwrap_low_cardinality(type_: str) -> str:
+    # The server converts the columns to LowCardinality on insertion.
+    name, arguments = parse_type(type_)
+    if name == "LowCardinality":
+        return unwrap_low_cardinality(arguments[0])
+    if name == "Nullable":
+        return f"Nullable({unwrap_low_cardinality(arguments[0])})"
+    return type_
+
+
+def write_column(out: bytearray, type_: str, values: Any) -> None:
+    name, arguments = parse_type(type_)
+
+    if name in DTYPES:
+        out += np.ascontiguousarray(values, DTYPES[name]).tobytes()
+
+    elif name in TIME_DTYPES or name == "DateTime64":
+        if name == "DateTime64":
+            dtype, unit = "<i8", DATETIME64_UNITS[int(arguments[0])]
+        else:
+            dtype, unit = TIME_DTYPES[name]
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = values.astype(f"datetime64[{unit}]").view("<i8")
+        out += np.ascontiguousarray(values, dtype).tobytes()
+
+    elif name == "String":
+        for value in values:
+            write_string(out, value)
+
+    elif name == "FixedString":
+        out += np.ascontiguousarray(values, f"S{arguments[0]}").tobytes()
+
+    elif name == "Nullable":
+        mask = np.ma.getmaskarray(values)
+        out += mask.astype("<u1").tobytes()
+        values = np.ma.getdata(values)
+        if values.dtype == object:
+            # The values of the NULL rows are ignored, but must be encodable.
+            values = values.copy()
+            values[mask] = "" if arguments[0] == "String" else 0
+        write_column(out, arguments[0], values)
+
+    else:
+        raise ValueError(f"unsupported type for NumPy columns: {type_}")
@@ -0,0 +1,265 @@
+import threading
+import time
+from contextlib import AsyncExitStack, ExitStack
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Any, List, Optional, Tuple, Type
+
+import httpx
+
+from pych_client.constants import (
+    DEFAULT_KEEPALIVE_EXPIRY,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+)
+from pych_client.endpoints import get_endpoints
+from pych_client.logger import logger
+from pych_client.typing import BaseURL
+
+
+@dataclass
+class PoolStats:
+    """
+    Statistics of a connection pool.
+    `wait_time` is the total time spent by the requests waiting for a connection,
+    excluding the time spent opening new connections, in seconds.
+    `in_use` and `idle` are None if the connections of the transport are unavailable.
+    """
+
+    in_use: Optional[int] = 0
+    idle: Optional[int] = 0
+    created: int = 0
+    requests: int = 0
+    wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+
+class RequestTimer:
+    """Measure the time to acquire a connection, from the trace events of httpcore."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.acquired: Optional[float] = None
+        self.connect_start: Optional[float] = None
+        self.connect_time = 0.0
+        self.created = 0
+
+    def trace(self, name: str, info: dict) -> None:
+        now = time.perf_counter()
+        if name == "connection.connect_tcp.started":
+            self.connect_start = now
+        elif name == "connection.connect_tcp.complete":
+            self.created += 1
+        elif name.endswith(".send_request_headers.started") and not self.acquired:
+            self.acquired = now
+        if self.connect_start is not None and name in (
+            "connection.connect_tcp.complete",
+            "connection.start_tls.complete",
+        ):
+            self.connect_time = now - self.connect_start
+
+    async def atrace(self, name: str, info: dict) -> None:
+        self.trace(name, info)
+
+    @property
+    def wait_time(self) -> float:
+        if self.acquired is None:
+            return 0.0
+        return max(0.0, self.acquired - self.start - self.connect_time)
+
+
+def get_connections(transport: Any) -> Tuple[Optional[int], Optional[int]]:
+    """Return the number of connections in use and idle, or None if unavailable."""
+    # httpx does not expose the httpcore pool of its transports.
+    try:
+        connections: List[Any] = transport._pool.connections
+        idle = sum(1 for x in connections if x.is_idle())
+    except AttributeError:
+        logger.debug("the connections of %r are unavailable", transport)
+        return None, None
+    return len(connections) - idle, idle
+
+
+class BasePool:
+    def __init__(
+        self,
+        max_connections: Optional[int],
+        max_keepalive_connections: Optional[int],
+        keepalive_expiry: Optional[float],
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.lock = threading.Lock()
+        self.counters = PoolStats()
+
+    def record(self, timer: RequestTimer) -> None:
+        wait_time = timer.wait_time
+        with self.lock:
+            self.counters.created += timer.created
+            self.counters.requests += 1
+            self.counters.wait_time += wait_time
+            self.counters.max_wait_time = max(self.counters.max_wait_time, wait_time)
+
+    def get_stats(self, transport: Any) -> PoolStats:
+        in_use, idle = get_connections(transport)
+        with self.lock:
+            return PoolStats(
+                in_use=in_use,
+                idle=idle,
+                created=self.counters.created,
+                requests=self.counters.requests,
+                wait_time=self.counters.wait_time,
+                max_wait_time=self.counters.max_wait_time,
+            )
+
+
+class ConnectionPool(BasePool):
+    """
+    Connections shared by several `ClickHouseClient`, which can have
+    different credentials, databases and settings.
+    HTTP/2 requires the `h2` package (`pip install httpx[http2]`).
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections: Optional[int] = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: Optional[int] = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: Optional[float] = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = False,
+        verify: Any = True,
+    ) -> None:
+        super().__init__(max_connections, max_keepalive_connections, keepalive_expiry)
+        self.transport = httpx.HTTPTransport(
+            limits=self.limits, http2=http2, verify=verify
+        )
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    @property
+    def stats(self) -> PoolStats:
+        return self.get_stats(self.transport)
+
+    def get_transport(self) -> httpx.BaseTransport:
+        return SharedTransport(self)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        timer = RequestTimer()
+        request.extensions = {**request.extensions, "trace": timer.trace}
+        try:
+            return self.transport.handle_request(request)
+        finally:
+            self.record(timer)
+
+    def warm_up(self, base_url: BaseURL, connections: int = 1) -> None:
+        """Open `connections` connections to each endpoint, with `GET /ping`."""
+        with httpx.Client(
+            transport=self.get_transport()
+        ) as client, ExitStack() as stack:
+            # The responses are kept open, so that each request opens a new connection.
+            for url in get_endpoints(base_url):
+                for _ in range(connections):
+                    r = stack.enter_context(
+                        client.stream("GET", url.rstrip("/") + "/ping")
+                    )
+                    r.raise_for_status()
+                    # The body is read without closing the response,
+                    # so that the connection can be reused once it is closed.
+                    assert isinstance(r.stream, httpx.SyncByteStream)
+                    for _ in r.stream:
+                        pass
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncConnectionPool(BasePool):
+    """Connections shared by several `AsyncClickHouseClient`."""
+
+    def __init__(
+        self,
+        *,
+        max_connections: Optional[int] = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: Optional[int] = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: Optional[float] = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = False,
+        verify: Any = True,
+    ) -> None:
+        super().__init__(max_connections, max_keepalive_connections, keepalive_expiry)
+        self.transport = httpx.AsyncHTTPTransport(
+            limits=self.limits, http2=http2, verify=verify
+        )
+
+    async def __aenter__(self) -> "AsyncConnectionPool":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    @property
+    def stats(self) -> PoolStats:
+        return self.get_stats(self.transport)
+
+    def get_transport(self) -> httpx.AsyncBaseTransport:
+        return AsyncSharedTransport(self)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        timer = RequestTimer()
+        request.extensions = {**request.extensions, "trace": timer.atrace}
+        try:
+            return await self.transport.handle_async_request(request)
+        finally:
+            self.record(timer)
+
+    async def warm_up(self, base_url: BaseURL, connections: int = 1) -> None:
+        """Open `connections` connections to each endpoint, with `GET /ping`."""
+        async with httpx.AsyncClient(
+            transport=self.get_transport()
+        ) as client, AsyncExitStack() as stack:
+            for url in get_endpoints(base_url):
+                for _ in range(connections):
+                    r = await stack.enter_async_context(
+                        client.stream("GET", url.rstrip("/") + "/ping")
+                    )
+                    r.raise_for_status()
+                    assert isinstance(r.stream, httpx.AsyncByteStream)
+                    async for _ in r.stream:
+                        pass
+
+    async def close(self) -> None:
+        await self.transport.aclose()
+
+
+class SharedTransport(httpx.BaseTransport):
+    """Transport of a client, which does not close the pool with the client."""
+
+    def __init__(self, pool: ConnectionPool) -> None:
+        self.pool = pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.pool.handle_request(request)
+
+
+class AsyncSharedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, pool: AsyncConnectionPool) -> None:
+        self.pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.pool.handle_async_request(request)
@@ -0,0 +1,342 @@
+import re
+from datetime import date
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import quote
+
+import httpx
+from httpx import Response
+
+from pych_client.compression import compress_request
+from pych_client.decoding import decode_json
+from pych_client.endpoints import Endpoint
+from pych_client.line_decoder import BytesLineDecoder
+from pych_client.row_binary import datetime64_encoder, encode_datetime
+from pych_client.type_parser import parse_tuple_element, parse_type
+from pych_client.typing import Params, Settings
+
+if TYPE_CHECKING:
+    from pych_client.async_client import AsyncClickHouseClient
+    from pych_client.client import ClickHouseClient
+
+try:
+    import orjson as json
+except ModuleNotFoundError:
+    import json  # type: ignore
+
+Formatter = Callable[[Any], str]
+
+# Declaration of a query parameter, e.g. `{ids:Array(UInt64)}`.
+PARAMETER_RE = re.compile(r"\{\s*(\w+)\s*:\s*([^{}]+?)\s*\}")
+
+NUMBER_TYPES = re.compile(r"(U?Int\d+|Float\d+|Decimal\d*)$")
+
+# Settings which change with each request of a prepared query.
+PER_REQUEST_SETTINGS = ("query_id", "max_execution_time")
+
+JSON_SETTINGS = {
+    "default_format": "JSONEachRow",
+    "output_format_json_quote_64bit_integers": 0,
+}
+
+
+def get_parameter_types(query: str) -> Dict[str, str]:
+    return {name: type_ for name, type_ in PARAMETER_RE.findall(query)}
+
+
+def escape(value: str) -> str:
+    """Escape a top-level value, which is parsed like a TSV field."""
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def quote_string(value: str) -> str:
+    """Quote a nested value, which is parsed like a literal."""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def format_string(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def parameter_formatter(type_: str, nested: bool = False) -> Formatter:
+    """
+    Build a formatter for the values of a query parameter of the given type.
+    Top-level values are escaped, and nested values (in arrays, tuples and maps) are quoted.
+    Datetimes are formatted as timestamps, naive datetimes being assumed to be in UTC.
+    """
+    name, arguments = parse_type(type_)
+
+    if name == "Nullable":
+        format_value = parameter_formatter(arguments[0], nested)
+        null = "NULL" if nested else "\\N"
+
+        def format_nullable(value: Any) -> str:
+            return null if value is None else format_value(value)
+
+        return format_nullable
+
+    if name in ("LowCardinality", "SimpleAggregateFunction"):
+        return parameter_formatter(arguments[-1], nested)
+
+    if name == "Array":
+        format_item = parameter_formatter(arguments[0], True)
+
+        def format_array(value: Any) -> str:
+            return "[" + ",".join(map(format_item, value)) + "]"
+
+        return format_array
+
+    if name == "Tuple":
+        formatters = [
+            parameter_formatter(parse_tuple_element(x)[1], True) for x in arguments
+        ]
+
+        def format_tuple(value: Any) -> str:
+            items = (fn(item) for fn, item in zip(formatters, value))
+            return "(" + ",".join(items) + ")"
+
+        return format_tuple
+
+    if name == "Map":
+        format_key = parameter_formatter(arguments[0], True)
+        format_val = parameter_formatter(arguments[1], True)
+
+        def format_map(value: Any) -> str:
+            items = (f"{format_key(k)}:{format_val(v)}" for k, v in value.items())
+            return "{" + ",".join(items) + "}"
+
+        return format_map
+
+    if name == "Bool":
+
+        def format_bool(value: Any) -> str:
+            return "true" if value else "false"
+
+        return format_bool
+
+    if name == "DateTime":
+
+        def format_datetime(value: Any) -> str:
+            return str(encode_datetime(value))
+
+        return format_datetime
+
+    if name == "DateTime64":
+        precision = int(arguments[0]) if arguments else 3
+        encode = datetime64_encoder(arguments)
+
+        def format_datetime64(value: Any) -> str:
+            seconds, fraction = divmod(encode(value), 10**precision)
+            return f"{seconds}.{fraction:0{precision}d}" if precision else str(seconds)
+
+        return format_datetime64
+
+    if NUMBER_TYPES.match(name):
+        return str
+
+    # Strings, and values formatted as strings (dates, enums, UUIDs, IPs, ...).
+    if nested:
+
+        def format_quoted(value: Any) -> str:
+            return quote_string(format_string(value))
+
+        return format_quoted
+
+    def format_escaped(value: Any) -> str:
+        return escape(format_string(value))
+
+    return format_escaped
+
+
+class ParameterEncoder:
+    """
+    Encode the parameters of a query as URL parameters, with the formatters
+    of their types, and reuse the encoding of the values which did not change.
+    """
+
+    def __init__(self, query: str) -> None:
+        self.formatters = {
+            name: parameter_formatter(type_)
+            for name, type_ in get_parameter_types(query).items()
+        }
+        # The last value of each parameter, and its encoding.
+        self.encoded: Dict[str, Tuple[Any, str]] = {}
+
+    def encode(self, name: str, value: Any) -> str:
+        last = self.encoded.get(name)
+        if last and is_unchanged(last[0], value):
+            return last[1]
+        format_value = self.formatters.get(name, str)
+        encoded = f"param_{name}={quote(format_value(value), safe='')}"
+        self.encoded[name] = (value, encoded)
+        return encoded
+
+
+def is_unchanged(last: Any, value: Any) -> bool:
+    # Mutable values (lists, dicts) can change in place, so only hashable values are reused.
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return type(last) is type(value) and last == value
+
+
+class RequestTemplate:
+    """
+    A request of a query, whose body, headers and settings are encoded once.
+    The query ID and the time left before the deadline are added to each request.
+    """
+
+    def __init__(
+        self,
+        client: Union[httpx.Client, httpx.AsyncClient],
+        query: str,
+        settings: dict,
+        encoder: ParameterEncoder,
+        compression: Optional[str],
+    ) -> None:
+        self.settings = settings
+        self.encoder = encoder
+        static = {k: v for k, v in settings.items() if k not in PER_REQUEST_SETTINGS}
+        self.params = str(client.params.merge(static))
+        body, headers = compress_request(query.encode(), compression)
+        assert isinstance(body, bytes)
+        self.body = body
+        self.headers = httpx.Headers({**client.headers, **headers})
+        self.extensions = {"timeout": client.timeout.as_dict()}
+
+    def build(self, url: str, params: Params, settings: dict) -> httpx.Request:
+        parts = [f"{url}?{self.params}"]
+        for key in PER_REQUEST_SETTINGS:
+            if key in settings:
+                parts.append(f"{key}={quote(str(settings[key]), safe='')}")
+        if params:
+            parts += [self.encoder.encode(k, v) for k, v in params.items()]
+        return httpx.Request(
+            "POST",
+            "&".join(parts),
+            content=self.body,
+            headers=self.headers,
+            extensions=self.extensions,
+        )
+
+
+class PreparedQuery:
+    """
+    A query run with different parameters, whose request is encoded once.
+    The parameters are formatted according to their types in the query,
+    e.g. `{ids:Array(UInt64)}`, and encoded again only when they change.
+    The results of prepared queries are not cached.
+    """
+
+    def __init__(
+        self, client: "ClickHouseClient", query: str, settings: Settings = None
+    ) -> None:
+        self.client = client
+        self.query = query
+        encoder = ParameterEncoder(query)
+        compression = client.config["compression"]
+        settings = settings or {}
+        self.request = RequestTemplate(
+            client.client, query, settings, encoder, compression
+        )
+        self.json_request = RequestTemplate(
+            client.client, query, {**settings, **JSON_SETTINGS}, encoder, compression
+        )
+
+    def __call__(self, params: Params = None) -> List[dict]:
+        return self.json(params)
+
+    def send(
+        self, template: RequestTemplate, params: Params, stream: bool
+    ) -> Tuple[Response, Endpoint]:
+        return self.client.send(
+            self.query, params, None, template.settings, stream, template
+        )
+
+    def execute(self, params: Params = None) -> Response:
+        r, endpoint = self.send(self.request, params, stream=False)
+        self.client.endpoints.release(endpoint)
+        return r
+
+    def json(self, params: Params = None) -> List[dict]:
+        r, endpoint = self.send(self.json_request, params, stream=False)
+        self.client.endpoints.release(endpoint)
+        return decode_json(r.content)
+
+    def iter_json(self, params: Params = None) -> Iterator[dict]:
+        r, endpoint = self.send(self.json_request, params, stream=True)
+        try:
+            decoder = BytesLineDecoder()
+            for chunk in r.iter_bytes():
+                for line in decoder.decode(chunk):
+                    if line:
+                        yield json.loads(line)
+            for line in decoder.flush():
+                yield json.loads(line)
+        finally:
+            self.client.close_response(r, endpoint)
+
+
+class AsyncPreparedQuery:
+    def __init__(
+        self, client: "AsyncClickHouseClient", query: str, settings: Settings = None
+    ) -> None:
+        self.client = client
+        self.query = query
+        encoder = ParameterEncoder(query)
+        compression = client.config["compression"]
+        settings = settings or {}
+        self.request = RequestTemplate(
+            client.client, query, settings, encoder, compression
+        )
+        self.json_request = RequestTemplate(
+            client.client, query, {**settings, **JSON_SETTINGS}, encoder, compression
+        )
+
+    async def __call__(self, params: Params = None) -> List[dict]:
+        return await self.json(params)
+
+    async def send(
+        self, template: RequestTemplate, params: Params, stream: bool
+    ) -> Tuple[Response, Endpoint]:
+        return await self.client.send(
+            self.query, params, None, template.settings, stream, template
+        )
+
+    async def execute(self, params: Params = None) -> Response:
+        r, endpoint = await self.send(self.request, params, stream=False)
+        self.client.endpoints.release(endpoint)
+        return r
+
+    async def json(self, params: Params = None) -> List[dict]:
+        r, endpoint = await self.send(self.json_request, params, stream=False)
+        self.client.endpoints.release(endpoint)
+        return decode_json(r.content)
+
+    async def iter_json(self, params: Params = None) -> AsyncIterator[dict]:
+        r, endpoint = await self.send(self.json_request, params, stream=True)
+        try:
+            decoder = BytesLineDecoder()
+            async for chunk in r.aiter_bytes():
+                for line in decoder.decode(chunk):
+                    if line:
+                        yield json.loads(line)
+            for line in decoder.flush():
+                yield json.loads(line)
+        finally:
+            await self.client.close_response(r, endpoint)
@@ -0,0 +1,122 @@
+import random
+import re
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    FrozenSet,
+    Iterable,
+    Iterator,
+)
+
+import httpx
+
+from pych_client.exceptions import ClickHouseException
+from pych_client.external import get_external_tables
+from pych_client.typing import Data, Settings
+
+# ClickHouse errors caused by the state of the server or of the network,
+# rather than by the query itself.
+RETRYABLE_CODES = frozenset(
+    {
+        3,  # UNEXPECTED_END_OF_FILE
+        32,  # ATTEMPT_TO_READ_AFTER_EOF
+        202,  # TOO_MANY_SIMULTANEOUS_QUERIES
+        203,  # NO_FREE_CONNECTION
+        209,  # SOCKET_TIMEOUT
+        210,  # NETWORK_ERROR
+        236,  # ABORTED
+        242,  # TABLE_IS_READ_ONLY
+        252,  # TOO_MANY_PARTS
+        285,  # TOO_FEW_LIVE_REPLICAS
+        319,  # UNKNOWN_STATUS_OF_INSERT
+        425,  # SYSTEM_ERROR
+        999,  # KEEPER_EXCEPTION
+    }
+)
+
+READ_QUERY = re.compile(
+    r"\s*(SELECT|WITH|SHOW|DESCRIBE|DESC|EXISTS|EXPLAIN)\b", re.IGNORECASE
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retry the requests which failed with a transport error, or with one of `codes`,
+    at most `attempts` times in total.
+    Since a failed write may have been applied anyway, only read queries are retried,
+    and writes with an `insert_deduplication_token` setting, such as the inserts
+    of the client with a retry policy.
+    The delay before the n-th retry is drawn uniformly between 0 and
+    `min(max_backoff, backoff * 2 ** n)` (full jitter), or is equal to this bound
+    if `jitter` is disabled.
+    """
+
+    attempts: int = 3
+    backoff: float = 0.1
+    max_backoff: float = 10.0
+    jitter: bool = True
+    codes: FrozenSet[int] = RETRYABLE_CODES
+
+    def is_retryable(self, exception: BaseException) -> bool:
+        if isinstance(exception, ClickHouseException):
+            return exception.code in self.codes
+        return isinstance(exception, httpx.TransportError)
+
+    def should_retry(
+        self,
+        exception: BaseException,
+        attempt: int,
+        query: str,
+        data: Data,
+        settings: Settings,
+    ) -> bool:
+        return (
+            attempt + 1 < self.attempts
+            and is_replayable(data)
+            and is_idempotent(query, settings)
+            and self.is_retryable(exception)
+        )
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+class Replayable:
+    """Request body which can be sent again, by calling `fn` on each iteration."""
+
+    def __init__(self, fn: Callable[[], Iterable[bytes]]) -> None:
+        self.fn = fn
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self.fn())
+
+
+class AsyncReplayable:
+    def __init__(self, fn: Callable[[], AsyncIterable[bytes]]) -> None:
+        self.fn = fn
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.fn().__aiter__()
+
+
+def is_replayable(data: Any) -> bool:
+    """Iterators are consumed by the first request, and cannot be sent again."""
+    if tables := get_external_tables(data):
+        return all(is_replayable(table.data) for table in tables)
+    return not isinstance(data, (Iterator, AsyncIterator))
+
+
+def is_read_query(query: str, data: Data) -> bool:
+    return data is None and READ_QUERY.match(query) is not None
+
+
+def is_idempotent(query: str, settings: Settings) -> bool:
+    """Read queries, with external tables or not, and deduplicated writes."""
+    return READ_QUERY.match(query) is not None or "insert_deduplication_token" in (
+        settings or {}
+    )
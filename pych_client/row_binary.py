@@ -0,0 +1,608 @@
+import struct
+from datetime import date, datetime, timedelta, timezone
+from decimal import Context, Decimal
+from ipaddress import IPv4Address, IPv6Address
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from pych_client.type_parser import (
+    parse_enum,
+    parse_tuple_element,
+    parse_type,
+    unquote,
+)
+
+# A column decoder takes a buffer and a position,
+# and returns the decoded value and the position of the next value.
+# Decoders raise IndexError or struct.error when the buffer is too short.
+Decoder = Callable[[bytes, int], Tuple[Any, int]]
+
+# A column encoder appends the encoded value to the buffer.
+Encoder = Callable[[bytearray, Any], None]
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+STRUCT_FORMATS = {
+    "Bool": "?",
+    "Int8": "b",
+    "Int16": "h",
+    "Int32": "i",
+    "Int64": "q",
+    "UInt8": "B",
+    "UInt16": "H",
+    "UInt32": "I",
+    "UInt64": "Q",
+    "Float32": "f",
+    "Float64": "d",
+}
+
+BIG_INTEGERS = {
+    "Int128": (16, True),
+    "Int256": (32, True),
+    "UInt128": (16, False),
+    "UInt256": (32, False),
+}
+
+
+class RowBinaryDecoder:
+    """
+    Incremental decoder for the RowBinaryWithNamesAndTypes format.
+    The column decoders are built once, when the header is received,
+    so that no type dispatch happens for each row.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = b""
+        self.names: Optional[List[str]] = None
+        self.types: Optional[List[str]] = None
+        self.decode_row: Optional[Decoder] = None
+
+    def decode(self, data: bytes) -> List[tuple]:
+        if self.buffer:
+            data = self.buffer + data
+        pos = 0
+        if not self.decode_row:
+            try:
+                pos = self.decode_header(data)
+            except (IndexError, struct.error):
+                self.buffer = data
+                return []
+        decode_row = self.decode_row
+        assert decode_row
+        rows = []
+        end = len(data)
+        try:
+            while pos < end:
+                row, pos = decode_row(data, pos)
+                rows.append(row)
+        except (IndexError, struct.error):
+            pass
+        self.buffer = data[pos:]
+        return rows
+
+    def decode_header(self, data: bytes) -> int:
+        count, pos = read_varint(data, 0)
+        names = []
+        for _ in range(count):
+            name, pos = read_string(data, pos)
+            names.append(name)
+        types = []
+        for _ in range(count):
+            type_, pos = read_string(data, pos)
+            types.append(type_)
+        self.names = names
+        self.types = types
+        self.decode_row = row_decoder(types)
+        return pos
+
+    def flush(self) -> List[tuple]:
+        if self.buffer:
+            raise ValueError("truncated RowBinary stream")
+        return []
+
+
+def read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    shift = 0
+    result = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def read_string(data: bytes, pos: int) -> Tuple[str, int]:
+    size, pos = read_varint(data, pos)
+    end = pos + size
+    if end > len(data):
+        raise IndexError
+    return data[pos:end].decode(errors="replace"), end
+
+
+def row_decoder(types: List[str]) -> Decoder:
+    """Build a decoder returning the values of a row as a tuple."""
+    # Consecutive fixed-width columns are unpacked with a single struct call.
+    steps: List[Tuple[Optional[struct.Struct], Any]] = []
+    fmt = ""
+    converters: List[Optional[Callable[[Any], Any]]] = []
+    for type_ in types:
+        if spec := fixed_width(type_):
+            fmt += spec[0]
+            converters.append(spec[1])
+            continue
+        if fmt:
+            steps.append((struct.Struct("<" + fmt), converters))
+            fmt, converters = "", []
+        steps.append((None, column_decoder(type_)))
+    if fmt:
+        steps.append((struct.Struct("<" + fmt), converters))
+
+    if len(steps) == 1 and (st := steps[0][0]) and not any(converters):
+        # Fast-path for rows made only of fixed-width columns.
+        size = st.size
+        unpack_from = st.unpack_from
+
+        def decode_fixed_row(data: bytes, pos: int) -> Tuple[Any, int]:
+            return unpack_from(data, pos), pos + size
+
+        return decode_fixed_row
+
+    def decode_row(data: bytes, pos: int) -> Tuple[Any, int]:
+        row: List[Any] = []
+        for st, arg in steps:
+            if st:
+                values = st.unpack_from(data, pos)
+                pos += st.size
+                row.extend(
+                    convert(value) if convert else value
+                    for convert, value in zip(arg, values)
+                )
+            else:
+                value, pos = arg(data, pos)
+                row.append(value)
+        return tuple(row), pos
+
+    return decode_row
+
+
+def fixed_width(type_: str) -> Optional[Tuple[str, Optional[Callable[[Any], Any]]]]:
+    """Return the struct format and the converter of a fixed-width type, if any."""
+    name, arguments = parse_type(type_)
+    if name == "LowCardinality":
+        return fixed_width(arguments[0])
+    if name in STRUCT_FORMATS:
+        return STRUCT_FORMATS[name], None
+    if name == "Date":
+        return "H", convert_date
+    if name == "Date32":
+        return "i", convert_date
+    if name == "DateTime":
+        return "I", datetime_converter(arguments)
+    if name == "DateTime64":
+        return "q", datetime64_converter(arguments)
+    if name == "IPv4":
+        return "I", IPv4Address
+    if name in ("Enum8", "Enum16"):
+        return ("b" if name == "Enum8" else "h"), parse_enum(arguments).__getitem__
+    if name == "Decimal32" or (name == "Decimal" and int(arguments[0]) <= 9):
+        return "i", decimal_converter(arguments[-1])
+    if name == "Decimal64" or (name == "Decimal" and int(arguments[0]) <= 18):
+        return "q", decimal_converter(arguments[-1])
+    return None
+
+
+def column_decoder(type_: str) -> Decoder:
+    """Build a decoder for a single value of the given type."""
+    if spec := fixed_width(type_):
+        st = struct.Struct("<" + spec[0])
+        size = st.size
+        unpack_from = st.unpack_from
+        convert = spec[1]
+        if convert:
+
+            def decode_converted(data: bytes, pos: int) -> Tuple[Any, int]:
+                return convert(unpack_from(data, pos)[0]), pos + size
+
+            return decode_converted
+
+        def decode_fixed(data: bytes, pos: int) -> Tuple[Any, int]:
+            return unpack_from(data, pos)[0], pos + size
+
+        return decode_fixed
+
+    name, arguments = parse_type(type_)
+
+    if name == "String":
+        return read_string
+
+    if name == "FixedString":
+        length = int(arguments[0])
+
+        def decode_fixed_string(data: bytes, pos: int) -> Tuple[Any, int]:
+            end = pos + length
+            if end > len(data):
+                raise IndexError
+            return data[pos:end], end
+
+        return decode_fixed_string
+
+    if name in BIG_INTEGERS:
+        length, signed = BIG_INTEGERS[name]
+        return big_integer_decoder(length, signed, None)
+
+    if name in ("Decimal", "Decimal128", "Decimal256"):
+        precision = int(arguments[0]) if name == "Decimal" else 0
+        length = 32 if name == "Decimal256" or precision > 38 else 16
+        return big_integer_decoder(length, True, decimal_converter(arguments[-1]))
+
+    if name == "UUID":
+        unpack_from = struct.Struct("<QQ").unpack_from
+
+        def decode_uuid(data: bytes, pos: int) -> Tuple[Any, int]:
+            high, low = unpack_from(data, pos)
+            return UUID(int=(high << 64) | low), pos + 16
+
+        return decode_uuid
+
+    if name == "IPv6":
+
+        def decode_ipv6(data: bytes, pos: int) -> Tuple[Any, int]:
+            end = pos + 16
+            if end > len(data):
+                raise IndexError
+            return IPv6Address(data[pos:end]), end
+
+        return decode_ipv6
+
+    if name == "Nullable":
+        decode_value = column_decoder(arguments[0])
+
+        def decode_nullable(data: bytes, pos: int) -> Tuple[Any, int]:
+            if data[pos]:
+                return None, pos + 1
+            return decode_value(data, pos + 1)
+
+        return decode_nullable
+
+    if name == "Nothing":
+
+        def decode_nothing(data: bytes, pos: int) -> Tuple[Any, int]:
+            return None, pos
+
+        return decode_nothing
+
+    if name in ("LowCardinality", "SimpleAggregateFunction"):
+        return column_decoder(arguments[-1])
+
+    if name == "Array":
+        decode_item = column_decoder(arguments[0])
+
+        def decode_array(data: bytes, pos: int) -> Tuple[Any, int]:
+            size, pos = read_varint(data, pos)
+            items = []
+            for _ in range(size):
+                item, pos = decode_item(data, pos)
+                items.append(item)
+            return items, pos
+
+        return decode_array
+
+    if name == "Map":
+        decode_key = column_decoder(arguments[0])
+        decode_val = column_decoder(arguments[1])
+
+        def decode_map(data: bytes, pos: int) -> Tuple[Any, int]:
+            size, pos = read_varint(data, pos)
+            items = {}
+            for _ in range(size):
+                key, pos = decode_key(data, pos)
+                items[key], pos = decode_val(data, pos)
+            return items, pos
+
+        return decode_map
+
+    if name == "Tuple":
+        decoders = [column_decoder(parse_tuple_element(x)[1]) for x in arguments]
+
+        def decode_tuple(data: bytes, pos: int) -> Tuple[Any, int]:
+            items = []
+            for decoder in decoders:
+                item, pos = decoder(data, pos)
+                items.append(item)
+            return tuple(items), pos
+
+        return decode_tuple
+
+    raise ValueError(f"unsupported type: {type_}")
+
+
+def big_integer_decoder(
+    length: int, signed: bool, convert: Optional[Callable[[Any], Any]]
+) -> Decoder:
+    from_bytes = int.from_bytes
+
+    def decode_big_integer(data: bytes, pos: int) -> Tuple[Any, int]:
+        end = pos + length
+        if end > len(data):
+            raise IndexError
+        value = from_bytes(data[pos:end], "little", signed=signed)
+        return (convert(value) if convert else value), end
+
+    return decode_big_integer
+
+
+def convert_date(days: int) -> date:
+    return date.fromordinal(EPOCH_ORDINAL + days)
+
+
+def datetime_converter(arguments: List[str]) -> Callable[[int], datetime]:
+    if arguments:
+        tz = ZoneInfo(unquote(arguments[0]))
+        return lambda seconds: datetime.fromtimestamp(seconds, tz)
+    return lambda seconds: EPOCH + timedelta(seconds=seconds)
+
+
+def datetime64_converter(arguments: List[str]) -> Callable[[int], datetime]:
+    precision = int(arguments[0]) if arguments else 3
+    tz = ZoneInfo(unquote(arguments[1])) if len(arguments) > 1 else None
+    if precision <= 6:
+        factor: int = 10 ** (6 - precision)
+
+        def to_microseconds(ticks: int) -> int:
+            return ticks * factor
+
+    else:
+        divisor: int = 10 ** (precision - 6)
+
+        def to_microseconds(ticks: int) -> int:
+            return ticks // divisor
+
+    if tz:
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        return lambda ticks: (
+            epoch + timedelta(microseconds=to_microseconds(ticks))
+        ).astimezone(tz)
+    return lambda ticks: EPOCH + timedelta(microseconds=to_microseconds(ticks))
+
+
+def decimal_converter(scale: str) -> Callable[[int], Decimal]:
+    exponent = -int(scale)
+    # The default context rounds to 28 digits, and Decimal256 has up to 76.
+    context = Context(prec=76)
+    return lambda value: Decimal(value).scaleb(exponent, context)
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def write_string(out: bytearray, value: Any) -> None:
+    if isinstance(value, str):
+        value = value.encode()
+    write_varint(out, len(value))
+    out += value
+
+
+def row_encoder(types: List[str]) -> Callable[[bytearray, Sequence[Any]], None]:
+    """Build an encoder appending the values of a row to a buffer."""
+    specs = [encoded_fixed_width(type_) for type_ in types]
+    if all(spec and not spec[1] for spec in specs):
+        # Fast-path for rows made only of fixed-width columns.
+        pack = struct.Struct("<" + "".join(spec[0] for spec in specs if spec)).pack
+
+        def encode_fixed_row(out: bytearray, row: Sequence[Any]) -> None:
+            out += pack(*row)
+
+        return encode_fixed_row
+
+    encoders = [column_encoder(type_) for type_ in types]
+
+    def encode_row(out: bytearray, row: Sequence[Any]) -> None:
+        for encoder, value in zip(encoders, row):
+            encoder(out, value)
+
+    return encode_row
+
+
+def encoded_fixed_width(
+    type_: str,
+) -> Optional[Tuple[str, Optional[Callable[[Any], Any]]]]:
+    """Return the struct format and the converter to encode a fixed-width type, if any."""
+    name, arguments = parse_type(type_)
+    if name == "LowCardinality":
+        return encoded_fixed_width(arguments[0])
+    if name in STRUCT_FORMATS:
+        return STRUCT_FORMATS[name], None
+    if name == "Date":
+        return "H", encode_date
+    if name == "Date32":
+        return "i", encode_date
+    if name == "DateTime":
+        return "I", encode_datetime
+    if name == "DateTime64":
+        return "q", datetime64_encoder(arguments)
+    if name == "IPv4":
+        return "I", encode_ipv4
+    if name in ("Enum8", "Enum16"):
+        mapping = {v: k for k, v in parse_enum(arguments).items()}
+        return ("b" if name == "Enum8" else "h"), lambda x: mapping.get(x, x)
+    if name == "Decimal32" or (name == "Decimal" and int(arguments[0]) <= 9):
+        return "i", decimal_encoder(arguments[-1])
+    if name == "Decimal64" or (name == "Decimal" and int(arguments[0]) <= 18):
+        return "q", decimal_encoder(arguments[-1])
+    return None
+
+
+def column_encoder(type_: str) -> Encoder:
+    """Build an encoder for a single value of the given type."""
+    if spec := encoded_fixed_width(type_):
+        pack = struct.Struct("<" + spec[0]).pack
+        convert = spec[1]
+        if convert:
+
+            def encode_converted(out: bytearray, value: Any) -> None:
+                out += pack(convert(value))
+
+            return encode_converted
+
+        def encode_fixed(out: bytearray, value: Any) -> None:
+            out += pack(value)
+
+        return encode_fixed
+
+    name, arguments = parse_type(type_)
+
+    if name == "String":
+        return write_string
+
+    if name == "FixedString":
+        length = int(arguments[0])
+
+        def encode_fixed_string(out: bytearray, value: Any) -> None:
+            if isinstance(value, str):
+                value = value.encode()
+            if len(value) > length:
+                raise ValueError(f"value too long for {type_}: {value!r}")
+            out += value.ljust(length, b"\0")
+
+        return encode_fixed_string
+
+    if name in BIG_INTEGERS:
+        length, signed = BIG_INTEGERS[name]
+        return big_integer_encoder(length, signed, None)
+
+    if name in ("Decimal", "Decimal128", "Decimal256"):
+        precision = int(arguments[0]) if name == "Decimal" else 0
+        length = 32 if name == "Decimal256" or precision > 38 else 16
+        return big_integer_encoder(length, True, decimal_encoder(arguments[-1]))
+
+    if name == "UUID":
+        pack = struct.Struct("<QQ").pack
+
+        def encode_uuid(out: bytearray, value: Any) -> None:
+            if not isinstance(value, UUID):
+                value = UUID(value)
+            out += pack(value.int >> 64, value.int & 0xFFFFFFFFFFFFFFFF)
+
+        return encode_uuid
+
+    if name == "IPv6":
+
+        def encode_ipv6(out: bytearray, value: Any) -> None:
+            if isinstance(value, IPv4Address):
+                value = IPv6Address(f"::ffff:{value}")
+            out += IPv6Address(value).packed
+
+        return encode_ipv6
+
+    if name == "Nullable":
+        encode_value = column_encoder(arguments[0])
+
+        def encode_nullable(out: bytearray, value: Any) -> None:
+            if value is None:
+                out.append(1)
+            else:
+                out.append(0)
+                encode_value(out, value)
+
+        return encode_nullable
+
+    if name in ("LowCardinality", "SimpleAggregateFunction"):
+        return column_encoder(arguments[-1])
+
+    if name == "Array":
+        encode_item = column_encoder(arguments[0])
+
+        def encode_array(out: bytearray, value: Any) -> None:
+            write_varint(out, len(value))
+            for item in value:
+                encode_item(out, item)
+
+        return encode_array
+
+    if name == "Map":
+        encode_key = column_encoder(arguments[0])
+        encode_val = column_encoder(arguments[1])
+
+        def encode_map(out: bytearray, value: Any) -> None:
+            write_varint(out, len(value))
+            for key, val in value.items():
+                encode_key(out, key)
+                encode_val(out, val)
+
+        return encode_map
+
+    if name == "Tuple":
+        encoders = [column_encoder(parse_tuple_element(x)[1]) for x in arguments]
+
+        def encode_tuple(out: bytearray, value: Any) -> None:
+            for encoder, item in zip(encoders, value):
+                encoder(out, item)
+
+        return encode_tuple
+
+    raise ValueError(f"unsupported type: {type_}")
+
+
+def big_integer_encoder(
+    length: int, signed: bool, convert: Optional[Callable[[Any], int]]
+) -> Encoder:
+    def encode_big_integer(out: bytearray, value: Any) -> None:
+        if convert:
+            value = convert(value)
+        out += value.to_bytes(length, "little", signed=signed)
+
+    return encode_big_integer
+
+
+def encode_date(value: Any) -> int:
+    if isinstance(value, int):
+        return value
+    return int(value.toordinal() - EPOCH_ORDINAL)
+
+
+def encode_datetime(value: Any) -> int:
+    # Naive datetimes are assumed to be in UTC, as returned by the decoder.
+    if isinstance(value, int):
+        return value
+    if value.tzinfo:
+        return int(value.timestamp())
+    return int((value - EPOCH) // timedelta(seconds=1))
+
+
+def datetime64_encoder(arguments: List[str]) -> Callable[[Any], int]:
+    precision = int(arguments[0]) if arguments else 3
+    unit = timedelta(microseconds=1)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+    def encode_datetime64(value: Any) -> int:
+        if isinstance(value, int):
+            return value
+        microseconds = (value - (epoch if value.tzinfo else EPOCH)) // unit
+        if precision <= 6:
+            return int(microseconds // 10 ** (6 - precision))
+        return int(microseconds * 10 ** (precision - 6))
+
+    return encode_datetime64
+
+
+def encode_ipv4(value: Any) -> int:
+    return int(IPv4Address(value))
+
+
+def decimal_encoder(scale: str) -> Callable[[Any], int]:
+    exponent = int(scale)
+
+    def encode_decimal(value: Any) -> int:
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
+        return int(value.scaleb(exponent).to_integral_value())
+
+    return encode_decimal
@@ -0,0 +1,55 @@
+import re
+from typing import List
+
+TOKEN_RE = re.compile(
+    r"--[^\n]*|/\*.*?\*/|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`(?:[^`\\]|\\.)*`|\w+|\S",
+    re.DOTALL,
+)
+
+
+def get_partition_queries(query: str, key: str, partitions: int) -> List[str]:
+    """
+    Split a query in `partitions` disjoint slices of its results,
+    by the hash of `key`, a column or an expression of the columns of the results.
+    The filter is pushed down to the tables by ClickHouse when possible.
+    The slices are run as separate queries, so they only partition the results
+    if the query is deterministic: no LIMIT without ORDER BY, no `rand()`,
+    and no concurrent writes to the tables.
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    query = strip_query(query)
+    # The newline ends a trailing `-- comment` before the closing parenthesis.
+    return [
+        f"SELECT * FROM ({query}\n) WHERE cityHash64({key}) % {partitions} = {i}"
+        for i in range(partitions)
+    ]
+
+
+def strip_query(query: str) -> str:
+    """
+    Remove the final semicolon of a query, which can be followed by comments,
+    and reject the FORMAT and SETTINGS clauses, which are not valid in a subquery.
+    """
+    matches = [
+        x for x in TOKEN_RE.finditer(query) if not x.group().startswith(("--", "/*"))
+    ]
+    if matches and matches[-1].group() == ";":
+        start, end = matches.pop().span()
+        query = query[:start] + query[end:]
+    tokens = [x.group() for x in matches]
+    depth = 0
+    for token, next_token in zip(tokens, tokens[1:] + [""]):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth or token.upper() not in ("FORMAT", "SETTINGS"):
+            continue
+        # `format(...)` is a function.
+        elif next_token != "(":
+            raise ValueError(
+                f"the query cannot have a {token.upper()} clause, "
+                "pass the format or the settings in `settings` instead"
+            )
+    return query.strip()
@@ -0,0 +1,70 @@
+import json
+from contextvars import ContextVar
+from dataclasses import dataclass, fields
+from typing import Callable, List, Optional
+
+import httpx
+
+from pych_client.constants import (
+    CLICKHOUSE_PROGRESS_HEADER,
+    CLICKHOUSE_QUERY_ID_HEADER,
+    CLICKHOUSE_SUMMARY_HEADER,
+)
+
+
+@dataclass
+class QueryStats:
+    """
+    Statistics of a query, from the `X-ClickHouse-Summary` header,
+    or from an `X-ClickHouse-Progress` header.
+    For streaming responses, the summary is sent by the server before the results,
+    unless the `wait_end_of_query` setting is enabled.
+    `elapsed` is the time measured by the server, in seconds, if available,
+    or else the time measured by the client until the response headers.
+    """
+
+    query_id: Optional[str] = None
+    read_rows: int = 0
+    read_bytes: int = 0
+    written_rows: int = 0
+    written_bytes: int = 0
+    total_rows_to_read: int = 0
+    result_rows: int = 0
+    result_bytes: int = 0
+    elapsed: float = 0.0
+
+    @classmethod
+    def from_header(
+        cls, value: Optional[str], query_id: Optional[str], elapsed: float
+    ) -> "QueryStats":
+        values = json.loads(value) if value else {}
+        if "elapsed_ns" in values:
+            elapsed = int(values["elapsed_ns"]) / 1e9
+        counters = {
+            field.name: int(values[field.name])
+            for field in fields(cls)
+            if field.type is int and field.name in values
+        }
+        return cls(query_id=query_id, elapsed=elapsed, **counters)
+
+
+ProgressCallback = Callable[[QueryStats], None]
+
+# Statistics of the last query run in the current thread, or in the current task.
+last_stats: ContextVar[Optional[QueryStats]] = ContextVar("last_stats", default=None)
+
+
+def get_query_stats(response: httpx.Response, elapsed: float) -> QueryStats:
+    return QueryStats.from_header(
+        response.headers.get(CLICKHOUSE_SUMMARY_HEADER),
+        response.headers.get(CLICKHOUSE_QUERY_ID_HEADER),
+        elapsed,
+    )
+
+
+def get_query_progress(response: httpx.Response) -> List[QueryStats]:
+    query_id = response.headers.get(CLICKHOUSE_QUERY_ID_HEADER)
+    return [
+        QueryStats.from_header(value, query_id, 0.0)
+        for value in response.headers.get_list(CLICKHOUSE_PROGRESS_HEADER)
+    ]
@@ -0,0 +1,71 @@
+import re
+from typing import Dict, List, Tuple
+
+ENUM_VALUE_RE = re.compile(r"'((?:[^'\\]|\\.)*)'\s*=\s*(-?\d+)")
+
+
+def parse_type(type_: str) -> Tuple[str, List[str]]:
+    """
+    Split a ClickHouse type into its name and its top-level arguments.
+    >>> parse_type("Map(String, Array(UInt8))")
+    ('Map', ['String', 'Array(UInt8)'])
+    """
+    type_ = type_.strip()
+    name, sep, arguments = type_.partition("(")
+    if not sep or not arguments.endswith(")"):
+        return type_, []
+    return name, split_arguments(arguments[:-1])
+
+
+def split_arguments(arguments: str) -> List[str]:
+    """Split a comma-separated list of arguments, ignoring nested and quoted commas."""
+    result = []
+    depth = 0
+    quoted = False
+    escaped = False
+    start = 0
+    for i, c in enumerate(arguments):
+        if escaped:
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif c == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            result.append(arguments[start:i].strip())
+            start = i + 1
+    if arguments.strip():
+        result.append(arguments[start:].strip())
+    return result
+
+
+def parse_enum(arguments: List[str]) -> Dict[int, str]:
+    """Return the mapping from values to names of an Enum8/Enum16 type."""
+    mapping = {}
+    for argument in arguments:
+        if match := ENUM_VALUE_RE.fullmatch(argument):
+            name = match.group(1).replace("\\'", "'").replace("\\\\", "\\")
+            mapping[int(match.group(2))] = name
+    return mapping
+
+
+def parse_tuple_element(argument: str) -> Tuple[str, str]:
+    """
+    Return the name (possibly empty) and the type of a tuple element.
+    >>> parse_tuple_element("a Nullable(String)")
+    ('a', 'Nullable(String)')
+    """
+    name, _, type_ = argument.partition(" ")
+    if type_ and "(" not in name:
+        return name.strip("`"), type_.strip()
+    return "", argument
+
+
+def unquote(argument: str) -> str:
+    return argument.strip().strip("'")
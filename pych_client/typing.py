@@ -1,5 +1,23 @@
-from typing import AsyncIterable, Iterable, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterable,
+    Iterable,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-Data = Union[str, bytes, AsyncIterable[bytes], Iterable[bytes], None]
+if TYPE_CHECKING:
+    from pych_client.external import ExternalTable
+
+# A single URL, a comma-separated list of URLs, or a list of URLs.
+BaseURL = Union[str, Sequence[str]]
+Body = Union[str, bytes, AsyncIterable[bytes], Iterable[bytes], None]
+# A request body, or external tables sent in the body.
+Data = Union[Body, "ExternalTable", Sequence["ExternalTable"]]
 Params = Optional[dict]
 Settings = Optional[dict]
+
+# A query, or a query and its parameters.
+Query = Union[str, Tuple[str, Params]]
@@ -0,0 +1,40 @@
+import pytest
+
+from pych_client.arrow import ArrowStreamDecoder
+
+pa = pytest.importorskip("pyarrow")
+
+
+def test_arrow_decoder_chunks():
+    table = pa.table({"x": list(range(100)), "y": [str(x) for x in range(100)]})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=10):
+            writer.write_batch(batch)
+    data = sink.getvalue().to_pybytes()
+    decoder = ArrowStreamDecoder()
+    batches = []
+    for i in range(0, len(data), 7):
+        batches += decoder.decode(data[i:][:7])
+    batches += decoder.flush()
+    assert len(batches) == 10
+    assert decoder.to_table(batches).equals(table)
+
+
+def test_execute_arrow(client):
+    table = client.arrow("SELECT number AS x, toString(x) AS y FROM numbers(3)")
+    assert table.to_pydict() == {"x": [0, 1, 2], "y": ["0", "1", "2"]}
+
+
+def test_execute_arrow_batches_iter(client):
+    batches = list(
+        client.iter_arrow_batches(
+            "SELECT number AS x FROM numbers(10)", settings={"max_block_size": 4}
+        )
+    )
+    assert pa.Table.from_batches(batches).column("x").to_pylist() == list(range(10))
+
+
+async def test_execute_arrow_async(async_client):
+    table = await async_client.arrow("SELECT number AS x FROM numbers(3)")
+    assert table.column("x").to_pylist() == [0, 1, 2]
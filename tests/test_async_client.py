@@ -1,5 +1,8 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import pytest
 
+from pych_client import AsyncClickHouseClient
 from pych_client.exceptions import ClickHouseException
 
 
@@ -37,6 +40,33 @@ async def test_execute_json_iter(async_client):
     assert actual == expected
 
 
+async def test_execute_batches(async_client):
+    query = "SELECT number AS x FROM numbers(10)"
+    batches = [x async for x in async_client.iter_json_batches(query, batch_size=4)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert batches[2] == [{"x": 8}, {"x": 9}]
+    batches = [x async for x in async_client.iter_text_batches(query, batch_size=8)]
+    assert batches == [[str(i) for i in range(8)], ["8", "9"]]
+    batches = [x async for x in async_client.iter_rows_batches(query, batch_size=5)]
+    assert batches == [[(i,) for i in range(5)], [(i,) for i in range(5, 10)]]
+
+
+@pytest.mark.parametrize("executor", [ThreadPoolExecutor, ProcessPoolExecutor])
+async def test_execute_decode_executor(executor):
+    query = "SELECT number AS x FROM numbers(10000)"
+    expected = [{"x": i} for i in range(10000)]
+    with executor(2) as decode_executor:
+        async with AsyncClickHouseClient(decode_executor=decode_executor) as client:
+            assert await client.json(query) == expected
+            assert [x async for x in client.iter_json(query)] == expected
+            batches = [x async for x in client.iter_json_batches(query)]
+            assert [x for batch in batches for x in batch] == expected
+            lines = [x async for x in client.iter_text(query)]
+            assert lines == [str(i) for i in range(10000)]
+            batches = [x async for x in client.iter_text_batches(query)]
+            assert sum(batches, []) == lines
+
+
 async def test_execute_json_int64(async_client):
     assert await async_client.json("SELECT toInt64(1) AS x") == [{"x": 1}]
 
@@ -59,3 +89,101 @@ async def test_execute_json_iter_exception(async_client):
         [x async for x in async_client.iter_json("SELECT * FROM invalid_table")]
     assert exc_info.value.code == 60
     assert "DB::Exception" in exc_info.value.error
+
+
+async def test_execute_rows(async_client):
+    expected = [(1, "a"), (2, "b")]
+    actual = await async_client.rows("SELECT arrayJoin([1, 2]) AS x, char(96 + x) AS y")
+    assert actual == expected
+
+
+async def test_execute_rows_iter(async_client):
+    expected = [{"x": 1, "y": "a"}, {"x": 2, "y": "b"}]
+    actual = [
+        x
+        async for x in async_client.iter_rows(
+            "SELECT arrayJoin([1, 2]) AS x, char(96 + x) AS y", as_dict=True
+        )
+    ]
+    assert actual == expected
+
+
+async def test_insert(async_client):
+    params = {"table": "test_pych_insert_async"}
+    await async_client.execute("DROP TABLE IF EXISTS {table:Identifier}", params)
+    await async_client.execute(
+        "CREATE TABLE {table:Identifier} (a UInt64) ENGINE MergeTree() ORDER BY a",
+        params,
+    )
+
+    async def rows():
+        for i in range(10):
+            yield (i,)
+
+    await async_client.insert("test_pych_insert_async", rows(), batch_size=3)
+    assert await async_client.json(
+        "SELECT sum(a) AS a FROM {table:Identifier}", params
+    ) == [{"a": 45}]
+
+
+async def test_insert_batches(async_client):
+    params = {"table": "test_pych_insert_batches"}
+    await async_client.execute("DROP TABLE IF EXISTS {table:Identifier}", params)
+    await async_client.execute(
+        """
+        CREATE TABLE {table:Identifier} (a UInt64, CONSTRAINT c CHECK a < 50)
+        ENGINE MergeTree() ORDER BY a
+        """,
+        params,
+    )
+
+    async def rows():
+        for i in range(100):
+            yield (i,)
+
+    batches = [
+        x
+        async for x in async_client.insert_batches(
+            "test_pych_insert_batches", rows(), batch_size=10, concurrency=3
+        )
+    ]
+    assert [x.index for x in batches] == list(range(10))
+    assert all(x.rows == 10 for x in batches)
+    failed = [x for x in batches if x.error]
+    assert [x.index for x in failed] == [5, 6, 7, 8, 9]
+    assert all(isinstance(x.error, ClickHouseException) for x in failed)
+    query = "SELECT count() AS n FROM {table:Identifier}"
+    assert await async_client.json(query, params) == [{"n": 50}]
+
+    await async_client.execute(
+        "ALTER TABLE {table:Identifier} DROP CONSTRAINT c", params
+    )
+    for batch in failed:
+        await async_client.insert_batch(batch)
+    assert await async_client.json(query, params) == [{"n": 100}]
+
+
+async def test_map(async_client):
+    queries = [("SELECT {i:UInt64} AS x", {"i": i}) for i in range(20)]
+    actual = [x async for x in async_client.map(queries, concurrency=4)]
+    assert actual == [[{"x": i}] for i in range(20)]
+
+
+async def test_map_unordered_exceptions(async_client):
+    queries = ["SELECT 1 AS x", "SELECT * FROM invalid_table"]
+    actual = [
+        x
+        async for x in async_client.map(queries, ordered=False, return_exceptions=True)
+    ]
+    assert [{"x": 1}] in actual
+    assert any(isinstance(x, ClickHouseException) for x in actual)
+
+
+async def test_parallel_scan(async_client):
+    query = "SELECT number AS x, toString(number) AS y FROM numbers(5000)"
+    scan = async_client.parallel_scan(query, "x", 4, method="iter_rows")
+    actual = [x async for x in scan]
+    assert sorted(actual) == [(i, str(i)) for i in range(5000)]
+    with pytest.raises(ClickHouseException):
+        async for _ in async_client.parallel_scan("SELECT * FROM invalid_table", "x"):
+            pass
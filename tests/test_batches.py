@@ -0,0 +1,27 @@
+import pytest
+
+from pych_client.batches import Batcher
+
+
+def test_batch_size():
+    batcher = Batcher(3)
+    assert batcher.add([1, 2], 20) == []
+    assert batcher.add([3, 4, 5, 6, 7, 8, 9], 70) == [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert batcher.add([10], 10) == []
+    assert batcher.add([], 0) == []
+    assert batcher.flush() == [[10]]
+    assert batcher.flush() == []
+
+
+def test_max_batch_bytes():
+    batcher = Batcher(100, max_batch_bytes=25)
+    assert batcher.add([1, 2, 3, 4, 5], 50) == [[1, 2], [3, 4]]
+    assert batcher.add([6, 7], 40) == [[5], [6], [7]]
+    # Items larger than the limit are returned one by one.
+    assert batcher.add([8, 9], 100) == [[8], [9]]
+    assert batcher.flush() == []
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        Batcher(0)
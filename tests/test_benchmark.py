@@ -0,0 +1,37 @@
+import json
+
+from pych_client.benchmark import percentile
+from pych_client.cli import main
+
+
+def test_percentile():
+    values = [float(x) for x in range(1, 101)]
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile(values[:1], 0.9) == 1.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_benchmark(tmp_path):
+    queries = tmp_path / "queries.sql"
+    queries.write_text("-- comment\nSELECT 1\n\nSELECT * FROM numbers(10)\n")
+    output = tmp_path / "report.json"
+    args = ["-c", "2", "-i", "6", "--server-stats", "--json", str(output)]
+    main(["benchmark", str(queries), *args])
+    report = json.loads(output.read_text())
+    assert [x["query"] for x in report["queries"]] == [
+        "SELECT 1",
+        "SELECT * FROM numbers(10)",
+    ]
+    assert [x["queries"] for x in report["queries"]] == [3, 3]
+    assert report["total"]["queries"] == 6
+    assert report["total"]["errors"] == 0
+    assert report["total"]["rows_per_second"] > 0
+    assert report["total"]["read_rows_per_second"] > 0
+    assert report["total"]["p50"] <= report["total"]["p99"] <= report["total"]["max"]
+
+
+def test_benchmark_errors(capsys):
+    main(["benchmark", "-q", "SELECT * FROM invalid_table", "-i", "2"])
+    out, _ = capsys.readouterr()
+    assert "errors: 2" in out
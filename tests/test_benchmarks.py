@@ -0,0 +1,48 @@
+import pytest
+
+from benchmarks.run import main, run_benchmarks
+from benchmarks.server import run_server
+from pych_client import ClickHouseClient
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    with run_server() as url:
+        yield url
+
+
+@pytest.mark.parametrize("settings", [{}, {"enable_http_compression": 0}])
+def test_server(server_url, settings):
+    query = "SELECT * FROM benchmark LIMIT 10000"
+    with ClickHouseClient(server_url) as client:
+        rows = client.json(query, settings=settings)
+        assert len(rows) == 10000
+        assert rows[1] == {
+            "id": 1,
+            "name": "name-000001",
+            "value": 1 / 7,
+            "time": "2023-01-01 00:00:01",
+        }
+        rows = client.rows(query, settings=settings)
+        assert len(rows) == 10000
+        assert rows[1][:3] == (1, "name-000001", 1 / 7)
+        assert len(client.text(query, settings=settings).split("\n")) == 10000
+        assert client.schema("benchmark")[0]["name"] == "id"
+
+
+def test_run_benchmarks(server_url):
+    results = run_benchmarks(server_url, 100, 1, ["iter_json", "insert"])
+    assert [(x.name, x.compression) for x in results] == [
+        ("iter_json", "identity"),
+        ("iter_json", "gzip"),
+        ("insert", "identity"),
+    ]
+    assert all(x.rows_per_second > 0 for x in results)
+
+
+def test_main(tmp_path):
+    output = tmp_path / "results.json"
+    args = ["--rows", "100", "--repeat", "1", "--benchmark", "line_decoder"]
+    main([*args, "--output", str(output)])
+    main([*args, "--baseline", str(output)])
+    assert output.exists()
@@ -0,0 +1,124 @@
+import gzip
+import os
+
+import httpx
+
+from pych_client import AsyncClickHouseClient, ClickHouseClient, ResultCache
+from pych_client.cache import get_cache_key
+
+REQUEST = httpx.Request("POST", "http://localhost:8123/?database=default")
+
+
+def response(content):
+    headers = {"Content-Encoding": "gzip"}
+    return httpx.Response(
+        200, headers=headers, content=gzip.compress(content), request=REQUEST
+    )
+
+
+def test_lru():
+    cache = ResultCache(max_bytes=10)
+    cache.set("a", "SELECT", response(b"aaaa"))
+    cache.set("b", "SELECT", response(b"bbbb"))
+    assert cache.get("a").content == b"aaaa"
+    cache.set("c", "SELECT", response(b"cccc"))
+    assert cache.get("b") is None
+    assert cache.get("c").content == b"cccc"
+    # Results larger than the cache are not stored.
+    cache.set("d", "SELECT", response(b"d" * 11))
+    assert cache.get("d") is None
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 2
+    assert cache.stats.evictions == 1
+    assert cache.stats.size == 8
+
+
+def test_ttl():
+    cache = ResultCache(ttl=lambda query: 60 if "cached" in query else None)
+    cache.set("a", "SELECT 'cached'", response(b"a"))
+    cache.set("b", "SELECT 'not'", response(b"b"))
+    assert cache.get("a").content == b"a"
+    assert cache.get("b") is None
+    cache = ResultCache(ttl=-1)
+    cache.set("a", "SELECT", response(b"a"))
+    assert cache.get("a") is None
+
+
+def test_disk(tmp_path):
+    cache = ResultCache(directory=tmp_path)
+    cache.set("a", "SELECT", response(b"aaaa"))
+    # Another process.
+    other = ResultCache(directory=tmp_path)
+    r = other.get("a")
+    assert r.content == b"aaaa"
+    assert r.url == REQUEST.url
+    assert "content-encoding" not in r.headers
+    assert other.stats.hits == 1
+    other.clear()
+    assert cache.get("b") is None
+    assert ResultCache(directory=tmp_path).get("a") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_eviction(tmp_path):
+    cache = ResultCache(directory=tmp_path, max_disk_entries=2)
+    cache.set("a", "SELECT", response(b"aaaa"))
+    cache.set("b", "SELECT", response(b"bbbb"))
+    os.utime(tmp_path / "a.bin", (0, 0))
+    os.utime(tmp_path / "b.bin", (1, 1))
+    # The least recently used file is evicted.
+    assert ResultCache(directory=tmp_path).get("a").content == b"aaaa"
+    cache.set("c", "SELECT", response(b"cccc"))
+    assert sorted(x.name for x in tmp_path.glob("*.bin")) == ["a.bin", "c.bin"]
+    # Expired files are removed by the writers.
+    ResultCache(ttl=-1, directory=tmp_path).set("d", "SELECT", response(b"d"))
+    assert not (tmp_path / "d.bin").exists()
+    size = (tmp_path / "a.bin").stat().st_size
+    cache = ResultCache(directory=tmp_path, max_disk_bytes=size + 1)
+    cache.set("e", "SELECT", response(b"eeee"))
+    assert sorted(x.name for x in tmp_path.glob("*.bin")) == ["e.bin"]
+    # Results larger than the cache are not written.
+    cache.set("f", "SELECT", response(b"f" * size))
+    assert not (tmp_path / "f.bin").exists()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_cache_key():
+    endpoints = ["http://a:8123/", "http://b:8123/"]
+    params = {"query": "SELECT 1"}
+    key = get_cache_key(endpoints, "default", "default", None, params)
+    assert key == get_cache_key(
+        endpoints[::-1], "default", "default", {}, {"query": " SELECT 1\n"}
+    )
+    assert key != get_cache_key(endpoints, "default", "test", None, params)
+    assert key != get_cache_key(endpoints, "default", "default", None, {"query": "2"})
+    # The results of other servers are not shared.
+    assert key != get_cache_key(endpoints[:1], "default", "default", None, params)
+
+
+def test_client_cache(tmp_path):
+    cache = ResultCache(directory=tmp_path)
+    with ClickHouseClient(cache=cache) as client:
+        query = "SELECT {x:UInt64} AS x, rand() AS r"
+        result = client.json(query, {"x": 1})
+        assert client.json(query, {"x": 1}) == result
+        # Cached responses have the request of the original response.
+        client.execute(query, {"x": 1})
+        r = client.execute(query, {"x": 1})
+        assert r.raise_for_status() is r
+        assert r.url.params["database"] == "default"
+        assert client.json(query, {"x": 2}) != result
+        assert client.json(query, {"x": 1}, settings={"max_threads": 1}) != result
+        # Streaming queries and writes are not cached.
+        list(client.iter_json(query, {"x": 1}))
+        client.execute("DROP TABLE IF EXISTS test_pych_cache")
+        assert cache.stats.hits == 2
+        assert cache.stats.misses == 4
+
+
+async def test_async_client_cache(tmp_path):
+    cache = ResultCache(directory=tmp_path)
+    async with AsyncClickHouseClient(cache=cache) as client:
+        query = "SELECT rand() AS r"
+        assert await client.json(query) == await client.json(query)
+        assert cache.stats.hits == 1
@@ -0,0 +1,133 @@
+import asyncio
+
+import httpx
+import pytest
+
+from pych_client import AsyncClickHouseClient, ClickHouseClient, deadline
+from pych_client.cancellation import KILL_QUERY
+from pych_client.exceptions import DeadlineExceeded
+
+QUERY = "SELECT number FROM numbers(100000)"
+DEAD = "http://127.0.0.1:1"
+
+
+def record_params(client):
+    """Record the parameters of the requests sent by the client."""
+    requests = []
+
+    def record(request):
+        requests.append(dict(request.url.params))
+
+    async def arecord(request):
+        record(request)
+
+    hook = arecord if asyncio.iscoroutinefunction(client.client.send) else record
+    client.client.event_hooks["request"].append(hook)
+    return requests
+
+
+def get_killed(requests):
+    return [x["param_query_id"] for x in requests if x.get("query") == KILL_QUERY]
+
+
+def test_query_id(client):
+    client.text("SELECT 1")
+    assert len(client.stats.query_id) == 36
+    client.text("SELECT 1", settings={"query_id": "test-query-id"})
+    assert client.stats.query_id == "test-query-id"
+
+
+def test_abandoned_stream(client):
+    requests = record_params(client)
+    for _ in client.iter_text(QUERY):
+        break
+    assert get_killed(requests) == [client.stats.query_id]
+    # Fully read responses are not killed.
+    list(client.iter_text(QUERY))
+    assert len(get_killed(requests)) == 1
+
+
+def test_cancel(client):
+    requests = record_params(client)
+    client.cancel("test-query-id")
+    assert get_killed(requests) == ["test-query-id"]
+
+
+def test_cancel_replicas():
+    # The query is killed on the other endpoints if one of them fails.
+    with ClickHouseClient([DEAD, "http://localhost:8123", DEAD]) as client:
+        requests = record_params(client)
+        client.cancel("test-query-id")
+        assert get_killed(requests) == ["test-query-id"] * 3
+    with ClickHouseClient([DEAD, DEAD]) as client:
+        with pytest.raises(httpx.ConnectError):
+            client.cancel("test-query-id")
+
+
+def test_deadline(client):
+    requests = record_params(client)
+    with deadline(10.0):
+        client.text("SELECT 1")
+        with deadline(60.0):
+            client.text("SELECT 1", settings={"max_execution_time": 5})
+    client.text("SELECT 1")
+    first, second, third = [float(x.get("max_execution_time", 0)) for x in requests]
+    assert 9.0 < first <= 10.0
+    assert second == 5.0
+    assert third == 0.0
+    with deadline(0.0), pytest.raises(DeadlineExceeded):
+        client.text("SELECT 1")
+
+
+def test_deadline_threads(client):
+    # The deadline applies to the requests sent from other threads.
+    with ClickHouseClient(hedge_after=0) as hedged:
+        requests = record_params(hedged)
+        with deadline(10.0):
+            hedged.text("SELECT 1")
+        assert 0 < float(requests[0]["max_execution_time"]) <= 10.0
+        with deadline(0.0), pytest.raises(DeadlineExceeded):
+            hedged.text("SELECT 1")
+    with deadline(0.0):
+        results = list(client.map(["SELECT 1"], "text", return_exceptions=True))
+        assert isinstance(results[0], DeadlineExceeded)
+        with pytest.raises(DeadlineExceeded):
+            list(client.parallel_scan("SELECT 1 AS x", "x", 2))
+
+
+async def test_async_cancelled_task(async_client):
+    requests = record_params(async_client)
+    started = asyncio.Event()
+
+    async def consume():
+        async with await async_client.stream(QUERY) as r:
+            async for _ in r.aiter_bytes():
+                started.set()
+                await asyncio.sleep(60)
+
+    task = asyncio.create_task(consume())
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    if async_client.kill_tasks:
+        await asyncio.wait(async_client.kill_tasks)
+    assert len(get_killed(requests)) == 1
+
+
+async def test_async_cancel(async_client):
+    requests = record_params(async_client)
+    await async_client.cancel("test-query-id")
+    assert get_killed(requests) == ["test-query-id"]
+    with deadline(0.0), pytest.raises(DeadlineExceeded):
+        await async_client.text("SELECT 1")
+
+
+async def test_async_cancel_replicas():
+    async with AsyncClickHouseClient([DEAD, "http://localhost:8123", DEAD]) as client:
+        requests = record_params(client)
+        await client.cancel("test-query-id")
+        assert get_killed(requests) == ["test-query-id"] * 3
+    async with AsyncClickHouseClient([DEAD, DEAD]) as client:
+        with pytest.raises(httpx.ConnectError):
+            await client.cancel("test-query-id")
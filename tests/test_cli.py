@@ -2,6 +2,8 @@ import sys
 from contextlib import contextmanager
 from io import StringIO
 
+import pytest
+
 from pych_client.cli import main
 
 
@@ -28,3 +30,36 @@ def test_main_exception(capsys):
     out, err = capsys.readouterr()
     assert "DB::Exception" in out
     assert not err
+
+
+def test_main_query(capsys):
+    main(["-q", "SELECT 1, 2", "-q", "SELECT 3, 4", "--format", "CSV"])
+    out, err = capsys.readouterr()
+    assert out == "1,2\n3,4\n"
+    assert not err
+
+
+def test_main_queries_file(capsys, tmp_path):
+    path = tmp_path / "queries.sql"
+    path.write_text("SELECT 1;\nSELECT\n  ';' AS x;\n\nSELECT 2\n")
+    main(["--queries-file", str(path)])
+    out, err = capsys.readouterr()
+    assert out == "1\n;\n2\n"
+
+
+def test_main_query_exception(capsys):
+    with pytest.raises(SystemExit) as e:
+        main(["-q", "SELECT * FROM invalid_table"])
+    assert "DB::Exception" in str(e.value.code)
+
+
+def test_main_data_file(capsys, client, tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("".join(f"{i},{i * 2}\n" for i in range(1000)))
+    client.execute("DROP TABLE IF EXISTS test_cli")
+    client.execute("CREATE TABLE test_cli (a UInt64, b UInt64) ENGINE Memory")
+    args = ["--data-file", str(path), "--compression", "gzip"]
+    main(["-q", "INSERT INTO test_cli FORMAT CSV", *args])
+    assert client.json("SELECT count(), sum(b) FROM test_cli") == [
+        {"count()": 1000, "sum(b)": 999000}
+    ]
@@ -1,5 +1,9 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+
 import pytest
 
+from pych_client import ClickHouseClient, ResultCache
 from pych_client.exceptions import ClickHouseException
 
 
@@ -35,6 +39,50 @@ def test_execute_json_iter(client):
     assert actual == expected
 
 
+def test_execute_json_line_separators(client):
+    expected = [{"x": "a\u2028b\rc"}]
+    query = "SELECT 'a\u2028b\\rc' AS x"
+    assert client.json(query) == expected
+    assert list(client.iter_json(query)) == expected
+    assert list(client.iter_text("SELECT 'a\u2028b'")) == ["a\u2028b"]
+
+
+def test_execute_batches(client):
+    query = "SELECT number AS x FROM numbers(10)"
+    batches = list(client.iter_json_batches(query, batch_size=4))
+    assert batches == [
+        [{"x": 0}, {"x": 1}, {"x": 2}, {"x": 3}],
+        [{"x": 4}, {"x": 5}, {"x": 6}, {"x": 7}],
+        [{"x": 8}, {"x": 9}],
+    ]
+    batches = list(client.iter_text_batches(query, batch_size=4))
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert batches[0] == ["0", "1", "2", "3"]
+    batches = list(client.iter_rows_batches(query, as_dict=True, batch_size=6))
+    assert batches == [[{"x": i} for i in range(6)], [{"x": i} for i in range(6, 10)]]
+    batches = list(client.iter_rows_batches(query, max_batch_bytes=32))
+    assert sum(batches, []) == [(i,) for i in range(10)]
+    assert len(batches) > 1
+
+
+@pytest.mark.parametrize("executor", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_execute_decode_executor(executor):
+    query = "SELECT number AS x FROM numbers(10000)"
+    expected = [{"x": i} for i in range(10000)]
+    with executor(2) as decode_executor, ClickHouseClient(
+        decode_executor=decode_executor, decode_chunk_size=1024, cache=ResultCache()
+    ) as client:
+        assert client.json(query) == expected
+        assert client.json(query) == expected
+        assert list(client.iter_json(query)) == expected
+        batches = list(client.iter_json_batches(query, batch_size=1000))
+        assert [len(batch) for batch in batches] == [1000] * 10
+        assert sum(batches, []) == expected
+        lines = list(client.iter_text(query))
+        assert lines == [str(i) for i in range(10000)]
+        assert sum(client.iter_text_batches(query), []) == lines
+
+
 def test_execute_json_int64(client):
     assert client.json("SELECT toInt64(1) AS x") == [{"x": 1}]
 
@@ -55,3 +103,91 @@ def test_execute_json_iter_exception(client):
         list(client.iter_json("SELECT * FROM invalid_table"))
     assert exc_info.value.code == 60
     assert "DB::Exception" in exc_info.value.error
+
+
+def test_execute_rows(client):
+    expected = [(1, "a"), (2, "b")]
+    actual = client.rows("SELECT arrayJoin([1, 2]) AS x, char(96 + x) AS y")
+    assert actual == expected
+
+
+def test_execute_rows_iter(client):
+    expected = [{"x": 1, "y": "a"}, {"x": 2, "y": "b"}]
+    actual = list(
+        client.iter_rows(
+            "SELECT arrayJoin([1, 2]) AS x, char(96 + x) AS y", as_dict=True
+        )
+    )
+    assert actual == expected
+
+
+def test_execute_rows_types(client):
+    row = client.rows("""
+        SELECT
+            toDate('2023-01-02') AS a,
+            toDateTime('2023-01-02 03:04:05', 'UTC') AS b,
+            toUUID('00000000-0000-0000-0000-000000000001') AS c,
+            toIPv4('1.2.3.4') AS d,
+            toIPv6('::1') AS e,
+            [NULL, 1]::Array(Nullable(UInt8)) AS f,
+            toLowCardinality('x') AS g
+        """)[0]
+    assert str(row[0]) == "2023-01-02"
+    assert row[1].isoformat() == "2023-01-02T03:04:05+00:00"
+    assert row[2].int == 1
+    assert str(row[3]) == "1.2.3.4"
+    assert str(row[4]) == "::1"
+    assert row[5:] == ([None, 1], "x")
+
+
+def test_insert(client):
+    params = {"table": "test_pych_insert"}
+    client.execute("DROP TABLE IF EXISTS {table:Identifier}", params)
+    client.execute(
+        """
+        CREATE TABLE {table:Identifier} (a UInt64, b String, c Nullable(Date))
+        ENGINE MergeTree() ORDER BY a
+        """,
+        params,
+    )
+    rows = [(1, "x", None), {"a": 2, "b": "y", "c": date(2023, 1, 2)}]
+    client.insert("test_pych_insert", rows, batch_size=1)
+    client.insert("test_pych_insert", [(3,)], columns=["a"])
+    assert client.rows("SELECT * FROM {table:Identifier} ORDER BY a", params) == [
+        (1, "x", None),
+        (2, "y", date(2023, 1, 2)),
+        (3, "", None),
+    ]
+
+
+def test_map(client):
+    queries = [("SELECT {i:UInt64} AS x", {"i": i}) for i in range(20)]
+    actual = list(client.map(queries, workers=4))
+    assert actual == [[{"x": i}] for i in range(20)]
+
+
+def test_map_unordered_exceptions(client):
+    queries = ["SELECT 1 AS x", "SELECT * FROM invalid_table"]
+    actual = list(client.map(queries, ordered=False, return_exceptions=True))
+    assert [{"x": 1}] in actual
+    assert any(isinstance(x, ClickHouseException) for x in actual)
+    with pytest.raises(ClickHouseException):
+        list(client.map(queries))
+
+
+def test_parallel_scan(client):
+    query = "SELECT number AS x, toString(number) AS y FROM numbers(5000)"
+    actual = list(client.parallel_scan(query, "x", 4, method="iter_rows"))
+    assert sorted(actual) == [(i, str(i)) for i in range(5000)]
+    query = "SELECT number AS x FROM numbers({n:UInt64}); -- comment"
+    actual = list(client.parallel_scan(query, "x", 3, {"n": 10}))
+    assert sorted(x["x"] for x in actual) == list(range(10))
+    with pytest.raises(ClickHouseException):
+        list(client.parallel_scan("SELECT * FROM invalid_table", "x"))
+
+
+def test_parallel_scan_close(client):
+    query = "SELECT number AS x FROM numbers(10000)"
+    for _ in client.parallel_scan(query, "x", 4):
+        break
+    assert client.json("SELECT 1 AS x") == [{"x": 1}]
@@ -0,0 +1,73 @@
+import gzip
+
+import pytest
+
+from pych_client import AsyncClickHouseClient, ClickHouseClient
+from pych_client import compression as compression_module
+from pych_client.compression import (
+    LZ4Decoder,
+    ZstdDecoder,
+    compress_chunks,
+    get_accept_encoding,
+)
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lz4", "zstd"])
+def test_compression(compression):
+    params = {"table": f"test_pych_compression_{compression}"}
+    with ClickHouseClient(compression=compression) as client:
+        client.execute("DROP TABLE IF EXISTS {table:Identifier}", params)
+        client.execute(
+            "CREATE TABLE {table:Identifier} (a UInt64) ENGINE MergeTree() ORDER BY a",
+            params,
+        )
+        client.execute(
+            "INSERT INTO {table:Identifier} FORMAT CSV",
+            params,
+            (f"{i}\n".encode() for i in range(1000)),
+        )
+        assert client.json("SELECT count() AS c FROM {table:Identifier}", params) == [
+            {"c": 1000}
+        ]
+        assert client.text("SELECT number FROM numbers(3)") == "0\n1\n2"
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lz4", "zstd"])
+async def test_compression_async(compression):
+    async with AsyncClickHouseClient(compression=compression) as client:
+        assert await client.text("SELECT number FROM numbers(3)") == "0\n1\n2"
+
+
+def test_compress_chunks():
+    chunks = compress_chunks(iter([b"a" * 1000, b"b" * 1000]), "gzip")
+    assert gzip.decompress(b"".join(chunks)) == b"a" * 1000 + b"b" * 1000
+
+
+@pytest.mark.parametrize(
+    "compression,decoder", [("lz4", LZ4Decoder), ("zstd", ZstdDecoder)]
+)
+def test_decoder(compression, decoder):
+    # Two frames, split in small chunks.
+    data = b"".join(compress_chunks(iter([b"a" * 1000]), compression))
+    data += b"".join(compress_chunks(iter([b"b" * 1000]), compression))
+    instance = decoder()
+    chunks = [instance.decode(data[i:][:7]) for i in range(0, len(data), 7)]
+    assert b"".join(chunks) + instance.flush() == b"a" * 1000 + b"b" * 1000
+
+
+def test_register_decoder(monkeypatch):
+    decoders = compression_module.SUPPORTED_DECODERS
+    monkeypatch.delitem(decoders, "lz4", raising=False)
+    # The decoders of httpx are only modified for the clients which use them.
+    ClickHouseClient(compression="gzip")
+    assert "lz4" not in decoders
+    ClickHouseClient(compression="lz4")
+    assert decoders["lz4"] is LZ4Decoder
+    # Without access to the decoders of httpx, the responses are compressed with gzip.
+    monkeypatch.setattr(compression_module, "SUPPORTED_DECODERS", None)
+    assert get_accept_encoding("lz4") == "gzip"
+
+
+def test_unsupported_compression():
+    with pytest.raises(ValueError):
+        ClickHouseClient(compression="xz")
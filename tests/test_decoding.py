@@ -0,0 +1,109 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pych_client.decoding import (
+    aiter_aligned,
+    aiter_decoded,
+    decode_json,
+    decode_text,
+    iter_aligned,
+    iter_chunks,
+    iter_decoded,
+)
+
+
+async def aiter(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_iter_aligned():
+    chunks = [b"a\nb", b"c\n", b"d", b"\ne"]
+    assert list(iter_aligned(chunks, 1)) == [b"a\n", b"bc\n", b"d\n", b"e"]
+    assert list(iter_aligned(chunks, 4)) == [b"a\nbc\n", b"d\ne"]
+    chunks = iter_chunks(b"ab\ncd\nef", 2)
+    assert list(iter_aligned(chunks, 2)) == [b"ab\n", b"cd\n", b"ef"]
+
+
+async def test_aiter_aligned():
+    chunks = [b"a\nb", b"c\n", b"d", b"\ne"]
+    actual = [x async for x in aiter_aligned(aiter(chunks), 1)]
+    assert actual == [b"a\n", b"bc\n", b"d\n", b"e"]
+    actual = [x async for x in aiter_aligned(aiter(chunks), 4)]
+    assert actual == [b"a\nbc\n", b"d\ne"]
+
+
+def test_decode():
+    assert decode_json(b'{"x": 1}\n\n{"x": 2}\n') == [{"x": 1}, {"x": 2}]
+    assert decode_text(b"a\n\nb\n") == ["a", "", "b"]
+    assert decode_text(b"a\nb") == ["a", "b"]
+
+
+def test_iter_decoded():
+    chunks = [b"%d\n" % i for i in range(100)]
+    with ThreadPoolExecutor(2) as executor:
+        actual = list(iter_decoded(chunks, decode_text, executor, 2, 8))
+    assert len(actual) > 2
+    assert [line for lines, _ in actual for line in lines] == [
+        str(i) for i in range(100)
+    ]
+    assert sum(size for _, size in actual) == sum(len(x) for x in chunks)
+
+
+def test_iter_decoded_close():
+    closed = False
+
+    def chunks():
+        nonlocal closed
+        try:
+            while True:
+                yield b"1\n" * 1024
+        finally:
+            closed = True
+
+    with ThreadPoolExecutor(2) as executor:
+        for _ in iter_decoded(chunks(), decode_text, executor, 2, 8):
+            break
+    assert closed
+
+
+async def test_aiter_decoded():
+    chunks = [b"%d\n" % i for i in range(100)]
+    with ThreadPoolExecutor(2) as executor:
+        decoded = aiter_decoded(aiter(chunks), decode_text, executor, 2, 8)
+        actual = [x async for x in decoded]
+    assert len(actual) > 2
+    assert [line for lines, _ in actual for line in lines] == [
+        str(i) for i in range(100)
+    ]
+    assert sum(size for _, size in actual) == sum(len(x) for x in chunks)
+
+
+async def test_aiter_decoded_error():
+    async def chunks():
+        yield b"1\n"
+        raise ValueError("network")
+
+    with pytest.raises(ValueError, match="network"):
+        async for _ in aiter_decoded(chunks(), decode_text, None, 2, 1024):
+            pass
+    with pytest.raises(Exception):
+        async for _ in aiter_decoded(aiter([b"{\n"]), decode_json, None, 2, 1024):
+            pass
+
+
+async def test_aiter_decoded_close():
+    closed = asyncio.Event()
+
+    async def chunks():
+        try:
+            while True:
+                yield b"1\n" * 1024 * 256
+        finally:
+            closed.set()
+
+    async for _ in aiter_decoded(chunks(), decode_text, None, 2, 1024):
+        break
+    await asyncio.wait_for(closed.wait(), 1)
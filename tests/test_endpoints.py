@@ -0,0 +1,94 @@
+import gc
+import weakref
+
+import httpx
+import pytest
+
+from pych_client import AsyncClickHouseClient, ClickHouseClient
+from pych_client.endpoints import EndpointPool, get_endpoints
+
+REPLICAS = ["http://localhost:8123", "http://127.0.0.1:8123"]
+DEAD = "http://127.0.0.1:1"
+
+
+def test_get_endpoints():
+    assert get_endpoints("http://a:8123, http://b:8123,") == [
+        "http://a:8123",
+        "http://b:8123",
+    ]
+    assert get_endpoints(["http://a:8123"]) == ["http://a:8123"]
+
+
+def test_round_robin():
+    pool = EndpointPool(["http://a", "http://b"])
+    urls = [pool.acquire().url for _ in range(4)]
+    assert urls == ["http://a/", "http://b/", "http://a/", "http://b/"]
+
+
+def test_least_in_flight():
+    pool = EndpointPool(["http://a", "http://b"], "least_in_flight")
+    a = pool.acquire()
+    assert pool.acquire().url == "http://b/"
+    pool.release(a)
+    assert pool.acquire().url == "http://a/"
+
+
+def test_latency():
+    pool = EndpointPool(["http://a", "http://b"], "latency")
+    a, b = pool.endpoints
+    pool.record_latency(a, 1.0)
+    assert pool.acquire() is b
+    pool.record_latency(b, 2.0)
+    assert pool.acquire() is a
+
+
+def test_unhealthy():
+    pool = EndpointPool(["http://a", "http://b"])
+    a, b = pool.endpoints
+    pool.set_healthy(a, False)
+    assert all(pool.acquire() is b for _ in range(3))
+    # If all the endpoints are down, they are tried anyway.
+    pool.set_healthy(b, False)
+    assert {pool.acquire().url for _ in range(2)} == {"http://a/", "http://b/"}
+    assert a.in_flight == 1
+
+
+def test_invalid_strategy():
+    with pytest.raises(ValueError):
+        EndpointPool(["http://a"], "random")
+
+
+def test_client_replicas():
+    with ClickHouseClient(REPLICAS) as client:
+        for _ in range(4):
+            assert client.json("SELECT 1 AS x") == [{"x": 1}]
+        assert list(client.iter_text("SELECT 1")) == ["1"]
+        assert all(x.latency is not None for x in client.endpoints.endpoints)
+
+
+def test_client_health_check():
+    with ClickHouseClient([DEAD, *REPLICAS], health_check_interval=None) as client:
+        client.check_health()
+        assert [x.healthy for x in client.endpoints.endpoints] == [False, True, True]
+        for _ in range(3):
+            assert client.json("SELECT 1 AS x") == [{"x": 1}]
+
+
+def test_client_health_check_collected():
+    # The health check thread does not keep unclosed clients alive.
+    client = ClickHouseClient(REPLICAS, health_check_interval=60)
+    ref = weakref.ref(client)
+    del client
+    gc.collect()
+    assert ref() is None
+
+
+async def test_async_client_replicas():
+    async with AsyncClickHouseClient([DEAD, *REPLICAS]) as client:
+        with pytest.raises(httpx.ConnectError):
+            await client.json("SELECT 1 AS x")
+        for _ in range(4):
+            assert await client.json("SELECT 1 AS x") == [{"x": 1}]
+        assert client.health_check_task is not None
+        await client.check_health()
+        assert [x.healthy for x in client.endpoints.endpoints] == [False, True, True]
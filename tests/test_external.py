@@ -0,0 +1,81 @@
+import pytest
+
+from pych_client import ExternalTable
+from pych_client.external import get_external_params, iter_multipart
+from pych_client.retry import is_replayable
+
+
+def test_external_table():
+    table = ExternalTable("t", [], "`id` UInt64, t Tuple(x UInt8, y String)")
+    assert table.schema == [("id", "UInt64"), ("t", "Tuple(x UInt8, y String)")]
+    assert table.get_format() == "RowBinary"
+    assert ExternalTable("t", {"id": []}, "id UInt64").get_format() == "Native"
+    assert ExternalTable("t", b"", "id UInt64", "CSV").get_format() == "CSV"
+    assert get_external_params([table]) == {
+        "t_structure": "`id` UInt64, t Tuple(x UInt8, y String)",
+        "t_format": "RowBinary",
+    }
+
+
+def test_iter_multipart():
+    tables = [
+        ExternalTable("a", "1\n", "x UInt8", "TSV"),
+        ExternalTable("b", iter([b"2\n", b"3\n"]), "y UInt8", "TSV"),
+    ]
+    assert b"".join(iter_multipart(tables, "xyz")) == (
+        b"--xyz\r\n"
+        b'Content-Disposition: form-data; name="a"; filename="a"\r\n'
+        b"Content-Type: application/octet-stream\r\n\r\n"
+        b"1\n\r\n"
+        b"--xyz\r\n"
+        b'Content-Disposition: form-data; name="b"; filename="b"\r\n'
+        b"Content-Type: application/octet-stream\r\n\r\n"
+        b"2\n3\n\r\n"
+        b"--xyz--\r\n"
+    )
+
+
+def test_is_replayable():
+    assert is_replayable(ExternalTable("t", [(1,)], "x UInt8"))
+    assert not is_replayable([ExternalTable("t", iter([(1,)]), "x UInt8")])
+
+
+def test_query_in_body(client):
+    requests = []
+    client.client.event_hooks["request"].append(requests.append)
+    # The query would exceed the maximum length of URLs of most servers.
+    ids = ", ".join(str(x) for x in range(20_000))
+    assert client.json(
+        f"SELECT count() AS n FROM numbers(100) WHERE number IN ({ids})"
+    ) == [{"n": 100}]
+    assert "query" not in requests[0].url.params
+
+
+def test_external_tables(client):
+    rows = [(i, str(i)) for i in range(1000)]
+    query = "SELECT count() AS n, sum(number) AS s FROM numbers(100) WHERE number IN (SELECT id FROM ids)"
+    table = ExternalTable("ids", rows, "id UInt64, name String")
+    assert client.json(query, data=table) == [{"n": 100, "s": 4950}]
+    tables = [
+        ExternalTable("a", b"1\n2\n", "x UInt8", "TabSeparated"),
+        ExternalTable("b", iter([b"3\n"]), "y String", "TabSeparated"),
+    ]
+    assert client.json("SELECT * FROM a, b ORDER BY x", data=tables) == [
+        {"x": 1, "y": "3"},
+        {"x": 2, "y": "3"},
+    ]
+
+
+def test_external_tables_numpy(client):
+    np = pytest.importorskip("numpy")
+    table = ExternalTable(
+        "ids", {"id": np.arange(10_000, dtype=np.uint64)}, "id UInt64"
+    )
+    assert client.json("SELECT sum(id) AS s FROM ids", data=table) == [{"s": 49995000}]
+
+
+async def test_async_external_tables(async_client):
+    table = ExternalTable("ids", [(1,), (2,)], "id UInt64")
+    assert await async_client.json("SELECT sum(id) AS s FROM ids", data=table) == [
+        {"s": 3}
+    ]
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from pych_client import AsyncBufferedInserter, BufferedInserter
+from pych_client.exceptions import ClickHouseException
+
+TABLES = ("test_pych_inserter", "test_pych_inserter_2")
+
+
+@pytest.fixture
+def tables(client):
+    for table in TABLES:
+        client.execute("DROP TABLE IF EXISTS {table:Identifier}", {"table": table})
+        client.execute(
+            """
+            CREATE TABLE {table:Identifier} (a UInt64, b String)
+            ENGINE MergeTree() ORDER BY a
+            """,
+            {"table": table},
+        )
+    return TABLES
+
+
+def count(client, table):
+    return client.json(
+        "SELECT count() AS n, uniqExact(a) AS u FROM {table:Identifier}",
+        {"table": table},
+    )[0]
+
+
+def test_buffered_inserter(client, tables):
+    with BufferedInserter(client, tables[0], max_rows=100) as inserter:
+
+        def produce(i):
+            for j in range(250):
+                inserter.put((i * 1000 + j, "x"))
+
+        threads = [threading.Thread(target=produce, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        inserter.put_many([{"a": 1, "b": "y"}] * 10, tables[1])
+    assert count(client, tables[0]) == {"n": 1000, "u": 1000}
+    assert count(client, tables[1]) == {"n": 10, "u": 1}
+    with pytest.raises(RuntimeError):
+        inserter.put((0, "x"))
+
+
+def test_buffered_inserter_thresholds(client, tables):
+    with BufferedInserter(
+        client, tables[0], ["a"], max_age=0.2, max_pending_rows=1
+    ) as inserter:
+        inserter.put((1,))
+        # The second row waits for the first one to be inserted.
+        inserter.put((2,))
+        assert count(client, tables[0])["n"] >= 1
+        time.sleep(0.5)
+        assert count(client, tables[0])["n"] == 2
+        inserter.put_many([(3,), (4,)])
+        inserter.flush()
+        assert count(client, tables[0])["n"] == 4
+
+
+def test_buffered_inserter_error(client, tables):
+    inserter = BufferedInserter(
+        client, tables[0], settings={"max_insert_block_size": "x"}
+    )
+    inserter.put((1, "x"))
+    with pytest.raises(ClickHouseException):
+        inserter.flush()
+    inserter.close()
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_buffered_inserter_stopped(client, tables, monkeypatch):
+    inserter = BufferedInserter(client, tables[0], max_age=0.2, max_pending_rows=1)
+    inserter.put((1, "x"))
+
+    def execute(*args, **kwargs):
+        raise SystemExit
+
+    monkeypatch.setattr(client, "execute", execute)
+    # The writers are not blocked by the stopped thread.
+    with pytest.raises(RuntimeError, match="stopped"):
+        inserter.put((2, "x"))
+    # The dropped rows are reported even if `put` raised the error.
+    with pytest.raises(RuntimeError, match="before inserting"):
+        inserter.flush()
+    with pytest.raises(RuntimeError, match="closed"):
+        inserter.put((3, "x"))
+    with pytest.raises(RuntimeError, match="before inserting"):
+        inserter.close()
+
+
+async def test_async_buffered_inserter(client, async_client, tables):
+    async with AsyncBufferedInserter(
+        async_client, tables[0], max_bytes=100, async_insert=True
+    ) as inserter:
+
+        async def produce(i):
+            for j in range(250):
+                await inserter.put((i * 1000 + j, "x"))
+
+        await asyncio.gather(*[produce(i) for i in range(4)])
+        await inserter.put_many([(1, "y")] * 10, tables[1])
+        await inserter.flush()
+        assert count(client, tables[1]) == {"n": 10, "u": 1}
+    assert count(client, tables[0]) == {"n": 1000, "u": 1000}
+
+
+async def test_async_buffered_inserter_cancelled(async_client, tables, monkeypatch):
+    inserter = AsyncBufferedInserter(async_client, tables[0], max_age=60)
+    started = asyncio.Event()
+
+    async def execute(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(60)
+
+    await inserter.put((1, "x"))
+    monkeypatch.setattr(async_client, "execute", execute)
+    flush = asyncio.create_task(inserter.flush())
+    await started.wait()
+    inserter.task.cancel()
+    # The flush is not blocked by the cancelled task.
+    with pytest.raises(RuntimeError, match="stopped unexpectedly"):
+        await asyncio.wait_for(flush, 5)
+    with pytest.raises(RuntimeError, match="closed"):
+        await inserter.put((2, "x"))
+    with pytest.raises(RuntimeError, match="before inserting"):
+        await inserter.close()
+
+
+async def test_async_buffered_inserter_age(client, async_client, tables):
+    async with AsyncBufferedInserter(async_client, tables[0], max_age=0.2) as inserter:
+        await inserter.put((1, "x"))
+        await asyncio.sleep(0.5)
+        assert count(client, tables[0])["n"] == 1
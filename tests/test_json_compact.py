@@ -0,0 +1,100 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from ipaddress import IPv4Address, IPv6Address
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from pych_client.json_compact import JSONCompactDecoder, json_converter
+
+QUERY = """
+SELECT
+    number AS n,
+    toDateTime(1700000000 + number) AS dt,
+    toDateTime(1700000000, 'Asia/Tokyo') AS dt_tz,
+    toDateTime64(-1.5, 3) AS dt64,
+    toDateTime64('2200-01-01 00:00:00.123456789', 9, 'UTC') AS dt64_tz,
+    toDecimal64(1.25, 4) AS dec,
+    toUUID('00000000-0000-0000-0000-000000000001') AS uuid,
+    toIPv4('1.2.3.4') AS ipv4,
+    toIPv6('::ffff:1.2.3.4') AS ipv6,
+    CAST('a', 'Enum8(\\'a\\' = 1)') AS enum,
+    CAST((1, toDate('2024-01-02')), 'Tuple(x UInt8, y Date)') AS tuple,
+    map(toUInt8(number), [toDate32('2024-01-02')]) AS map,
+    [toNullable(toDateTime(0)), NULL] AS array,
+    toUInt64(18446744073709551615) AS big,
+    toInt128('-170141183460469231731687303715884105728') AS int128,
+    toUInt256('115792089237316195423570985008687907853269984665640564039457584007913129639935') AS uint256,
+    toFixedString('ab', 3) AS fixed,
+    [toInt64(number)] AS int64s,
+    true AS bool
+FROM numbers(3)
+"""
+
+
+def test_json_converter():
+    assert json_converter("String") is None
+    assert json_converter("Array(Nullable(UInt8))") is None
+    assert json_converter("Map(String, String)") is None
+    assert json_converter("Nullable(Date)")(None) is None
+    assert json_converter("Array(IPv4)")(["1.2.3.4"]) == [IPv4Address("1.2.3.4")]
+    assert json_converter("Map(UInt8, Decimal(9, 2))")({"1": "1.5"}) == {
+        1: Decimal("1.5")
+    }
+    assert json_converter("Tuple(String, Date)")(["a", "2024-01-02"]) == (
+        "a",
+        date(2024, 1, 2),
+    )
+    assert json_converter("DateTime")("2023-11-14T22:13:20Z") == datetime(
+        2023, 11, 14, 22, 13, 20
+    )
+    assert json_converter("DateTime64(1, 'UTC')")("2023-11-14T22:13:20.5Z") == (
+        datetime(2023, 11, 14, 22, 13, 20, 500000, tzinfo=timezone.utc)
+    )
+    assert json_converter("DateTime('Asia/Tokyo')")("1970-01-01T00:00:00Z") == (
+        datetime(1970, 1, 1, 9, tzinfo=ZoneInfo("Asia/Tokyo"))
+    )
+    assert json_converter("UUID")("00000000-0000-0000-0000-000000000001") == UUID(int=1)
+    assert json_converter("IPv6")("::1") == IPv6Address("::1")
+    assert json_converter("Int128")("-1") == -1
+    assert json_converter("FixedString(2)")("a\x00") == b"a\x00"
+
+
+def test_json_compact_decoder():
+    data = (
+        b'["id","ip","s"]\n["UInt64","IPv4","String"]\n'
+        b'[1,"1.2.3.4","a"]\n[2,"5.6.7.8","b"]\n'
+    )
+    decoder = JSONCompactDecoder()
+    rows = []
+    # The header and the rows are split across chunks.
+    for chunk in (data[:10], data[10:50], data[50:]):
+        rows += decoder.decode(chunk)
+    rows += decoder.flush()
+    assert decoder.names == ["id", "ip", "s"]
+    assert rows == [
+        {"id": 1, "ip": IPv4Address("1.2.3.4"), "s": "a"},
+        {"id": 2, "ip": IPv4Address("5.6.7.8"), "s": "b"},
+    ]
+
+
+def test_typed_json(client):
+    # Same types as the RowBinary format.
+    expected = client.rows(QUERY, as_dict=True)
+    rows = client.json(QUERY, typed=True)
+    assert rows == expected
+    assert [type(x) for x in rows[0].values()] == [
+        type(x) for x in expected[0].values()
+    ]
+    assert list(client.iter_json(QUERY, typed=True)) == expected
+    batches = list(client.iter_json_batches(QUERY, typed=True, batch_size=2))
+    assert [len(x) for x in batches] == [2, 1]
+
+
+async def test_async_typed_json(async_client):
+    expected = await async_client.rows(QUERY, as_dict=True)
+    assert await async_client.json(QUERY, typed=True) == expected
+    assert [x async for x in async_client.iter_json(QUERY, typed=True)] == expected
+    batches = [
+        x async for x in async_client.iter_json_batches(QUERY, typed=True, batch_size=2)
+    ]
+    assert [len(x) for x in batches] == [2, 1]
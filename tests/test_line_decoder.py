@@ -0,0 +1,39 @@
+from pych_client.line_decoder import BytesLineDecoder, LineDecoder, iter_lines
+
+
+def test_line_decoder():
+    decoder = LineDecoder()
+    assert decoder.decode("a\nb") == ["a"]
+    assert decoder.decode("c\n\nd\n") == ["bc", "", "d"]
+    assert decoder.flush() == []
+
+
+def test_bytes_line_decoder():
+    decoder = BytesLineDecoder()
+    assert decoder.decode(b"a\nb") == [b"a"]
+    assert decoder.decode(b"c") == []
+    assert decoder.decode(memoryview(b"d\n\ne\n")) == [b"bcd", b"", b"e"]
+    assert decoder.decode(b"f") == []
+    assert decoder.flush() == [b"f"]
+    assert decoder.flush() == []
+
+
+def test_bytes_line_decoder_text():
+    decoder = BytesLineDecoder()
+    data = "é x\nü\n".encode()
+    # Split in the middle of a multi-byte character.
+    assert decoder.decode_text(data[:1]) == []
+    assert decoder.decode_text(data[1:8]) == ["é x"]
+    assert decoder.decode_text(data[8:]) == ["ü"]
+    assert decoder.decode_text(b"y") == []
+    assert decoder.flush_text() == ["y"]
+
+
+def test_iter_lines():
+    content = b"".join(b"%d\n" % i for i in range(1000))
+    expected = [b"%d" % i for i in range(1000)]
+    assert list(iter_lines(content, chunk_size=7)) == expected
+    assert list(iter_lines(content + b"x", text=True, chunk_size=7)) == [
+        *(x.decode() for x in expected),
+        "x",
+    ]
@@ -0,0 +1,125 @@
+from decimal import Decimal
+
+import pytest
+
+from pych_client.native import NativeDecoder
+
+np = pytest.importorskip("numpy")
+
+# SELECT number AS n, toString(number) AS s, [number, 1] AS arr,
+# if(number = 1, NULL, number) AS nn, toLowCardinality(toString(number % 2)) AS lc
+# FROM numbers(3) FORMAT Native
+DATA = (
+    b"\x05\x03\x01n\x06UInt64\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00"
+    b"\x00\x00\x00\x00\x02\x00\x00\x00\x00\x00\x00\x00\x01s\x06String\x010\x011"
+    b"\x012\x03arr\rArray(UInt64)\x02\x00\x00\x00\x00\x00\x00\x00\x04\x00\x00"
+    b"\x00\x00\x00\x00\x00\x06\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+    b"\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00"
+    b"\x00\x01\x00\x00\x00\x00\x00\x00\x00\x02\x00\x00\x00\x00\x00\x00\x00\x01"
+    b"\x00\x00\x00\x00\x00\x00\x00\x02nn\x10Nullable(UInt64)\x00\x01\x00\x00\x00"
+    b"\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00\x02\x00\x00\x00"
+    b"\x00\x00\x00\x00\x02lc\x16LowCardinality(String)\x01\x00\x00\x00\x00\x00"
+    b"\x00\x00\x00\x06\x00\x00\x00\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00"
+    b"\x00\x010\x011\x03\x00\x00\x00\x00\x00\x00\x00\x01\x02\x01"
+)
+
+
+def check_block(block):
+    assert block["n"].tolist() == [0, 1, 2]
+    assert block["s"].tolist() == ["0", "1", "2"]
+    assert [x.tolist() for x in block["arr"]] == [[0, 1], [1, 1], [2, 1]]
+    assert block["nn"].tolist() == [0, None, 2]
+    assert block["lc"].tolist() == ["0", "1", "0"]
+
+
+def test_native_decoder():
+    decoder = NativeDecoder()
+    blocks = decoder.decode(DATA) + decoder.flush()
+    assert len(blocks) == 1
+    check_block(blocks[0])
+    # Fixed-width columns are views over the received data.
+    assert blocks[0]["n"].base is DATA
+
+
+def test_native_decoder_chunks():
+    decoder = NativeDecoder()
+    blocks = []
+    for byte in DATA:
+        blocks += decoder.decode(bytes([byte]))
+    blocks += decoder.flush()
+    assert len(blocks) == 1
+    check_block(blocks[0])
+
+
+def test_execute_columns(client):
+    columns = client.columns("SELECT number AS x, toString(x) AS y FROM numbers(3)")
+    assert columns["x"].tolist() == [0, 1, 2]
+    assert columns["y"].tolist() == ["0", "1", "2"]
+
+
+def test_execute_columns_decimals(client):
+    columns = client.columns(
+        "SELECT toDecimal32('1.5', 2) AS a, toDecimal64('123456789012.345678', 6) AS b, "
+        "toDecimal128('-12345678901234567890.123456789', 9) AS c"
+    )
+    # Same exact values as the RowBinary format.
+    assert columns["a"].tolist() == [Decimal("1.50")]
+    assert columns["b"].tolist() == [Decimal("123456789012.345678")]
+    assert columns["c"].tolist() == [Decimal("-12345678901234567890.123456789")]
+
+
+def test_execute_columns_nested_low_cardinality(client):
+    columns = client.columns("""
+        SELECT
+            [toLowCardinality(toString(number)), 'x'] AS a,
+            map(toLowCardinality(toString(number)), toUInt8(number)) AS m,
+            tuple(toLowCardinality(toString(number)), number) AS t,
+            [toNullable(toLowCardinality(toString(number)))] AS n
+        FROM numbers(2)
+        """)
+    assert [x.tolist() for x in columns["a"]] == [["0", "x"], ["1", "x"]]
+    assert columns["m"].tolist() == [{"0": 0}, {"1": 1}]
+    assert columns["t"].tolist() == [("0", 0), ("1", 1)]
+    assert [x.tolist() for x in columns["n"]] == [["0"], ["1"]]
+    # The key version is sent even if the arrays are empty.
+    columns = client.columns(
+        "SELECT CAST([], 'Array(LowCardinality(String))') AS a, 1 AS b"
+    )
+    assert [x.tolist() for x in columns["a"]] == [[]]
+    assert columns["b"].tolist() == [1]
+
+
+def test_execute_blocks_iter(client):
+    blocks = list(
+        client.iter_blocks(
+            "SELECT number AS x FROM numbers(10)", settings={"max_block_size": 4}
+        )
+    )
+    assert np.concatenate([block["x"] for block in blocks]).tolist() == list(range(10))
+
+
+async def test_execute_columns_async(async_client):
+    columns = await async_client.columns("SELECT number AS x FROM numbers(3)")
+    assert columns["x"].tolist() == [0, 1, 2]
+
+
+def test_insert_columns(client):
+    params = {"table": "test_pych_insert_columns"}
+    client.execute("DROP TABLE IF EXISTS {table:Identifier}", params)
+    client.execute(
+        """
+        CREATE TABLE {table:Identifier} (a UInt64, b LowCardinality(String), c Date)
+        ENGINE MergeTree() ORDER BY a
+        """,
+        params,
+    )
+    columns = {
+        "a": np.arange(10),
+        "b": np.array([str(x) for x in range(10)], dtype=object),
+        "c": np.arange(10).astype("datetime64[D]"),
+    }
+    client.insert("test_pych_insert_columns", columns, batch_size=3)
+    actual = client.columns("SELECT * FROM {table:Identifier} ORDER BY a", params)
+    assert actual["a"].tolist() == list(range(10))
+    assert actual["b"].tolist() == [str(x) for x in range(10)]
+    assert (actual["c"] == columns["c"]).all()
@@ -0,0 +1,66 @@
+import pytest
+
+from pych_client import (
+    AsyncClickHouseClient,
+    AsyncConnectionPool,
+    ClickHouseClient,
+    ConnectionPool,
+)
+from pych_client.constants import DEFAULT_BASE_URL
+from pych_client.pool import RequestTimer
+
+
+def test_connection_pool():
+    with ConnectionPool(max_connections=4) as pool:
+        pool.warm_up(DEFAULT_BASE_URL, 3)
+        assert pool.stats.created == 3
+        assert pool.stats.idle == 3
+        with ClickHouseClient(pool=pool, settings={"max_threads": 1}) as a:
+            with ClickHouseClient(pool=pool, settings={"max_threads": 2}) as b:
+                assert a.json("SELECT getSetting('max_threads') AS x") == [{"x": 1}]
+                assert b.json("SELECT getSetting('max_threads') AS x") == [{"x": 2}]
+                assert list(a.map(["SELECT 1"] * 8, "bytes", workers=4))
+        # The connections are kept after the clients are closed.
+        stats = pool.stats
+        assert stats.created <= 4
+        assert stats.in_use == 0
+        assert stats.idle == stats.created
+        assert stats.requests == 3 + 2 + 8
+        assert stats.max_wait_time >= 0
+
+
+async def test_async_connection_pool():
+    async with AsyncConnectionPool(max_connections=2) as pool:
+        await pool.warm_up([DEFAULT_BASE_URL], 2)
+        async with AsyncClickHouseClient(pool=pool) as client:
+            async for row in client.iter_json("SELECT 1 AS x"):
+                assert row == {"x": 1}
+                assert pool.stats.in_use == 1
+        stats = pool.stats
+        assert (stats.created, stats.idle, stats.in_use) == (2, 2, 0)
+
+
+def test_connection_pool_http2():
+    pytest.importorskip("h2")
+    with ConnectionPool(http2=True) as pool:
+        with ClickHouseClient(pool=pool) as client:
+            assert client.text("SELECT 1") == "1"
+
+
+def test_connection_pool_stats_unavailable(monkeypatch):
+    with ConnectionPool() as pool:
+        with ClickHouseClient(pool=pool) as client:
+            client.text("SELECT 1")
+        # The stats do not depend on the internals of httpx.
+        monkeypatch.delattr(pool.transport, "_pool")
+        stats = pool.stats
+        assert stats.in_use is None and stats.idle is None
+        assert stats.requests == 1
+        monkeypatch.undo()
+
+
+def test_request_timer():
+    timer = RequestTimer()
+    # A complete event without its started event is ignored.
+    timer.trace("connection.start_tls.complete", {})
+    assert timer.connect_time == 0.0
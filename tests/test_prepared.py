@@ -0,0 +1,92 @@
+from datetime import date, datetime, timezone
+from ipaddress import IPv4Address, IPv6Address
+from uuid import UUID
+
+from pych_client.prepared import ParameterEncoder, parameter_formatter
+
+QUERY = (
+    "SELECT {ids:Array(UInt64)} AS ids, {t:Tuple(String, Date)} AS t, "
+    "{dt:DateTime64(3)} AS dt, {ip:IPv6} AS ip, {u:UUID} AS u, "
+    "{s:Nullable(String)} AS s, {ips:Array(Nullable(IPv4))} AS ips"
+)
+
+PARAMS = {
+    "ids": [1, 2],
+    "t": ("a'b\\", date(2024, 1, 2)),
+    "dt": datetime(2024, 1, 2, 3, 4, 5, 123000, tzinfo=timezone.utc),
+    "ip": IPv6Address("::1"),
+    "u": UUID(int=1),
+    "s": "a\tb",
+    "ips": [IPv4Address("1.2.3.4"), None],
+}
+
+ROW = {
+    "ids": [1, 2],
+    "t": ["a'b\\", "2024-01-02"],
+    "dt": "2024-01-02 03:04:05.123",
+    "ip": "::1",
+    "u": "00000000-0000-0000-0000-000000000001",
+    "s": "a\tb",
+    "ips": ["1.2.3.4", None],
+}
+
+
+def test_parameter_formatter():
+    assert parameter_formatter("UInt64")(1) == "1"
+    assert parameter_formatter("String")("a\tb\\") == "a\\tb\\\\"
+    assert parameter_formatter("Nullable(String)")(None) == "\\N"
+    assert (
+        parameter_formatter("Array(Nullable(String))")(["a'", None]) == "['a\\'',NULL]"
+    )
+    assert parameter_formatter("Array(LowCardinality(String))")(("a",)) == "['a']"
+    assert parameter_formatter("Tuple(x UInt8, y Date)")((1, date(2024, 1, 2))) == (
+        "(1,'2024-01-02')"
+    )
+    assert parameter_formatter("Map(String, Array(UInt8))")({"a": [1]}) == "{'a':[1]}"
+    assert parameter_formatter("Bool")(True) == "true"
+    dt = datetime(2023, 11, 14, 22, 13, 20, 123456)
+    assert parameter_formatter("DateTime")(dt) == "1700000000"
+    assert parameter_formatter("DateTime64(3)")(dt) == "1700000000.123"
+    assert parameter_formatter("DateTime64(0)")(dt) == "1700000000"
+    assert parameter_formatter("UUID")(UUID(int=1)) == (
+        "00000000-0000-0000-0000-000000000001"
+    )
+
+
+def test_parameter_encoder():
+    encoder = ParameterEncoder("SELECT {ids:Array(UInt64)}, {n:UInt8}")
+    assert encoder.encode("ids", (1, 2)) == "param_ids=%5B1%2C2%5D"
+    assert encoder.encode("ids", (1, 2)) is encoder.encode("ids", (1, 2))
+    # Mutable values are encoded again, since they can change in place.
+    ids = [1, 2]
+    assert encoder.encode("ids", ids) == "param_ids=%5B1%2C2%5D"
+    ids.append(3)
+    assert encoder.encode("ids", ids) == "param_ids=%5B1%2C2%2C3%5D"
+    assert encoder.encode("n", 1) == "param_n=1"
+
+
+def test_prepared_query(client):
+    query = client.prepare(QUERY)
+    assert query(PARAMS) == [ROW]
+    assert query.json({**PARAMS, "s": None}) == [{**ROW, "s": None}]
+    assert list(query.iter_json(PARAMS)) == [ROW]
+    assert query.execute(PARAMS).text.startswith("[1,2]\t")
+
+
+def test_prepared_query_settings(client):
+    requests = []
+    client.client.event_hooks["request"].append(requests.append)
+    query = client.prepare("SELECT {n:UInt8} AS n", settings={"max_threads": 2})
+    assert query({"n": 1}) == [{"n": 1}]
+    assert query({"n": 2}) == [{"n": 2}]
+    first, second = [dict(x.url.params) for x in requests]
+    assert first["max_threads"] == second["max_threads"] == "2"
+    assert first["query_id"] != second["query_id"]
+    assert "query" not in first
+
+
+async def test_async_prepared_query(async_client):
+    query = async_client.prepare(QUERY)
+    assert await query(PARAMS) == [ROW]
+    assert [row async for row in query.iter_json(PARAMS)] == [ROW]
+    assert (await query.execute(PARAMS)).text.startswith("[1,2]\t")
@@ -0,0 +1,171 @@
+import httpx
+import pytest
+
+from pych_client import AsyncClickHouseClient, ClickHouseClient, RetryPolicy
+from pych_client.exceptions import ClickHouseException
+from pych_client.retry import Replayable, is_read_query, is_replayable
+
+DEAD = "http://127.0.0.1:1"
+REPLICA = "http://localhost:8123"
+
+# throwIf raises FUNCTION_THROW_IF_VALUE_IS_NON_ZERO (395).
+RETRY_THROW_IF = RetryPolicy(attempts=3, backoff=0, codes=frozenset({395}))
+
+
+def count_requests(client, monkeypatch):
+    requests = []
+    send_once = client.send_once
+
+    def wrapper(*args):
+        requests.append(args[0])
+        return send_once(*args)
+
+    monkeypatch.setattr(client, "send_once", wrapper)
+    return requests
+
+
+def test_policy():
+    policy = RetryPolicy(attempts=2, backoff=1.0, max_backoff=3.0, jitter=False)
+    assert [policy.delay(i) for i in range(3)] == [1.0, 2.0, 3.0]
+    assert policy.is_retryable(httpx.ConnectError(""))
+    assert policy.is_retryable(ClickHouseException(209, "", ""))
+    assert not policy.is_retryable(ClickHouseException(62, "", ""))
+    error = httpx.ConnectError("")
+    assert policy.should_retry(error, 0, "SELECT 1", b"data", None)
+    assert not policy.should_retry(error, 1, "SELECT 1", b"data", None)
+    assert not policy.should_retry(error, 0, "SELECT 1", iter([b"data"]), None)
+    # Writes are retried only if they are deduplicated.
+    assert not policy.should_retry(error, 0, "INSERT INTO t VALUES", b"data", None)
+    assert not policy.should_retry(error, 0, "INSERT INTO t SELECT 1", None, None)
+    assert not policy.should_retry(error, 0, "DROP TABLE t", None, {})
+    token = {"insert_deduplication_token": "a"}
+    assert policy.should_retry(error, 0, "INSERT INTO t VALUES", b"data", token)
+    assert 0 <= RetryPolicy(backoff=1.0).delay(0) <= 1.0
+
+
+def test_replayable():
+    data = Replayable(lambda: iter([b"a", b"b"]))
+    assert list(data) == list(data) == [b"a", b"b"]
+    assert is_replayable(data)
+    assert is_replayable([b"a"])
+    assert not is_replayable(iter([b"a"]))
+
+
+def test_is_read_query():
+    assert is_read_query(" select 1", None)
+    assert is_read_query("WITH 1 AS x SELECT x", None)
+    assert not is_read_query("SELECT 1", b"data")
+    assert not is_read_query("INSERT INTO t SELECT 1", None)
+
+
+def test_retry_transport_error(monkeypatch):
+    retry = RetryPolicy(backoff=0)
+    with ClickHouseClient([DEAD, REPLICA], retry=retry) as client:
+        requests = count_requests(client, monkeypatch)
+        assert client.json("SELECT 1 AS x") == [{"x": 1}]
+        assert list(client.iter_json("SELECT 1 AS x")) == [{"x": 1}]
+        assert len(requests) == 3
+
+
+def test_retry_exception_code(client, monkeypatch):
+    client.retry = RETRY_THROW_IF
+    requests = count_requests(client, monkeypatch)
+    with pytest.raises(ClickHouseException):
+        client.text("SELECT throwIf(1)")
+    assert len(requests) == 3
+    with pytest.raises(ClickHouseException):
+        client.text("SELECT * FROM unknown_table")
+    assert len(requests) == 4
+
+
+def test_no_retry_write(client, monkeypatch):
+    params = {"table": "test_pych_retry"}
+    client.execute("DROP TABLE IF EXISTS {table:Identifier}", params)
+    client.execute(
+        "CREATE TABLE {table:Identifier} (a UInt8) ENGINE MergeTree() ORDER BY a",
+        params,
+    )
+    with ClickHouseClient([DEAD, REPLICA], retry=RetryPolicy(backoff=0)) as other:
+        requests = count_requests(other, monkeypatch)
+        # The insert may have been applied, so it is not retried.
+        with pytest.raises(httpx.ConnectError):
+            other.execute("INSERT INTO test_pych_retry FORMAT RowBinary", data=b"\x01")
+        assert len(requests) == 1
+    client.retry = RETRY_THROW_IF
+    requests = count_requests(client, monkeypatch)
+    query = "INSERT INTO {table:Identifier} SELECT throwIf(1)"
+    with pytest.raises(ClickHouseException):
+        client.execute(query, params)
+    assert len(requests) == 1
+    # Deduplicated inserts are retried.
+    with pytest.raises(ClickHouseException):
+        client.execute(query, params, settings={"insert_deduplication_token": "a"})
+    assert len(requests) == 4
+    assert client.json("SELECT count() AS n FROM {table:Identifier}", params) == [
+        {"n": 0}
+    ]
+
+
+def test_no_retry_iterator(client, monkeypatch):
+    client.retry = RETRY_THROW_IF
+    requests = count_requests(client, monkeypatch)
+    with pytest.raises(ClickHouseException):
+        client.text("SELECT throwIf(1)", data=iter([b""]))
+    assert len(requests) == 1
+
+
+def test_hedged_reads(monkeypatch):
+    with ClickHouseClient([REPLICA, REPLICA], hedge_after=0) as client:
+        requests = count_requests(client, monkeypatch)
+        assert client.json("SELECT 1 AS x") == [{"x": 1}]
+        assert list(client.iter_text("SELECT 1")) == ["1"]
+        assert len(requests) == 4
+        client.text("DROP TABLE IF EXISTS test_pych_hedge")
+        assert len(requests) == 5
+    # The discarded requests are released in the background.
+    client.executor.shutdown(wait=True)
+    assert all(x.in_flight == 0 for x in client.endpoints.endpoints)
+
+
+def test_hedged_reads_failure():
+    with ClickHouseClient([DEAD, REPLICA], hedge_after=0) as client:
+        assert client.json("SELECT 1 AS x") == [{"x": 1}]
+        with pytest.raises(ClickHouseException):
+            client.json("SELECT throwIf(1)")
+
+
+def test_insert_deduplication(client):
+    params = {"table": "test_pych_dedup"}
+    client.execute("DROP TABLE IF EXISTS {table:Identifier}", params)
+    client.execute(
+        """
+        CREATE TABLE {table:Identifier} (a UInt64) ENGINE MergeTree() ORDER BY a
+        SETTINGS non_replicated_deduplication_window = 100
+        """,
+        params,
+    )
+    client.insert("test_pych_dedup", [(1,), (2,)], deduplication_token="abc")
+    client.insert("test_pych_dedup", [(1,), (2,)], deduplication_token="abc")
+    assert client.rows("SELECT a FROM {table:Identifier} ORDER BY a", params) == [
+        (1,),
+        (2,),
+    ]
+
+
+async def test_async_retry(monkeypatch):
+    async with AsyncClickHouseClient([DEAD, REPLICA], retry=RETRY_THROW_IF) as client:
+        requests = count_requests(client, monkeypatch)
+        assert await client.json("SELECT 1 AS x") == [{"x": 1}]
+        assert len(requests) == 2
+        with pytest.raises(ClickHouseException):
+            await client.text("SELECT throwIf(1)")
+        assert len(requests) == 5
+
+
+async def test_async_hedged_reads(monkeypatch):
+    async with AsyncClickHouseClient([DEAD, REPLICA], hedge_after=0) as client:
+        requests = count_requests(client, monkeypatch)
+        assert await client.json("SELECT 1 AS x") == [{"x": 1}]
+        assert [x async for x in client.iter_text("SELECT 1")] == ["1"]
+        assert len(requests) == 4
+    assert all(x.in_flight == 0 for x in client.endpoints.endpoints)
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from pych_client.row_binary import RowBinaryDecoder
+
+# SELECT number AS n, toString(number) AS s, [number, 1] AS arr, toDate(number) AS d,
+# toDecimal64(1.5, 2) AS dec, toDateTime64(1.5, 3) AS dt64 FROM numbers(2)
+# FORMAT RowBinaryWithNamesAndTypes
+DATA = (
+    b"\x06\x01n\x01s\x03arr\x01d\x03dec\x04dt64\x06UInt64\x06String\rArray(UInt64)"
+    b"\x04Date\x0eDecimal(18, 2)\rDateTime64(3)"
+    b"\x00\x00\x00\x00\x00\x00\x00\x00\x010\x02\x00\x00\x00\x00\x00\x00\x00\x00"
+    b"\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x96\x00\x00\x00\x00\x00\x00\x00"
+    b"\xdc\x05\x00\x00\x00\x00\x00\x00"
+    b"\x01\x00\x00\x00\x00\x00\x00\x00\x011\x02\x01\x00\x00\x00\x00\x00\x00\x00"
+    b"\x01\x00\x00\x00\x00\x00\x00\x00\x01\x00\x96\x00\x00\x00\x00\x00\x00\x00"
+    b"\xdc\x05\x00\x00\x00\x00\x00\x00"
+)
+
+EXPECTED = [
+    (
+        0,
+        "0",
+        [0, 1],
+        date(1970, 1, 1),
+        Decimal("1.50"),
+        datetime(1970, 1, 1, 0, 0, 1, 500000),
+    ),
+    (
+        1,
+        "1",
+        [1, 1],
+        date(1970, 1, 2),
+        Decimal("1.50"),
+        datetime(1970, 1, 1, 0, 0, 1, 500000),
+    ),
+]
+
+
+def test_row_binary_decoder():
+    decoder = RowBinaryDecoder()
+    assert decoder.decode(DATA) == EXPECTED
+    assert decoder.flush() == []
+    assert decoder.names == ["n", "s", "arr", "d", "dec", "dt64"]
+
+
+def test_row_binary_decoder_chunks():
+    decoder = RowBinaryDecoder()
+    rows = []
+    for byte in DATA:
+        rows += decoder.decode(bytes([byte]))
+    assert rows == EXPECTED
+    assert decoder.flush() == []
+
+
+def test_decimal256(client):
+    # 76 significant digits, more than the default context of the decimal module.
+    value = (
+        "123456789012345678901234567890123456789012345678901234567890123456.7890123456"
+    )
+    rows = client.rows(f"SELECT toDecimal256('{value}', 10) AS x")
+    assert rows == [(Decimal(value),)]
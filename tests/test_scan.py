@@ -0,0 +1,28 @@
+import pytest
+
+from pych_client.scan import get_partition_queries
+
+
+def test_get_partition_queries():
+    assert get_partition_queries(" SELECT * FROM t;\n", "id % 7", 2) == [
+        "SELECT * FROM (SELECT * FROM t\n) WHERE cityHash64(id % 7) % 2 = 0",
+        "SELECT * FROM (SELECT * FROM t\n) WHERE cityHash64(id % 7) % 2 = 1",
+    ]
+    with pytest.raises(ValueError):
+        get_partition_queries("SELECT * FROM t", "id", 0)
+
+
+def test_get_partition_queries_trailing_clauses():
+    [query] = get_partition_queries("SELECT 1 AS id -- comment", "id", 1)
+    assert query.endswith("-- comment\n) WHERE cityHash64(id) % 1 = 0")
+    # Nested clauses, functions, strings and comments are allowed.
+    get_partition_queries(
+        "SELECT format('{} FORMAT', x) AS id /* FORMAT */ "
+        "FROM (SELECT 1 AS x SETTINGS max_threads = 1) -- SETTINGS",
+        "id",
+        2,
+    )
+    with pytest.raises(ValueError, match="FORMAT"):
+        get_partition_queries("SELECT 1 AS id FORMAT JSONEachRow", "id", 2)
+    with pytest.raises(ValueError, match="SETTINGS"):
+        get_partition_queries("SELECT 1 AS id\nsettings max_threads = 1;", "id", 2)
@@ -0,0 +1,39 @@
+from pych_client import AsyncClickHouseClient, ClickHouseClient
+from pych_client.stats import QueryStats
+
+
+def test_from_header():
+    header = '{"read_rows": "10", "read_bytes": "80", "elapsed_ns": "2000000"}'
+    stats = QueryStats.from_header(header, "abc", 1.0)
+    assert stats == QueryStats("abc", read_rows=10, read_bytes=80, elapsed=0.002)
+    assert QueryStats.from_header(None, None, 1.0) == QueryStats(elapsed=1.0)
+
+
+def test_stats(client):
+    client.json("SELECT number FROM numbers(10)")
+    stats = client.stats
+    assert stats.query_id
+    assert stats.read_rows == 10
+    assert stats.read_bytes == 80
+    assert stats.result_rows == 10
+    assert stats.elapsed > 0
+    list(client.iter_json("SELECT number FROM numbers(20)"))
+    assert client.stats.read_rows == 20
+    assert client.stats.query_id != stats.query_id
+
+
+def test_progress():
+    progress = []
+    with ClickHouseClient(on_progress=progress.append) as client:
+        list(client.iter_text("SELECT number FROM numbers(10)"))
+    assert progress
+    assert progress[-1].read_rows == 10
+    assert progress[-1].query_id == client.stats.query_id
+
+
+async def test_async_stats():
+    progress = []
+    async with AsyncClickHouseClient(on_progress=progress.append) as client:
+        await client.json("SELECT number FROM numbers(10)")
+        assert client.stats.read_rows == 10
+    assert progress[-1].read_rows == 10